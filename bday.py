@@ -1,13 +1,20 @@
 import asyncio
+import bisect
+import calendar
+import functools
+import itertools
 import logging
-from datetime import datetime
-from typing import List, Dict
-import random
-import re
-import requests
-from bs4 import BeautifulSoup
-
-from supabase import create_client
+import time
+from datetime import datetime, date
+from typing import Awaitable, Callable, Dict, Hashable, Iterator, List, Tuple
+from zoneinfo import ZoneInfo
+
+import cache as shared_cache
+import metrics
+from records import BirthdayRecord, month_days, normalize, parse_date, parse_month_day  # noqa: F401 (parse_date re-exported)
+from sender import FanoutSender
+from wiki import rand_wiki
+from workers import BLOCKING
 
 logger = logging.getLogger(__name__)
 
@@ -30,243 +37,294 @@ def join_names(names):
         return f"{names[0]} y {names[1]}"
     return f"{', '.join(names[:-1])} y {names[-1]}"
 
-async def fetch_birthdays(supabase_url: str, supabase_key: str) -> List[Dict]:
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight call.
 
-    client = create_client(supabase_url, supabase_key)
+    The first caller for a key starts ``fn``; callers arriving while it runs
+    await the same task and get the same result (do not mutate it), or the
+    same exception. A caller being cancelled does not cancel the shared call.
+    Real and coalesced calls are counted on the instance and in
+    ``bot_singleflight_calls_total``.
+    """
 
-    # This is a simple fetch. For production, use pagination and error handling.
-    resp = client.table("Cumples").select("id,nombre,cumple").execute()
-    if resp.error:
-        logger.error("Supabase error: %s", resp.error)
-        return []
-    return resp.data or []
+    def __init__(self, name: str, registry: metrics.Registry = metrics.REGISTRY):
+        self.name = name
+        self.registry = registry
+        self.real = 0
+        self.coalesced = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
 
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable], *args):
+        task = self._inflight.get(key)
+        if task is None:
+            self.real += 1
+            self.registry.inc("bot_singleflight_calls_total", group=self.name, kind="real")
+            task = self._inflight[key] = asyncio.ensure_future(fn(*args))
+            task.add_done_callback(functools.partial(self._done, key))
+        else:
+            self.coalesced += 1
+            self.registry.inc("bot_singleflight_calls_total", group=self.name, kind="coalesced")
+        return await asyncio.shield(task)
 
-def is_today(date_str: str) -> bool:
+    def _done(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here too, in case every caller was cancelled
 
-    dt = parse_date(date_str)
-    if not dt:
-        return False
-    now = datetime.now()
-    return dt.month == now.month and dt.day == now.day
+
+# Supabase reads shared by /getCumple, the birthday job and /testBirthday
+supabase_reads = SingleFlight("supabase")
+
+# Cache key of the raw Cumples rows (see cache.py)
+ROWS_KEY = "cumples:rows"
+
+
+async def _fetch_and_save(client, snapshot, cache=None) -> List[Dict]:
+    try:
+        rows = await client.fetch_birthdays()
+    except Exception as e:
+        # logged once per flight, not once per waiting caller
+        logger.error("Failed to fetch birthdays from Supabase: %s", e)
+        raise
+    if cache is not None:
+        await shared_cache.write(cache, ROWS_KEY, rows)
+    if snapshot is not None:
+        try:
+            await BLOCKING.run(snapshot.save, rows, task="snapshot_save")
+        except Exception as e:
+            logger.error("Failed to save birthday snapshot: %s", e)
+    return rows
 
 
-def parse_date(date_str: str) -> datetime | None:
-    if not date_str:
+async def read_snapshot(snapshot, method: str, *args):
+    """Call ``snapshot.<method>(*args)`` in the blocking pool if the snapshot is recent enough, else return None."""
+    if snapshot is None:
+        return None
+    age = await BLOCKING.run(snapshot.age, task="snapshot_age")
+    if age is None or age > snapshot.max_age:
+        logger.error("No usable birthday snapshot (age: %s s, limit: %s s)", age and round(age), snapshot.max_age)
         return None
-    # If it's already a datetime, return it
-    if isinstance(date_str, datetime):
-        return date_str
+    logger.warning("Serving birthdays from the local snapshot, %d s old", age)
+    return await BLOCKING.run(getattr(snapshot, method), *args, task=f"snapshot_{method}")
+
 
-    s = str(date_str).strip()
-    # Remove timezone Z suffix for simpler parsing
-    if s.endswith("Z"):
-        s = s[:-1]
+async def fetch_birthdays(client, snapshot=None, cache=None, refresh: bool = False) -> List[Dict]:
+    """Fetch all birthdays through the shared SupabaseClientManager.
 
-    # Try fromisoformat first (handles YYYY-MM-DD and YYYY-MM-DDTHH:MM:SS)
+    With a ``cache`` (see cache.py), rows fetched by any process within the
+    cache's TTL are returned without asking Supabase, and every fetch is
+    stored there; ``refresh`` skips the cache read (the leader's periodic
+    refresh). Concurrent calls share one download. Each successful fetch is
+    saved to ``snapshot`` (a BirthdaySnapshot) if given; when the fetch fails,
+    the snapshot's rows are returned instead as long as it is within its age
+    limit. Otherwise the error propagates.
+    """
+    if cache is not None and not refresh:
+        entry = await shared_cache.read(cache, ROWS_KEY)
+        if entry is not None:
+            return entry.value
     try:
-        return datetime.fromisoformat(s)
+        return await supabase_reads.do((id(client), "all"), _fetch_and_save, client, snapshot, cache)
+    except Exception:
+        rows = await read_snapshot(snapshot, "rows")
+        if rows is None:
+            raise
+        return rows
+
+
+async def _stream_birthdays_on(client, wanted) -> List[BirthdayRecord]:
+    matches = []
+    try:
+        # Pre-filtered by Supabase when the schema has the month/day column; kept as a check either way
+        async for page in client.iter_birthdays_on(_date_key(m, d) for m, d in wanted):
+            matches.extend(r for r in normalize(page) if (r.month, r.day) in wanted)
+    except Exception as e:
+        logger.error("Failed to fetch birthdays from Supabase: %s", e)
+        raise
+    return matches
+
+
+async def fetch_birthdays_on(client, days, snapshot=None, cache=None) -> List[BirthdayRecord] | None:
+    """Return the records whose birthday falls on any of ``days`` (dates).
+
+    With a ``cache``, the matches are stored there per set of days, so other
+    processes asking for the same days within its TTL skip Supabase.
+
+    Supabase returns only the rows on those days when the ``cumple_md``
+    migration is applied; otherwise the table is streamed page by page and
+    only matching records are kept. Either way memory stays flat however
+    large ``Cumples`` grows. Concurrent calls for
+    the same days share one stream. If Supabase fails, the days are looked up
+    in ``snapshot`` through its (month, day) index, provided it is within its
+    age limit. Returns None when the data is unavailable.
+    """
+    days = list(days)
+    wanted = frozenset().union(*map(month_days, days))
+    key = "cumples:on:" + ",".join(f"{m:02d}-{d:02d}" for m, d in sorted(wanted))
+    if cache is not None:
+        entry = await shared_cache.read(cache, key)
+        if entry is not None:
+            return [BirthdayRecord(*r) for r in entry.value]
+    try:
+        records = await supabase_reads.do((id(client), "on", wanted), _stream_birthdays_on, client, wanted)
     except Exception:
         pass
+    else:
+        if cache is not None:
+            await shared_cache.write(cache, key, [[r.id, r.name, r.month, r.day] for r in records])
+        return records
+    try:
+        return await read_snapshot(snapshot, "on", days)
+    except Exception as e:
+        logger.error("Failed to read the birthday snapshot: %s", e)
+        return None
 
-    # Try several common formats (year-first and day-first)
-    fmts = [
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%dT%H:%M:%S.%f",
-        "%Y-%m-%d",
-        "%d/%m/%Y",
-        "%d-%m-%Y",
-        "%m/%d/%Y",
-    ]
-    for f in fmts:
-        try:
-            return datetime.strptime(s, f)
-        except Exception:
-            continue
-
-    # Last resort: try extracting digits and attempt Y-M-D or D-M-Y
-    parts = [p for p in s.replace("T", " ").replace("/", "-").split() if any(c.isdigit() for c in p)]
-    if parts:
-        p = parts[0]
-        segs = p.split("-")
-        if len(segs) == 3:
-            a, b, c = segs
-            # Heuristic: if first segment has 4 digits assume Y-M-D
-            if len(a) == 4:
-                try:
-                    return datetime(int(a), int(b), int(c))
-                except Exception:
-                    pass
-            else:
-                # assume D-M-Y
-                try:
-                    return datetime(int(c), int(b), int(a))
-                except Exception:
-                    pass
-
-    return None
-
-
-async def birthday_job(application, config):
-
-    def rand_wiki():
+
+def is_today(date_str: str, today: date | None = None) -> bool:
+
+    md = parse_month_day(date_str)
+    if not md:
+        return False
+    now = today or datetime.now()
+    return md == (now.month, now.day)
+
+
+def _today_on(records: List[BirthdayRecord], today: date) -> List[BirthdayRecord]:
+    keys = month_days(today)
+    return [r for r in records if (r.month, r.day) in keys]
+
+
+def _today_in(tz: str | None) -> date:
+    """Return today's date in the given IANA timezone (server local time if None)."""
+    if tz:
         try:
-            today = datetime.now()
-            months = ["enero", "febrero", "marzo", "abril", "mayo", "junio",
-                     "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
-            page_title = f"{today.day}_de_{months[today.month - 1]}"
-            
-            # Use Wikipedia API instead of scraping
-            api_url = "https://es.wikipedia.org/w/api.php"
-            params = {
-                'action': 'parse',
-                'page': page_title,
-                'prop': 'text',
-                'format': 'json',
-                'formatversion': '2'
-            }
-            headers = {
-                'User-Agent': 'BotBardiro/1.0 (Telegram Bot; birthday notifications)'
-            }
-            
-            response = requests.get(api_url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'parse' not in data:
-                return "No parse in data"
-            
-            html_content = data['parse']['text']
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Find Nacimientos section - try multiple approaches
-            # 1. Look for span with id='Nacimientos'
-            nacimientos_span = soup.find('span', id='Nacimientos')
-            
-            # 2. If not found, look for any heading containing "Nacimientos"
-            if not nacimientos_span:
-                for heading in soup.find_all(['h2', 'h3', 'span']):
-                    if 'Nacimientos' in heading.get_text():
-                        nacimientos_span = heading
-                        break
-            
-            if not nacimientos_span:
-                logger.warning("Could not find 'Nacimientos' section")
-                return "No header found"
-            
-            # Find the nearest h2/h3 parent or the element itself if it's a heading
-            if nacimientos_span.name in ['h2', 'h3']:
-                nacimientos_heading = nacimientos_span
-            else:
-                nacimientos_heading = nacimientos_span.find_parent(['h2', 'h3'])
-            
-            # Find all ul elements that come after the Nacimientos section
-            births = []
-            
-            if nacimientos_heading:
-                # Find the next section heading to know where to stop
-                next_section = nacimientos_heading.find_next(['h2', 'h3'])
-                
-                # Get all ul elements between this heading and the next
-                current = nacimientos_heading
-                while current and current != next_section:
-                    current = current.find_next()
-                    if current == next_section:
-                        break
-                    if current and current.name == 'ul':
-                        for li in current.find_all('li', recursive=False):
-                            text = li.get_text(strip=True)
-                            if text:
-                                births.append(text)
-                        if births:  # Found births, stop looking
-                            break
-            else:
-                # Fallback: find next ul after the span
-                ul_element = nacimientos_span.find_next('ul')
-                if ul_element:
-                    for li in ul_element.find_all('li', recursive=False):
-                        text = li.get_text(strip=True)
-                        if text:
-                            births.append(text)
-            
-            logger.info("Found %d birth entries", len(births))
-            if not births:
-                return "No births found"
-            
-            # Select random birth and extract name
-            selected = random.choice(births)
-            match = re.match(r'^\d+\s*[:.]?\s*([^,\(]+)', selected)
-            name = match.group(1).strip() if match else selected
-            
-            return f"Nadie de euri cumple años hoy, pero hoy cumple {name}"
+            return datetime.now(ZoneInfo(tz)).date()
         except Exception as e:
-            logger.error("Error fetching Wikipedia: %s", e)
-            return "Hoy nadie cumple años"
+            logger.warning("Unknown timezone %r, using local time: %s", tz, e)
+    return datetime.now().date()
+
+
+async def _birthday_message(records: List[BirthdayRecord], today: date, births_store=None, wiki_client=None,
+                            cache=None) -> str:
+    todays = _today_on(records, today)
+
+    logger.info("Found %d users with birthdays on %s", len(todays), today)
+
+    if todays:
+        names = join_names([r.name for r in todays])
+        return f"Hoy es el cumpleaños de {names}! 🎉🎂"
+    with metrics.timer("birthday_job_wikipedia"):
+        return await rand_wiki(births_store, wiki_client, today, cache)
+
+
+async def prepare_birthday_messages(client, days: Dict, births_store=None, wiki_client=None, snapshot=None,
+                                    cache=None) -> Dict | None:
+    """Render the announcement for each date in ``days`` (any key -> date), keyed the same way.
 
+    Returns None when the birthdays cannot be read: announcing a Wikipedia
+    birthday then would wrongly suggest none of ours is today.
+    """
+    if not client.configured:
+        logger.error("Supabase config not set; no birthday message.")
+        return None
+    with metrics.timer("birthday_job_supabase"):
+        records = await fetch_birthdays_on(client, set(days.values()), snapshot, cache)
+    if records is None:
+        logger.error("No birthday message: birthdays unavailable from Supabase and from the local snapshot")
+        return None
+    messages = {}
+    for key, today in days.items():
+        messages[key] = await _birthday_message(records, today, births_store, wiki_client, cache)
+    return messages
+
+
+async def prepare_birthday_card(client, day: date, cards, snapshot=None, cache=None) -> Dict | None:
+    """Render the card of ``day``'s birthdays ahead of sending and return its spec (None: nobody that day).
+
+    ``cards`` is a ``cards.CardRenderer``. Days announcing a Wikipedia birth get no card.
+    """
+    records = await fetch_birthdays_on(client, [day], snapshot, cache)
+    todays = _today_on(records or [], day)
+    if not todays:
+        return None
+    spec = cards.today(day, [r.name for r in todays])
+    with metrics.timer("birthday_job_card"):
+        await cards.render(spec)
+    return spec
+
+
+async def send_birthday_messages(application, messages, cards=None) -> List[int]:
+    """Send ``(chat_id, text[, card])`` messages; returns the chat ids that received theirs."""
+    with metrics.timer("birthday_job_send"):
+        outcome = await FanoutSender(application.bot, cards=cards).send_all(messages)
+    return [chat_id for chat_id, err in outcome.items() if err is None]
+
+
+async def birthday_job(application, config, client, births_store=None, wiki_client=None, chats=None, snapshot=None,
+                       cache=None, cards=None):
+    """Announce today's birthdays to ``chats`` (default: every configured birthday chat), right now.
+
+    The daily announcement goes through ``scheduler.DailyAnnouncement``; this
+    runs both phases at once for /testBirthday. With ``cards``, birthdays go
+    out as a card with the message as its caption.
+    """
     logger.info("Birthday job started at %s", datetime.now())
-    
-    supabase_url = config.SUPABASE_URL
-    supabase_key = config.SUPABASE_KEY
-    chat_id = config.BIRTHDAY_CHAT_ID
 
-    logger.info("Birthday job config: chat_id=%s, supabase_url=%s", 
-                chat_id if chat_id else "NOT SET", 
-                "SET" if supabase_url else "NOT SET")
+    if chats is None:
+        chats = config.BIRTHDAY_CHATS
+
+    logger.info("Birthday job config: chats=%s, supabase_url=%s", 
+                len(chats) if chats else "NOT SET", 
+                "SET" if client.supabase_url else "NOT SET")
 
-    if not (supabase_url and supabase_key):
-        logger.error("Supabase config not set; skipping birthday job.")
+    # "Today" depends on each chat's timezone, so build one message per zone
+    days = {tz: _today_in(tz) for tz in {c.tz for c in chats} or {None}}
+    messages = await prepare_birthday_messages(client, days, births_store, wiki_client, snapshot, cache)
+    if messages is None:
+        logger.error("Birthday job skipped")
         return
 
-    # fetch_birthdays_sync is a blocking function; run it in the default executor
-    users = await asyncio.get_event_loop().run_in_executor(None, fetch_birthdays_sync, supabase_url, supabase_key)
-
-    # Normalize date field extraction to handle different column names / casing
-    def get_date_field(u: dict):
-        for k in ("cumple", "Cumple", "cumple_date", "fecha", "Fecha", "birthday", "Birthday"):
-            if k in u and u.get(k):
-                return u.get(k)
-        # fallback: try any key that looks like a date
-        for v in u.values():
-            if isinstance(v, str) and any(ch.isdigit() for ch in v):
-                return v
-        return None
+    if not chats:
+        logger.warning("⚠️  BIRTHDAY_CHATS / BIRTHDAY_CHAT_ID not configured. Message not sent: %s", messages[None])
+        return
 
-    def get_name_field(u: dict):
-        for k in ("nombre", "Nombre", "name", "Name"):
-            if k in u and u.get(k):
-                return u.get(k)
-        # fallback to id
-        return u.get("id")
+    specs = {}
+    if cards is not None:
+        for tz, today in days.items():
+            try:
+                specs[tz] = await prepare_birthday_card(client, today, cards, snapshot, cache)
+            except Exception as e:
+                logger.error("Could not render the birthday card, sending the text alone: %s", e)
+    await send_birthday_messages(application, ((c.chat_id, messages[c.tz], specs.get(c.tz)) for c in chats), cards)
 
-    todays = [u for u in users if get_date_field(u) and is_today(get_date_field(u))]
 
-    logger.info("Found %d total users, %d with birthdays today", len(users), len(todays))
+@functools.lru_cache(maxsize=4)
+def _sync_client(supabase_url: str, supabase_key: str):
+    # Reuse one blocking client per project instead of a new session per call.
+    # The full SDK takes ~0.25 s to import and only scripts use it: import on first call.
+    from supabase import create_client
 
-    
-    if todays:
-        names = join_names([str(get_name_field(u)) for u in todays])
-        message = f"Hoy es el cumpleaños de {names}! 🎉🎂"
-    else:
-        message = rand_wiki()
+    return create_client(supabase_url, supabase_key)
 
-    if chat_id:
-        try:
-            logger.info("Attempting to send birthday message to chat_id=%s: %s", chat_id, message)
-            await application.bot.send_message(chat_id=int(chat_id), text=message)
-            logger.info("✅ Successfully sent birthday message: %s", message)
-        except Exception as e:
-            logger.exception("❌ Failed to send birthday message: %s", e)
-    else:
-        logger.warning("⚠️  BIRTHDAY_CHAT_ID not configured. Message not sent: %s", message)
 
+def fetch_birthdays_sync(supabase_url: str, supabase_key: str, cache=None) -> List[Dict]:
+    """Blocking fetch for scripts and tools; the bot itself uses SupabaseClientManager.
 
-def fetch_birthdays_sync(supabase_url: str, supabase_key: str) -> List[Dict]:
+    With a ``cache`` (e.g. ``cache.SQLiteCache`` on the bot's ``CACHE_PATH``),
+    rows a running bot cached are used instead of asking Supabase.
+    """
     try:
-        client = create_client(supabase_url, supabase_key)
+        entry = cache.get(ROWS_KEY) if cache is not None else None
+        if entry is not None:
+            return entry.value
+        client = _sync_client(supabase_url, supabase_key)
         resp = client.table("Cumples").select("id,nombre,cumple").execute()
         if getattr(resp, "error", None):
             logger.error("Supabase returned error: %s", resp.error)
             return []
+        if cache is not None:
+            cache.put(ROWS_KEY, resp.data or [])
         return resp.data or []
     except Exception as e:
         # Catch PostgREST / network / auth errors and return empty list so the
@@ -275,115 +333,259 @@ def fetch_birthdays_sync(supabase_url: str, supabase_key: str) -> List[Dict]:
         return []
 
 
-def get_birthday_message_sync(supabase_url: str, supabase_key: str) -> str:
+def get_birthday_message_sync(supabase_url: str, supabase_key: str, cache=None) -> str:
 
-    users = fetch_birthdays_sync(supabase_url, supabase_key)
+    records = normalize(fetch_birthdays_sync(supabase_url, supabase_key, cache))
 
-    def get_date_field(u: dict):
-        for k in ("cumple", "Cumple", "cumple_date", "fecha", "Fecha", "birthday", "Birthday"):
-            if k in u and u.get(k):
-                return u.get(k)
-        for v in u.values():
-            if isinstance(v, str) and any(ch.isdigit() for ch in v):
-                return v
-        return None
-
-    def get_name_field(u: dict):
-        for k in ("nombre", "Nombre", "name", "Name"):
-            if k in u and u.get(k):
-                return u.get(k)
-        return u.get("id")
-
-    todays = [u for u in users if get_date_field(u) and is_today(get_date_field(u))]
+    todays = _today_on(records, datetime.now().date())
     if todays:
-        names = ", ".join(str(get_name_field(u)) for u in todays)
+        names = ", ".join(r.name for r in todays)
         return f"Hoy cumple años: {names}. Muchas felicidades!"
     return "Hoy nadie cumple años"
 
 
-def get_next_birthday_sync(supabase_url: str, supabase_key: str) -> Dict:
-    """Return the next upcoming birthday as a dict with keys: name, date, days_until.
+def _date_key(month: int, day: int) -> int:
+    """Return a sortable ordinal for a (month, day) pair."""
+    return month * 32 + day
 
-    If multiple people share the same next date, returns the first found and include others in 'others' list.
+
+FEB_28, FEB_29 = _date_key(2, 28), _date_key(2, 29)
+
+
+class BirthdayIndex:
+    """In-memory index of birthdays ordered by (month, day).
+
+    The table is loaded once and kept as two sorted arrays of ordinals: one for
+    leap years and one for common years, where Feb 29 birthdays are moved to
+    Feb 28 (the same fallback ``next_occurrence`` used). "Next", "today" and
+    "on date X" lookups are then a bisect instead of a full scan.
+
+    ``loader`` is an async callable returning the raw rows. Once the index is
+    older than ``ttl`` seconds, lookups keep serving the current data while a
+    background task reloads it. ``warm``, if given, is an async callable
+    returning rows (or None) to serve on first use, e.g. from the local
+    snapshot; the loader then runs in the background instead of being waited on.
     """
-    users = fetch_birthdays_sync(supabase_url, supabase_key)
-    today = datetime.now().date()
 
-    def next_occurrence(dt: datetime) -> datetime.date:
-        # Compute the next occurrence using only month and day (ignore birth year).
-        # Use current year as base; if that date is past, use next year.
-        # Handle Feb 29 by falling back to Feb 28 on non-leap years.
+    def __init__(self, loader, ttl: float = 300, warm=None):
+        self._loader = loader
+        self._warm = warm
+        self.ttl = ttl
+        self._refresh_task: asyncio.Task | None = None
+        self._loaded_at = None
+        # Bumped whenever a load changes the contents, so caches built on the index can tell
+        self.version = 0
+        self._fingerprint = None
+        self._source = None
+        # (leap keys, leap names), (common keys, common names)
+        self._leap = ([], [])
+        self._common = ([], [])
+
+    def load(self, users: List[Dict]) -> None:
+        """Rebuild the index from raw ``Cumples`` rows."""
+        if users is self._source:
+            # The same rows again (a cache hit with an unchanged version): nothing to rebuild
+            self._loaded_at = time.monotonic()
+            return
+        self._source = users
+        entries = [(r.month, r.day, r.name) for r in normalize(users)]
+
+        # sort() is stable, so people sharing a day keep the table order
+        leap = sorted(entries, key=lambda e: _date_key(e[0], e[1]))
+        common = sorted(
+            ((2, 28, n) if (m, d) == (2, 29) else (m, d, n) for m, d, n in entries),
+            key=lambda e: _date_key(e[0], e[1]),
+        )
+        self._leap = ([_date_key(m, d) for m, d, _ in leap], [n for _, _, n in leap])
+        self._common = ([_date_key(m, d) for m, d, _ in common], [n for _, _, n in common])
+        fingerprint = hash((tuple(self._leap[0]), tuple(self._leap[1])))
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self.version += 1
+        self._loaded_at = time.monotonic()
+        logger.info("Birthday index loaded with %d entries", len(entries))
+
+    async def refresh(self) -> None:
+        """Reload the index from the loader."""
+        self.load(await self._loader())
+
+    async def _refresh_in_background(self) -> None:
         try:
-            target = datetime(today.year, dt.month, dt.day).date()
-        except ValueError:
-            # Likely Feb 29 on a non-leap current year -> fallback to Feb 28
-            if dt.month == 2 and dt.day == 29:
-                try:
-                    target = datetime(today.year, 2, 28).date()
-                except Exception:
-                    return None
-            else:
-                return None
-
-        if target < today:
-            # use next year
+            await self.refresh()
+        except Exception as e:
+            logger.error("Failed to refresh birthday index: %s", e)
+        finally:
+            self._refresh_task = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def load_in_background(self) -> None:
+        """Start the first load without waiting for it; ``ensure_fresh`` then waits for that load."""
+        if self._loaded_at is None and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_in_background())
+
+    async def ensure_fresh(self) -> None:
+        """Load the index on first use, then refresh it in the background once stale."""
+        if self._loaded_at is None and self._warm is not None:
+            warm, self._warm = self._warm, None
             try:
-                return datetime(today.year + 1, dt.month, dt.day).date()
-            except ValueError:
-                # handle Feb 29 -> fallback to Feb 28 next year as well
-                if dt.month == 2 and dt.day == 29:
-                    try:
-                        return datetime(today.year + 1, 2, 28).date()
-                    except Exception:
-                        return None
-                return None
-        return target
-
-    candidates = []
-    for u in users:
-        date_str = None
-        for k in ("cumple", "Cumple", "cumple_date", "fecha", "Fecha", "birthday", "Birthday"):
-            if k in u and u.get(k):
-                date_str = u.get(k)
-                break
-        if not date_str:
-            # try any value
-            for v in u.values():
-                if isinstance(v, str) and any(ch.isdigit() for ch in v):
-                    date_str = v
-                    break
-        if not date_str:
-            continue
-        dt = parse_date(date_str)
-        if not dt:
-            continue
-        occ = next_occurrence(dt)
-        if not occ:
-            continue
-        days = (occ - today).days
-        candidates.append((days, u, occ))
-
-    if not candidates:
+                rows = await warm()
+            except Exception as e:
+                logger.error("Failed to warm the birthday index: %s", e)
+                rows = None
+            if rows:
+                self.load(rows)
+                self._loaded_at = float("-inf")  # stale: reload in the background below
+        if self._loaded_at is None and self._refresh_task is not None:
+            await asyncio.shield(self._refresh_task)
+        if self._loaded_at is None:
+            await self.refresh()
+            return
+        if self._refresh_task is None and time.monotonic() - self._loaded_at >= self.ttl:
+            self._refresh_task = asyncio.create_task(self._refresh_in_background())
+
+    def _arrays(self, year: int):
+        return self._leap if calendar.isleap(year) else self._common
+
+    def on(self, day: date) -> List[str]:
+        """Return the names celebrating on the given date."""
+        keys, names = self._arrays(day.year)
+        key = _date_key(day.month, day.day)
+        lo = bisect.bisect_left(keys, key)
+        hi = bisect.bisect_right(keys, key, lo)
+        return names[lo:hi]
+
+    def today(self) -> List[str]:
+        """Return the names celebrating today."""
+        return self.on(datetime.now().date())
+
+    def next(self, today: date | None = None):
+        """Return ``(occurrence, names)`` for the next birthday on or after ``today``.
+
+        Returns ``None`` when the index is empty.
+        """
+        today = today or datetime.now().date()
+        keys, names = self._arrays(today.year)
+        if not keys:
+            return None
+        i = bisect.bisect_left(keys, _date_key(today.month, today.day))
+        year = today.year
+        if i == len(keys):
+            # everyone already celebrated this year: wrap around to next year
+            year += 1
+            keys, names = self._arrays(year)
+            i = 0
+        key = keys[i]
+        month, day = divmod(key, 32)
+        hi = bisect.bisect_right(keys, key, i)
+        return date(year, month, day), names[i:hi]
+
+    def _groups(self, year: int, lo_key: int, hi_key: int) -> Iterator[Tuple[date, List[str]]]:
+        """Yield ``(date, names)`` in ``year`` for each birthday day with ordinal in [lo_key, hi_key]."""
+        keys, names = self._arrays(year)
+        i = bisect.bisect_left(keys, lo_key)
+        end = bisect.bisect_right(keys, hi_key, i)
+        while i < end:
+            key = keys[i]
+            j = bisect.bisect_right(keys, key, i, end)
+            month, day = divmod(key, 32)
+            yield date(year, month, day), names[i:j]
+            i = j
+
+    def in_window(self, start: date, end: date) -> List[Tuple[date, List[str]]]:
+        """Return ``(date, names)`` for every birthday day from ``start`` to ``end`` inclusive, in order.
+
+        A range scan per calendar year covered: cost grows with the days
+        returned, not with the size of the table.
+        """
+        found = []
+        for year in range(start.year, end.year + 1):
+            lo = _date_key(start.month, start.day) if year == start.year else 0
+            hi = _date_key(end.month, end.day) if year == end.year else _date_key(12, 31)
+            found.extend(self._groups(year, lo, hi))
+        return found
+
+    def in_month(self, month: int, year: int | None = None) -> List[Tuple[date, List[str]]]:
+        """Return ``(date, names)`` for the birthday days of ``month`` (of ``year``, default this year)."""
+        year = year or datetime.now().year
+        return list(self._groups(year, _date_key(month, 1), _date_key(month, 31)))
+
+    def upcoming(self, n: int, today: date | None = None) -> List[Tuple[date, List[str]]]:
+        """Return the next ``n`` birthday days on or after ``today`` as ``(date, names)``.
+
+        People sharing a day are grouped in one entry. Walks forward from a
+        bisect for at most one year, so it costs O(log N + n) whatever the
+        table size; fewer than ``n`` entries come back if there are not enough days.
+        """
+        today = today or datetime.now().date()
+        start = _date_key(today.month, today.day)
+        # The rest of this year, then next year up to the day before today
+        groups = itertools.chain(self._groups(today.year, start, _date_key(12, 31)),
+                                 self._groups(today.year + 1, 0, start - 1))
+        return list(itertools.islice(groups, max(n, 0)))
+
+
+def _next_birthday(found, today: date) -> Dict:
+    if not found:
         return {"found": False}
 
-    candidates.sort(key=lambda x: x[0])
-    days, user, occ = candidates[0]
-    name = None
-    for k in ("nombre", "Nombre", "name", "Name"):
-        if k in user and user.get(k):
-            name = user.get(k)
-            break
-    if not name:
-        name = user.get("id")
-
-    # find others with same occ
-    others = [u for d, u, o in candidates if o == occ and u is not user]
-
+    occ, names = found
     return {
         "found": True,
-        "name": name,
+        "name": names[0],
         "date": occ.isoformat(),
-        "days_until": days,
-        "others": [ (u.get("nombre") or u.get("id")) for u in others ],
+        "days_until": (occ - today).days,
+        "others": names[1:],
     }
 
+
+async def get_next_birthday(index: BirthdayIndex, today: date | None = None) -> Dict:
+    """Return the next upcoming birthday as a dict with keys: name, date, days_until.
+
+    If multiple people share the same next date, returns the first found and include others in 'others' list.
+    """
+    await index.ensure_fresh()
+    today = today or datetime.now().date()
+    return _next_birthday(index.next(today), today)
+
+
+async def _query_next_birthday(client, today: date):
+    year = today.year
+    key = await client.first_birthday_key(_date_key(today.month, today.day))
+    if key is None:
+        # everyone already celebrated this year: wrap around to next year
+        year += 1
+        key = await client.first_birthday_key(0)
+        if key is None:
+            return None
+    keys = {key}
+    if not calendar.isleap(year) and key in (FEB_28, FEB_29):
+        # Same as BirthdayIndex: Feb 29 birthdays are celebrated on Feb 28 in common years
+        keys, key = {FEB_28, FEB_29}, FEB_28
+    names = []
+    async for page in client.iter_birthday_pages(keys=keys):
+        names.extend(r.name for r in normalize(page))
+    month, day = divmod(key, 32)
+    return date(year, month, day), names
+
+
+async def fetch_next_birthday(client, today: date | None = None) -> Dict | None:
+    """``get_next_birthday`` answered by Supabase without loading the table.
+
+    Two indexed range queries: the first month/day key on or after today, then
+    the rows on that day. Needs the ``cumple_md`` migration. Returns None when
+    that is missing or Supabase fails, so the caller can use the index instead.
+    """
+    if not client.configured or not client.server_filter:
+        return None
+    today = today or datetime.now().date()
+    try:
+        found = await supabase_reads.do((id(client), "next", today), _query_next_birthday, client, today)
+    except Exception as e:
+        logger.warning("Next birthday query failed, using the full table: %s", e)
+        return None
+    if found is not None and not found[1]:
+        return None  # the rows changed between the two queries
+    return _next_birthday(found, today)
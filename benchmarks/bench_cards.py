@@ -0,0 +1,267 @@
+"""Render and send cost of birthday cards, offline against the fake Bot API.
+
+- render: drawing a card on the event loop vs in the ``RENDER`` process pool
+  (the longest stall of a 5 ms ticker on the loop while 16 cards are drawn),
+  and a card already on disk / already known to the process;
+- send: today's card to ``--chats`` chats, uploading a freshly rendered PNG
+  per send (the naive way) vs ``CardRenderer`` (rendered once, uploaded once,
+  then sent by ``file_id``), and the same card again after a restart;
+- checks: a ``file_id`` Telegram refuses is dropped and the card uploaded
+  again, while a chat-level error keeps it; the outbox delivers messages with a card as photos (one upload) and
+  those without as text, and the text alone when a card can't be drawn or
+  sent; ``prepare_birthday_card`` leaves the card on disk before the send
+  time.
+
+Needs matplotlib (requirements-cards.txt).
+
+    python benchmarks/bench_cards.py [--chats 50]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from telegram import Bot  # noqa: E402
+from telegram.error import BadRequest  # noqa: E402
+
+import metrics  # noqa: E402
+from bday import prepare_birthday_card  # noqa: E402
+from cards import CardRenderer, card_key, render_card  # noqa: E402
+from fake_telegram import FakeTelegram  # noqa: E402
+from fakes import FakeSupabase, synthetic_table  # noqa: E402
+from outbox import Outbox, OutboxDrainer  # noqa: E402
+from sender import FanoutSender  # noqa: E402
+from workers import RENDER  # noqa: E402
+
+DAY = date(2026, 3, 14)
+NAMES = ["Ana García", "Luis Martín", "Marta Pérez"]
+# No flood limits: measure the sends, not the token buckets
+UNLIMITED = {"global_rate": 1e6, "per_chat_rate": 1e6, "group_rate": 1e6}
+
+
+def spec(i: int) -> dict:
+    return CardRenderer.today(DAY, [f"Persona {i}"])
+
+
+async def stall_while(work) -> float:
+    """Longest gap (ms) between 5 ms ticks of a task on the loop while ``work`` runs."""
+    gaps = []
+    done = False
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    await work()
+    done = True
+    await task
+    return max(gaps) * 1000
+
+
+async def bench_render(tmp: str) -> None:
+    directory = os.path.join(tmp, "render")
+    os.makedirs(directory)
+    render_card(spec(0), os.path.join(directory, "warm.png"))  # import matplotlib here
+    n = 16
+    times = []
+
+    async def inline():
+        for i in range(1, n + 1):
+            started = time.perf_counter()
+            render_card(spec(i), os.path.join(directory, f"inline-{i}.png"))
+            times.append(time.perf_counter() - started)
+
+    inline_stall = await stall_while(inline)
+
+    cards = CardRenderer(directory, registry=metrics.Registry())
+    started = time.perf_counter()
+    await cards.render(spec(-1))  # starts the worker processes
+    cold = time.perf_counter() - started
+
+    async def pooled():
+        await asyncio.gather(*(cards.render(spec(i)) for i in range(100, 100 + n)))
+
+    started = time.perf_counter()
+    pool_stall = await stall_while(pooled)
+    pooled_s = time.perf_counter() - started
+
+    # On disk, drawn by "another process": a new renderer only checks the file
+    other = CardRenderer(directory, registry=metrics.Registry())
+    started = time.perf_counter()
+    await other.render(spec(100))
+    on_disk = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(1000):
+        await other.render(spec(100))
+    known = (time.perf_counter() - started) / 1000
+
+    print(json.dumps({
+        "bench": "render", "cards": n, "inline_ms_per_card": round(statistics.median(times) * 1000, 1),
+        "inline_loop_stall_ms": round(inline_stall, 1), "pool_workers": RENDER.max_workers,
+        "pool_first_card_ms": round(cold * 1000), "pool_total_ms": round(pooled_s * 1000),
+        "pool_loop_stall_ms": round(pool_stall, 1), "on_disk_ms": round(on_disk * 1000, 2),
+        "known_us": round(known * 1e6, 1), "png_kb": round(os.path.getsize(cards.path(card_key(spec(100)))) / 1024, 1),
+    }))
+
+
+async def bench_send(fake: FakeTelegram, bot: Bot, tmp: str, chats: int) -> None:
+    chat_ids = [-1001000000000 - i for i in range(chats)]
+    card = CardRenderer.today(DAY, NAMES)
+    caption = "Hoy es el cumpleaños de Ana García, Luis Martín y Marta Pérez! 🎉🎂"
+
+    async def naive():
+        async def one(chat_id):
+            path = os.path.join(tmp, f"naive-{chat_id}.png")
+            render_card(card, path)
+            with open(path, "rb") as f:
+                await bot.send_photo(chat_id=chat_id, photo=f.read(), caption=caption)
+        await asyncio.gather(*(one(chat_id) for chat_id in chat_ids))
+
+    async def with_cards(cards):
+        sender = FanoutSender(bot, cards=cards, **UNLIMITED)
+        outcome = await sender.send_all((chat_id, caption, card) for chat_id in chat_ids)
+        assert not any(outcome.values()), outcome
+
+    directory = os.path.join(tmp, "send")
+    runs = [("upload_per_send", naive),
+            ("card_renderer", lambda: with_cards(CardRenderer(directory, registry=metrics.Registry()))),
+            ("after_restart", lambda: with_cards(CardRenderer(directory, registry=metrics.Registry())))]
+    for label, run in runs:
+        photos, received = len(fake.photos), fake.received_bytes
+        started = time.perf_counter()
+        await run()
+        elapsed = time.perf_counter() - started
+        sent = fake.photos[photos:]
+        assert len(sent) == chats
+        print(json.dumps({"bench": "send", "mode": label, "chats": chats, "ms": round(elapsed * 1000, 1),
+                          "uploads": sum(1 for p in sent if p[2]),
+                          "kb_received": round((fake.received_bytes - received) / 1024, 1)}))
+
+
+async def check_stale_file_id(fake: FakeTelegram, bot: Bot, tmp: str) -> None:
+    directory = os.path.join(tmp, "stale")
+    registry = metrics.Registry()
+    cards = CardRenderer(directory, registry=registry)
+    card = CardRenderer.today(DAY, ["Otra"])
+    with open(os.path.join(directory, f"{card_key(card)}.file_id"), "w") as f:
+        f.write("photo-from-another-bot")
+    photos = len(fake.photos)
+    await cards.send(lambda **kw: bot.send_photo(chat_id=1, **kw), card, caption="hola")
+    await cards.send(lambda **kw: bot.send_photo(chat_id=1, **kw), card, caption="hola")
+    assert [p[2] > 0 for p in fake.photos[photos:]] == [True, False], fake.photos[photos:]
+    assert registry.counters[("bot_card_sends_total", (("via", "upload"),))] == 1
+    # A chat-level error is not about the file_id: it stays, and nothing is uploaded again
+    fake.photo_errors[7] = "Bad Request: chat not found"
+    try:
+        await cards.send(lambda **kw: bot.send_photo(chat_id=7, **kw), card, caption="hola")
+    except BadRequest:
+        pass
+    else:
+        raise AssertionError("the chat error was swallowed")
+    del fake.photo_errors[7]
+    assert registry.counters[("bot_card_sends_total", (("via", "upload"),))] == 1
+    with open(os.path.join(directory, f"{card_key(card)}.file_id")) as f:
+        assert f.read() == cards._file_ids[card_key(card)]
+    print("stale file_id check passed: refused once, uploaded again, then sent by file_id; "
+          "a chat error kept the file_id")
+
+
+async def check_outbox(fake: FakeTelegram, bot: Bot, tmp: str) -> None:
+    cards = CardRenderer(os.path.join(tmp, "outbox-cards"), registry=metrics.Registry())
+    card = CardRenderer.today(DAY, ["Ana"])
+    outbox = Outbox(os.path.join(tmp, "outbox.sqlite3"))
+    drainer = OutboxDrainer(outbox, bot, registry=metrics.Registry(), cards=cards)
+    photos, messages = len(fake.photos), len(fake.sent)
+    await outbox.enqueue(DAY, [(1, "con tarjeta", card), (2, "con tarjeta", card), (3, "con tarjeta", card),
+                               (4, "solo texto")])
+    while await drainer.drain_once() is not None:
+        pass
+    await outbox.close()
+    sent = fake.photos[photos:]
+    assert sorted(p[1] for p in sent) == [1, 2, 3] and sum(1 for p in sent if p[2]) == 1, sent
+    assert [m[1:] for m in fake.sent[messages:]] == [(4, "solo texto")]
+    print("outbox check passed: 3 chats got the card with one upload, the text-only row went as a message")
+
+
+async def check_card_fallback(fake: FakeTelegram, bot: Bot, tmp: str) -> None:
+    cards = CardRenderer(os.path.join(tmp, "fallback-cards"), registry=metrics.Registry())
+    broken = {"kind": "no-such-card", "date": DAY.isoformat()}
+    fake.photo_errors[6] = "Bad Request: not enough rights to send photos to the chat"
+    path = os.path.join(tmp, "fallback.sqlite3")
+    outbox = Outbox(path)
+    drainer = OutboxDrainer(outbox, bot, registry=metrics.Registry(), cards=cards)
+    photos, messages = len(fake.photos), len(fake.sent)
+    await outbox.enqueue(DAY, [(5, "sin dibujo", broken), (6, "sin permiso", CardRenderer.today(DAY, ["Eva"]))])
+    while await drainer.drain_once() is not None:
+        pass
+    await outbox.close()
+    del fake.photo_errors[6]
+    with sqlite3.connect(path) as db:
+        statuses = sorted(db.execute("SELECT chat_id, status FROM outbox"))
+    assert statuses == [(5, "sent"), (6, "sent")], statuses
+    assert len(fake.photos) == photos
+    assert not cards._uploads, cards._uploads  # the failed upload left no per-card lock behind
+    assert sorted(m[1:] for m in fake.sent[messages:]) == [(5, "sin dibujo"), (6, "sin permiso")], fake.sent[messages:]
+    print("card fallback check passed: a card that failed to draw and one Telegram refused each went as text, once")
+
+
+async def check_prepare(tmp: str) -> None:
+    rows = synthetic_table(30)
+    day = date.fromisoformat(rows[0]["cumple"]).replace(year=2026)
+    cards = CardRenderer(os.path.join(tmp, "prepare"), registry=metrics.Registry())
+    card = await prepare_birthday_card(FakeSupabase(rows), day, cards)
+    assert card is not None and "Persona 1" in card["names"]
+    assert os.path.exists(cards.path(card_key(card)))
+    taken = {r["cumple"][5:] for r in rows}
+    nobody = next(d for d in (date.fromordinal(DAY.toordinal() + i) for i in range(366))
+                  if d.strftime("%m-%d") not in taken)
+    assert await prepare_birthday_card(FakeSupabase(rows), nobody, cards) is None
+    started = time.perf_counter()
+    await cards.render(card)
+    print(f"prepare check passed: the card is on disk before the send time; render at send time "
+          f"{(time.perf_counter() - started) * 1e6:.0f} us")
+
+
+async def main_async(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        await bench_render(tmp)
+        fake = FakeTelegram()
+        await fake.start()
+        bot = Bot("123:bench", base_url=fake.base_url)
+        await bot.initialize()
+        await bench_send(fake, bot, tmp, args.chats)
+        await check_stale_file_id(fake, bot, tmp)
+        await check_outbox(fake, bot, tmp)
+        await check_card_fallback(fake, bot, tmp)
+        await check_prepare(tmp)
+        await bot.shutdown()
+        await fake.stop()
+        await RENDER.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=50)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
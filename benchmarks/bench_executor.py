@@ -0,0 +1,106 @@
+"""Burst test for the bounded blocking pool against the default executor.
+
+Fires a burst of concurrent blocking calls (a ``time.sleep`` standing in for a
+snapshot read or an HTML parse) through ``loop.run_in_executor`` on a plain
+thread pool and through a ``workers.BlockingPool`` with as many threads, and
+reports how long callers waited. The plain executor queues everything, so latency grows with the burst. The pool
+runs or queues a bounded number of calls and refuses the rest in microseconds.
+Also checks the pool's metrics, that a cancelled caller keeps its worker busy
+until the call ends, and that shutdown drops queued calls.
+
+    python benchmarks/bench_executor.py [--burst 200] [--call-ms 20] [--workers 4] [--queue 16]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import pathlib
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import metrics  # noqa: E402
+from workers import BlockingPool, PoolBusy  # noqa: E402
+
+
+def summary(label: str, latencies: list, rejected: list) -> None:
+    line = f"{label:>16}: {len(latencies)} ran"
+    if latencies:
+        latencies = sorted(latencies)
+        line += (f", p50 {statistics.median(latencies) * 1000:.0f} ms, "
+                 f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f} ms, "
+                 f"max {latencies[-1] * 1000:.0f} ms")
+    if rejected:
+        line += f"; {len(rejected)} refused in {max(rejected) * 1e6:.0f} us at most"
+    print(line)
+
+
+async def burst(run, size: int, call_s: float):
+    latencies, rejected = [], []
+
+    async def one():
+        started = time.perf_counter()
+        try:
+            await run(time.sleep, call_s)
+            latencies.append(time.perf_counter() - started)
+        except PoolBusy:
+            rejected.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(size)))
+    return latencies, rejected
+
+
+async def check(call_s: float) -> None:
+    registry = metrics.Registry()
+    pool = BlockingPool("check", max_workers=2, max_queue=1, registry=registry)
+    latencies, rejected = await burst(pool.run, 5, call_s)
+    assert (len(latencies), len(rejected)) == (3, 2), (latencies, rejected)
+    assert registry.counters[("bot_executor_rejected_total", (("pool", "check"),))] == 2
+    wait = registry.histogram("bot_executor_seconds", pool="check", task="sleep", stage="wait")
+    run = registry.histogram("bot_executor_seconds", pool="check", task="sleep", stage="run")
+    assert wait.count == run.count == 3 and wait.sum >= call_s * 0.9, (wait.sum, run.sum)
+    assert pool.pending == 0
+
+    # A caller that stops waiting does not free its worker before the call ends
+    call = asyncio.ensure_future(pool.run(time.sleep, call_s * 5))
+    await asyncio.sleep(call_s)
+    call.cancel()
+    await asyncio.sleep(0)
+    assert pool.pending == 1
+    while pool.pending:
+        await asyncio.sleep(call_s)
+
+    # Shutdown drops what is queued and waits for what runs
+    calls = [asyncio.ensure_future(pool.run(time.sleep, call_s)) for _ in range(3)]
+    await asyncio.sleep(call_s / 4)
+    await pool.shutdown()
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    assert sum(isinstance(r, asyncio.CancelledError) for r in results) == 1, results
+    print("pool checks passed: bounded queue, metrics, cancelled callers, shutdown")
+
+
+async def main_async(args) -> None:
+    call_s = args.call_ms / 1000
+    await check(call_s)
+    loop = asyncio.get_running_loop()
+    # Size the default executor like the pool, so only the queueing differs
+    default = concurrent.futures.ThreadPoolExecutor(args.workers)
+    summary("default executor", *await burst(lambda fn, *a: loop.run_in_executor(default, fn, *a), args.burst, call_s))
+    default.shutdown()
+    pool = BlockingPool("bench", max_workers=args.workers, max_queue=args.queue, registry=metrics.Registry())
+    summary("BlockingPool", *await burst(pool.run, args.burst, call_s))
+    await pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--call-ms", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=16)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Peak memory and time of "who's today" on a large table: one unbounded select vs keyset pages.
+
+Runs against benchmarks/fake_postgrest.py with a synthetic ``Cumples`` table
+(1M rows by default). Time is measured on a plain run, peak memory of the
+client process on a second run under tracemalloc.
+
+Run from the repository root:  python benchmarks/bench_fetch.py [--rows 1000000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import pathlib
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from bday import fetch_birthdays_on  # noqa: E402
+from fake_postgrest import serve  # noqa: E402
+from records import normalize  # noqa: E402
+from supabase_client import SupabaseClientManager  # noqa: E402
+
+DAY = date(2026, 3, 14)
+
+
+async def unbounded(client: SupabaseClientManager):
+    resp = await client.postgrest.table("Cumples").select("id,nombre,cumple").execute()
+    return [r for r in normalize(resp.data) if (r.month, r.day) == (DAY.month, DAY.day)]
+
+
+async def paged(client: SupabaseClientManager):
+    return await fetch_birthdays_on(client, [DAY])
+
+
+async def measure(name: str, url: str, fn, page_size: int) -> dict:
+    client = SupabaseClientManager(url, "bench-key", rest_url=url, timeout=300, page_size=page_size)
+    started = time.perf_counter()
+    matches = await fn(client)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    await fn(client)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await client.close()
+    return {"mode": name, "matches": len(matches), "seconds": elapsed, "peak_mb": peak / 2**20}
+
+
+async def run(rows: int = 1_000_000, page_size: int = 1000) -> list:
+    with serve(rows) as url:
+        results = [
+            await measure("unbounded", url, unbounded, page_size),
+            await measure("keyset_pages", url, paged, page_size),
+        ]
+    assert results[0]["matches"] == results[1]["matches"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    for result in asyncio.run(run(args.rows, args.page_size)):
+        print(json.dumps(result))
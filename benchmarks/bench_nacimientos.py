@@ -0,0 +1,81 @@
+"""Parity check and benchmark: streaming Nacimientos extractor vs the BeautifulSoup path.
+
+Run from the repository root:  python benchmarks/bench_nacimientos.py
+"""
+import pathlib
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from nacimientos import extract_births  # noqa: E402
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+
+def extract_births_soup(html_content: str):
+    """The previous BeautifulSoup-based extraction from rand_wiki, kept as the reference."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    nacimientos_span = soup.find('span', id='Nacimientos')
+    if not nacimientos_span:
+        for heading in soup.find_all(['h2', 'h3', 'span']):
+            if 'Nacimientos' in heading.get_text():
+                nacimientos_span = heading
+                break
+
+    if not nacimientos_span:
+        return []
+
+    if nacimientos_span.name in ['h2', 'h3']:
+        nacimientos_heading = nacimientos_span
+    else:
+        nacimientos_heading = nacimientos_span.find_parent(['h2', 'h3'])
+
+    births = []
+    if nacimientos_heading:
+        next_section = nacimientos_heading.find_next(['h2', 'h3'])
+        current = nacimientos_heading
+        while current and current != next_section:
+            current = current.find_next()
+            if current == next_section:
+                break
+            if current and current.name == 'ul':
+                for li in current.find_all('li', recursive=False):
+                    text = li.get_text(strip=True)
+                    if text:
+                        births.append(text)
+                if births:
+                    break
+    else:
+        ul_element = nacimientos_span.find_next('ul')
+        if ul_element:
+            for li in ul_element.find_all('li', recursive=False):
+                text = li.get_text(strip=True)
+                if text:
+                    births.append(text)
+    return births
+
+
+def check_parity() -> None:
+    for path in sorted(FIXTURES.glob("*.html")):
+        html_content = path.read_text(encoding="utf-8")
+        expected = extract_births_soup(html_content)
+        got = extract_births(html_content)
+        assert got == expected, f"{path.name}: streaming parser differs from BeautifulSoup"
+        print(f"parity ok  {path.name}: {len(got)} entries")
+
+
+def bench(number: int = 20) -> None:
+    for path in sorted(FIXTURES.glob("*.html")):
+        html_content = path.read_text(encoding="utf-8")
+        soup = min(timeit.repeat(lambda: extract_births_soup(html_content), number=number, repeat=3)) / number
+        stream = min(timeit.repeat(lambda: extract_births(html_content), number=number, repeat=3)) / number
+        print(f"{path.name}: bs4 {soup * 1000:.2f} ms, streaming {stream * 1000:.2f} ms ({soup / stream:.1f}x)")
+
+
+if __name__ == "__main__":
+    check_parity()
+    bench()
@@ -0,0 +1,200 @@
+"""Check the announcement outbox against a fake Bot that fails intermittently.
+
+Queues one message per chat and drains it with ``OutboxDrainer`` while the
+fake Bot raises network errors, flood control and a ban at random, then
+asserts that every reachable chat got its message exactly once:
+
+- with random transient failures;
+- across restarts: the drainer is stopped mid-way and a new outbox on the same
+  file finishes the work;
+- through a full outage: the backlog goes out in batches once Telegram is back;
+- with a ``RetryAfter``: nothing is sent until the wait is over;
+- and nothing past its expiry is sent;
+- an outbox that can't be opened is replaced by ``DirectOutbox``, which sends
+  at once and does not send a chat's message twice.
+
+    python benchmarks/bench_outbox.py [--chats 60] [--failure-rate 0.3] [--seed 1]
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import pathlib
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import metrics  # noqa: E402
+from outbox import DirectOutbox, Outbox, OutboxDrainer  # noqa: E402
+from telegram.error import Forbidden, NetworkError, RetryAfter, TimedOut  # noqa: E402
+
+DAY = date(2026, 4, 1)
+BANNED = 7
+
+
+class FlakyBot:
+    """Records delivered messages; fails ``failure_rate`` of the calls with a transient error."""
+
+    def __init__(self, failure_rate: float = 0.0, seed: int = 1):
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.delivered = collections.Counter()
+        self.sent_at = []
+        self.down = False
+        self.flood: float | None = None
+        self.calls = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.001)
+        if chat_id == BANNED:
+            raise Forbidden("bot was blocked by the user")
+        if self.flood is not None:
+            wait, self.flood = self.flood, None
+            raise RetryAfter(timedelta(seconds=wait))
+        if self.down or self.random.random() < self.failure_rate:
+            raise self.random.choice([NetworkError("connection reset"), TimedOut()])
+        self.delivered[(chat_id, text)] += 1
+        self.sent_at.append(time.monotonic())
+
+
+def make_drainer(outbox: Outbox, bot: FlakyBot) -> OutboxDrainer:
+    drainer = OutboxDrainer(outbox, bot, batch_size=20, backoff=0.02, max_backoff=0.2, registry=metrics.Registry())
+    # Per-chat and global rate limits are not what is tested here
+    drainer.sender.global_bucket.rate = drainer.sender.global_bucket.capacity = 10000
+    drainer.sender.per_chat_rate = 10000
+    return drainer
+
+
+def statuses(path) -> collections.Counter:
+    with sqlite3.connect(path) as conn:
+        return collections.Counter(dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")))
+
+
+async def settle(path, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while statuses(path).get("pending"):
+        assert time.monotonic() < deadline, statuses(path)
+        await asyncio.sleep(0.01)
+
+
+async def check_flaky(tmp: pathlib.Path, chats: int, failure_rate: float, seed: int) -> None:
+    path = str(tmp / "flaky.sqlite3")
+    outbox, bot = Outbox(path), FlakyBot(failure_rate, seed)
+    drainer = make_drainer(outbox, bot)
+    await drainer.start()
+    started = time.perf_counter()
+    await outbox.enqueue(DAY, [(chat_id, f"hola {chat_id}") for chat_id in range(1, chats + 1)])
+    queued = time.perf_counter() - started
+    # Queued again (a repeated job, a catch-up): ignored
+    assert await outbox.enqueue(DAY, [(chat_id, f"hola {chat_id}") for chat_id in range(1, chats + 1)]) == 0
+    await settle(path)
+    delivered = time.perf_counter() - started
+    await drainer.stop()
+    await outbox.close()
+    assert set(bot.delivered.values()) == {1} and len(bot.delivered) == chats - 1, bot.delivered
+    assert statuses(path) == {"sent": chats - 1, "failed": 1}, statuses(path)
+    print(f"flaky bot ({failure_rate:.0%} failures): {chats - 1} chats got exactly one message, "
+          f"{bot.calls} send calls; queueing took {queued * 1000:.1f} ms, delivery {delivered * 1000:.0f} ms")
+
+
+async def check_restarts(tmp: pathlib.Path, chats: int, failure_rate: float, seed: int) -> None:
+    path = str(tmp / "restarts.sqlite3")
+    bot = FlakyBot(failure_rate, seed)
+    await Outbox(path).enqueue(DAY, [(chat_id, "hola") for chat_id in range(1, chats + 1)])
+    restarts = 0
+    while statuses(path).get("pending"):
+        outbox = Outbox(path)
+        drainer = make_drainer(outbox, bot)
+        await drainer.start()
+        await asyncio.sleep(0.02)  # "crash" after a short while
+        await drainer.stop()
+        await outbox.close()
+        restarts += 1
+    assert set(bot.delivered.values()) == {1} and len(bot.delivered) == chats - 1, bot.delivered
+    print(f"restarts: delivered exactly once across {restarts} drainer restarts")
+
+
+async def check_outage(tmp: pathlib.Path, chats: int) -> None:
+    path = str(tmp / "outage.sqlite3")
+    outbox, bot = Outbox(path), FlakyBot()
+    bot.down = True
+    drainer = make_drainer(outbox, bot)
+    await drainer.start()
+    await outbox.enqueue(DAY, [(chat_id, "hola") for chat_id in range(1, chats + 1)])
+    await asyncio.sleep(1.0)  # rows back off up to max_backoff while Telegram is down
+    assert not bot.delivered
+    bot.down = False
+    back = time.monotonic()
+    await settle(path)
+    await drainer.stop()
+    await outbox.close()
+    assert len(bot.delivered) == chats - 1
+    print(f"outage: {chats - 1} queued messages delivered {(max(bot.sent_at) - back) * 1000:.0f} ms "
+          f"after Telegram came back")
+
+
+async def check_flood_and_expiry(tmp: pathlib.Path) -> None:
+    path = str(tmp / "flood.sqlite3")
+    outbox, bot = Outbox(path), FlakyBot()
+    drainer = make_drainer(outbox, bot)
+    drainer.batch_size = 1
+    bot.flood = 0.3
+    await outbox.enqueue(DAY, [(1, "hola"), (2, "hola"), (3, "hola")])
+    await outbox.enqueue(DAY - timedelta(days=1), [(4, "ayer")], expires_at=time.time() - 1)
+    started = time.monotonic()
+    await drainer.start()
+    await settle(path)
+    await drainer.stop()
+    await outbox.close()
+    assert min(bot.sent_at) - started >= 0.3, bot.sent_at  # nothing went out during the wait
+    assert (4, "ayer") not in bot.delivered and statuses(path)["expired"] == 1
+    print("flood control and expiry checks passed")
+
+
+async def check_direct(tmp: pathlib.Path) -> None:
+    try:
+        Outbox(str(tmp / "missing" / "outbox.sqlite3"))
+    except sqlite3.Error:
+        pass
+    else:
+        raise AssertionError("an outbox in a missing directory opened")
+    bot = FlakyBot()
+    outbox = DirectOutbox(bot, registry=metrics.Registry())
+    outbox.sender.global_bucket.rate = outbox.sender.global_bucket.capacity = 10000
+    outbox.sender.per_chat_rate = 10000
+    messages = [(chat_id, "hola") for chat_id in (1, 2, BANNED)]
+    assert await outbox.enqueue(DAY, messages) == 3
+    assert await outbox.missing([1, 2, BANNED], DAY) == [BANNED]
+    await outbox.enqueue(DAY, messages)
+    assert bot.delivered == {(1, "hola"): 1, (2, "hola"): 1}, bot.delivered
+    print("direct checks passed: without an outbox file, each reachable chat got its message once")
+
+
+async def main_async(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        await check_flaky(tmp, args.chats, args.failure_rate, args.seed)
+        await check_restarts(tmp, args.chats, args.failure_rate, args.seed)
+        await check_outage(tmp, args.chats)
+        await check_flood_and_expiry(tmp)
+        await check_direct(tmp)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=60)
+    parser.add_argument("--failure-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
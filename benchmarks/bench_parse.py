@@ -0,0 +1,69 @@
+"""Micro-benchmark: per-row date parsing vs the normalization layer in records.py.
+
+Builds synthetic ``Cumples`` result sets (10k and 100k rows, mixed date formats)
+and times the old "who's today" scan (field lookup twice per row + parse_date)
+against ``normalize`` + a month/day filter. Timings are the best of three
+runs, so the parse memo is warm, as it is between fetches in the bot.
+
+Run from the repository root:  python benchmarks/bench_parse.py
+"""
+import pathlib
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from records import _get_date_field, normalize, parse_date  # noqa: E402
+
+FORMATS = ["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%d/%m/%Y", "%d-%m-%Y"]
+
+
+def synthetic_rows(n: int, seed: int = 8, formats=FORMATS) -> list:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        dt = datetime(rnd.randint(1950, 2010), rnd.randint(1, 12), rnd.randint(1, 28))
+        # Mostly ISO dates, as PostgREST returns them, plus some legacy free-text ones
+        fmt = formats[0] if rnd.random() < 0.8 else rnd.choice(formats)
+        rows.append({"id": i, "nombre": f"Persona {i}", "cumple": dt.strftime(fmt)})
+    return rows
+
+
+def legacy_todays(users, today):
+    def is_today(date_str):
+        dt = parse_date(date_str)
+        return bool(dt) and dt.month == today.month and dt.day == today.day
+
+    return [u for u in users if _get_date_field(u) and is_today(_get_date_field(u))]
+
+
+def normalized_todays(users, today):
+    return [r for r in normalize(users) if r.month == today.month and r.day == today.day]
+
+
+def _best(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(sizes=(10_000, 100_000)) -> list:
+    today = datetime.now().date()
+    results = []
+    for n in sizes:
+        rows = synthetic_rows(n)
+        assert [u["id"] for u in legacy_todays(rows, today)] == [r.id for r in normalized_todays(rows, today)]
+        legacy = _best(legacy_todays, rows, today)
+        fast = _best(normalized_todays, rows, today)
+        results.append({"rows": n, "legacy_ms": legacy * 1000, "normalized_ms": fast * 1000, "speedup": legacy / fast})
+    return results
+
+
+if __name__ == "__main__":
+    for r in run():
+        print(f"{r['rows']:>7} rows: legacy {r['legacy_ms']:.1f} ms, normalized {r['normalized_ms']:.1f} ms ({r['speedup']:.1f}x)")
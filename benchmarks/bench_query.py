@@ -0,0 +1,145 @@
+"""Bytes and latency of "who's today" and "next birthday": server-side filtering vs scanning ``Cumples``.
+
+Runs against benchmarks/fake_postgrest.py with a synthetic ``Cumples`` table
+(1M rows by default), standing in for Supabase with and without the
+``cumple_md`` migration:
+
+- today: ``fetch_birthdays_on`` with ``SUPABASE_QUERY_MODE=client`` (every row
+  paged down and filtered here) vs ``server`` (only the day's rows come back);
+- next birthday: loading the whole table into ``BirthdayIndex`` (what a cold
+  /getCumple waited for) vs ``fetch_next_birthday``'s two range queries;
+- fallback: in ``auto`` mode against an unmigrated table, results match and
+  the client switches to scanning after one failed request.
+
+The next birthday from the range queries is also checked against
+``BirthdayIndex`` for every day of a common and a leap year on a sparse table:
+the first 702 synthetic rows (including Feb 28 and Feb 29 birthdays) minus
+those born in December, so there are days without birthdays and a year wrap.
+
+Run from the repository root:  python benchmarks/bench_query.py [--rows 1000000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import pathlib
+import sys
+import time
+from datetime import date
+
+import httpx
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from bday import BirthdayIndex, fetch_birthdays_on, fetch_next_birthday, get_next_birthday  # noqa: E402
+from fake_postgrest import make_row, serve  # noqa: E402
+from supabase_client import SupabaseClientManager  # noqa: E402
+
+DAY = date(2026, 3, 14)
+# Synthetic row 702 is born on 1992-02-29; rows 189 and 554 on Feb 28
+SPARSE_IDS = [i for i in range(1, 703) if make_row(i)["cumple"][5:7] != "12"]
+
+
+def make_client(url: str, mode: str) -> SupabaseClientManager:
+    return SupabaseClientManager(url, "bench-key", rest_url=url, timeout=300, query_mode=mode)
+
+
+async def measure(url: str, fn) -> tuple:
+    """Run ``fn()`` and return ``(result, seconds, requests, bytes)`` as seen by the server."""
+    async with httpx.AsyncClient() as http:
+        before = (await http.get(f"{url}/_stats")).json()
+        started = time.perf_counter()
+        result = await fn()
+        elapsed = time.perf_counter() - started
+        after = (await http.get(f"{url}/_stats")).json()
+    return result, elapsed, after["requests"] - before["requests"], after["bytes_sent"] - before["bytes_sent"]
+
+
+def report(query: str, mode: str, rows: int, elapsed: float, requests: int, sent: int, **extra) -> dict:
+    result = {"query": query, "mode": mode, "rows": rows, "ms": round(elapsed * 1000, 1),
+              "requests": requests, "kb": round(sent / 1024, 1)}
+    result.update(extra)
+    print(json.dumps(result))
+    return result
+
+
+async def today(url: str, rows: int) -> None:
+    found = {}
+    for mode in ("client", "server"):
+        client = make_client(url, mode)
+        await fetch_birthdays_on(client, [DAY])  # open the connection
+        records, elapsed, requests, sent = await measure(url, lambda: fetch_birthdays_on(client, [DAY]))
+        await client.close()
+        found[mode] = sorted(r.id for r in records)
+        report("today", mode, rows, elapsed, requests, sent, matches=len(records))
+    assert found["client"] == found["server"]
+
+
+async def next_birthday(url: str, rows: int) -> None:
+    client = make_client(url, "server")
+    await client.first_birthday_key(0)  # open the connection
+
+    async def full_table(day):
+        index = BirthdayIndex(client.fetch_birthdays)
+        return await get_next_birthday(index, day)
+
+    scanned, scan_s, scan_requests, scan_sent = await measure(url, lambda: full_table(DAY))
+    queried, query_s, query_requests, query_sent = await measure(url, lambda: fetch_next_birthday(client, DAY))
+    await client.close()
+    assert queried == scanned, (queried, scanned)
+    report("next_birthday", "full_table", rows, scan_s, scan_requests, scan_sent, people=1 + len(scanned["others"]))
+    report("next_birthday", "server", rows, query_s, query_requests, query_sent, people=1 + len(queried["others"]))
+
+
+async def every_day(url: str) -> None:
+    client = make_client(url, "server")
+    index = BirthdayIndex(client.fetch_birthdays)
+    wrapped = feb_29 = 0
+    for year in (2026, 2028):
+        day = date(year, 1, 1)
+        while day.year == year:
+            expected = await get_next_birthday(index, day)
+            assert await fetch_next_birthday(client, day) == expected, (day, expected)
+            wrapped += expected["date"][:4] != str(year)
+            feb_29 += day.year == 2026 and expected["date"] == "2026-02-28" and "Persona 702" in (
+                [expected["name"]] + expected["others"])
+            day = day.fromordinal(day.toordinal() + 1)
+    await client.close()
+    assert wrapped and feb_29, (wrapped, feb_29)
+    print(f"next birthday matches the index on every day of 2026 and 2028 ({wrapped} days wrap to the next year)")
+
+
+async def fallback(url: str) -> None:
+    client = make_client(url, "auto")
+    assert client.server_filter
+    assert await fetch_next_birthday(client, DAY) is None
+    assert not client.server_filter  # one "column does not exist" answer switches to scanning
+    scanning = make_client(url, "client")
+    assert ([r.id for r in await fetch_birthdays_on(client, [DAY])]
+            == [r.id for r in await fetch_birthdays_on(scanning, [DAY])])
+    await client.close()
+    await scanning.close()
+
+    client = make_client(url, "auto")
+    records = await fetch_birthdays_on(client, [DAY])
+    assert records and not client.server_filter
+    await client.close()
+    print("fallback checks passed: auto mode scans the table when cumple_md is missing")
+
+
+async def run(rows: int) -> None:
+    with serve(rows, migrated=True) as url:
+        await today(url, rows)
+        await next_birthday(url, rows)
+    with serve(migrated=True, ids=SPARSE_IDS) as url:
+        await every_day(url)
+    with serve(min(rows, 10_000)) as url:
+        await fallback(url)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    asyncio.run(run(args.rows))
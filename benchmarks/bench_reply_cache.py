@@ -0,0 +1,122 @@
+"""Check the /getCumple reply cache against a fake clock and time cached vs uncached replies.
+
+Drives ``ReplyCache`` over a real ``BirthdayIndex`` through a day, a midnight
+rollover, a table change and a failing rebuild, asserting what is served at
+each step; then compares rendering the reply on every request with serving it
+from the cache.
+
+    python benchmarks/bench_reply_cache.py [--rows 100000]
+"""
+import argparse
+import asyncio
+import pathlib
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+from bday import BirthdayIndex, get_next_birthday  # noqa: E402
+from fakes import FakeSupabase, synthetic_table  # noqa: E402
+from handlers import format_next_birthday  # noqa: E402
+from reply_cache import ReplyCache  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, **delta) -> None:
+        self.now += timedelta(**delta)
+
+
+def make_cache(index: BirthdayIndex, clock: FakeClock):
+    builds = []
+    fail = []
+
+    async def build(today):
+        builds.append(today)
+        if fail:
+            raise RuntimeError("backend down")
+        return format_next_birthday(await get_next_birthday(index, today))
+
+    return ReplyCache(build, version=lambda: index.version, clock=clock, retry_after=30), builds, fail
+
+
+async def check() -> None:
+    rows = [{"id": 1, "nombre": "Ana", "cumple": "1990-03-15"}, {"id": 2, "nombre": "Luis", "cumple": "1985-03-20"}]
+    client = FakeSupabase(rows)
+    index = BirthdayIndex(client.fetch_birthdays, ttl=3600)
+    await index.refresh()
+    clock = FakeClock(datetime(2026, 3, 14, 9, 0))
+    cache, builds, fail = make_cache(index, clock)
+
+    assert "Ana" in await cache.get() and "mañana" in await cache.get()
+    clock.advance(hours=14, minutes=59)  # 23:59, same day
+    await cache.get()
+    assert len(builds) == 1, builds
+
+    clock.advance(minutes=1)  # midnight rollover
+    assert cache.stale
+    assert (await cache.get()).startswith("Hoy es el cumpleaños de Ana")
+    assert len(builds) == 2
+
+    client.rows = rows + [{"id": 3, "nombre": "Eva", "cumple": "2000-03-15"}]
+    await index.refresh()  # table changed: version bump
+    assert "Ana y Eva" in await cache.get()
+    await index.refresh()  # same contents: no rebuild
+    await cache.get()
+    assert len(builds) == 3
+
+    # Next day the rebuild fails: yesterday's reply is served, retried after retry_after
+    clock.advance(days=1)
+    fail.append(True)
+    stale = await cache.get()
+    assert "Ana y Eva" in stale and len(builds) == 4
+    clock.advance(seconds=10)
+    assert await cache.get() == stale and len(builds) == 4
+    fail.clear()
+    clock.advance(seconds=25)
+    assert "Luis" in await cache.get() and len(builds) == 5
+
+    # The midnight job rebuilds ahead of the first request
+    clock.advance(days=1)
+    await cache.refresh()
+    await cache.get()
+    assert len(builds) == 6
+    print("reply cache checks passed")
+
+
+async def bench(rows: int, requests: int = 20000) -> None:
+    client = FakeSupabase(synthetic_table(rows))
+    index = BirthdayIndex(client.fetch_birthdays, ttl=3600)
+    await index.refresh()
+    cache, _, _ = make_cache(index, FakeClock(datetime.now()))
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        format_next_birthday(await get_next_birthday(index))
+    uncached = (time.perf_counter() - started) / requests
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await cache.get()
+    cached = (time.perf_counter() - started) / requests
+    print(f"{rows} rows: render per request {uncached * 1e6:.1f} us, cached {cached * 1e6:.1f} us "
+          f"({uncached / cached:.0f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(check())
+    asyncio.run(bench(args.rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Check the daily birthday announcement on a fake clock and time its send phase.
+
+Drives ``scheduler.DailyAnnouncement`` through DST changes, a failed
+preparation and restarts before and after the send time, asserting what is
+prepared and queued in the outbox at each step (delivery itself is covered by
+``bench_outbox.py``), and that Feb 29 birthdays are announced on Feb 28 in
+common years, from Supabase and from the snapshot. Then compares how
+long after the send time the message goes out when everything runs at the send
+time (the old job) and when it was prepared ahead.
+
+    python benchmarks/bench_scheduler.py [--prepare-delay 0.3]
+"""
+import argparse
+import asyncio
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from bday import prepare_birthday_messages  # noqa: E402
+from fakes import FakeSupabase  # noqa: E402
+from outbox import Outbox  # noqa: E402
+from scheduler import DailyAnnouncement  # noqa: E402
+from snapshot import BirthdaySnapshot  # noqa: E402
+
+MADRID = ZoneInfo("Europe/Madrid")
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def set(self, *args, tz=MADRID) -> None:
+        self.now = datetime(*args, tzinfo=tz)
+
+
+class Harness:
+    """A DailyAnnouncement whose preparations are recorded, queueing into an outbox at ``path``.
+
+    ``sent`` lists what this instance queued, so a new Harness on the same
+    path stands for the bot after a restart.
+    """
+
+    def __init__(self, path, clock, chat_ids=(1, 2), at=dtime(9, 0), prepare_delay=0.0, **kwargs):
+        self.path = path
+        self.prepared = []
+        self.fail_prepare = False
+        self.prepare_delay = prepare_delay
+        self._before = self._rows()
+        self.announcement = DailyAnnouncement("madrid", list(chat_ids), MADRID, at, self._prepare, Outbox(str(path)),
+                                              clock=clock, **kwargs)
+
+    def _rows(self):
+        if not pathlib.Path(self.path).exists():
+            return []
+        with sqlite3.connect(self.path) as conn:
+            return conn.execute("SELECT chat_id, text FROM outbox ORDER BY rowid").fetchall()
+
+    @property
+    def sent(self):
+        return self._rows()[len(self._before):]
+
+    async def _prepare(self, day: date):
+        self.prepared.append(day)
+        if self.prepare_delay:
+            await asyncio.sleep(self.prepare_delay)
+        if self.fail_prepare:
+            raise ConnectionError("supabase down")
+        return f"cumples {day}"
+
+
+class RecordingJobQueue:
+    def __init__(self):
+        self.daily = []
+        self.once = []
+
+    def run_daily(self, callback, time, name=None):
+        self.daily.append((name, time))
+
+    def run_once(self, callback, when, name=None):
+        self.once.append((name, when))
+
+
+def old_first_runs(now: datetime, at: dtime, days: int):
+    """Send times of the previous run_repeating(interval=1 day) job, in local time."""
+    local = now.astimezone(MADRID)
+    first = local.replace(hour=at.hour, minute=at.minute, second=0, microsecond=0)
+    if first <= local:
+        first += timedelta(days=1)
+    first = first.astimezone(timezone.utc)
+    return [(first + timedelta(days=i)).astimezone(MADRID) for i in range(days)]
+
+
+async def check(tmp: pathlib.Path) -> None:
+    clock = FakeClock(datetime(2026, 3, 27, 12, 0, tzinfo=MADRID))
+    h = Harness(tmp / "outbox.sqlite3", clock)
+    a = h.announcement
+
+    # DST: 09:00 stays 09:00 local across the spring and autumn changes
+    assert a.next_send(clock()) == datetime(2026, 3, 28, 9, 0, tzinfo=MADRID)
+    clock.set(2026, 3, 28, 9, 30)
+    spring = a.next_send(clock())
+    assert (spring.astimezone(MADRID).hour, spring.utcoffset()) == (9, timedelta(hours=2)), spring
+    clock.set(2026, 10, 24, 9, 30)
+    assert a.next_send(clock()).astimezone(timezone.utc).hour == 8
+    old = old_first_runs(datetime(2026, 3, 27, 12, 0, tzinfo=MADRID), dtime(9, 0), 3)
+    assert [t.hour for t in old] == [9, 10, 10], old  # what the fixed 24 h interval did
+
+    queue = RecordingJobQueue()
+    a.schedule(queue)
+    assert queue.daily == [("birthday:madrid", dtime(9, 0, tzinfo=MADRID)),
+                           ("birthday_prepare:madrid", dtime(8, 50, tzinfo=MADRID))], queue.daily
+    assert queue.once == [("birthday_catch_up:madrid", 0)]
+
+    # Normal day: prepared at 08:50, sent at 09:00 without preparing again
+    clock.set(2026, 4, 1, 8, 50)
+    await a.prepare_job()
+    clock.set(2026, 4, 1, 9, 0)
+    await a.send_job()
+    assert h.prepared == [date(2026, 4, 1)] and h.sent == [(1, "cumples 2026-04-01"), (2, "cumples 2026-04-01")]
+    await a.send_job()  # a repeated run sends nothing
+    assert len(h.sent) == 2
+
+    # The preparation fails: the send prepares again and goes out
+    h.fail_prepare = True
+    clock.set(2026, 4, 2, 8, 50)
+    await a.prepare_job()
+    h.fail_prepare = False
+    clock.set(2026, 4, 2, 9, 0)
+    await a.send_job()
+    assert h.prepared[-2:] == [date(2026, 4, 2)] * 2 and len(h.sent) == 4
+
+    # Chat 3 joins; a restart at 09:30 catches up on chat 3 only, a second restart queues nothing
+    clock.set(2026, 4, 3, 9, 0)
+    await a.send_job()
+    assert h.sent[-2:] == [(1, "cumples 2026-04-03"), (2, "cumples 2026-04-03")]
+    for minute in (30, 45):
+        clock.set(2026, 4, 3, 9, minute)
+        restarted = Harness(tmp / "outbox.sqlite3", clock, chat_ids=(1, 2, 3))
+        await restarted.announcement.catch_up()
+        assert restarted.sent == ([(3, "cumples 2026-04-03")] if minute == 30 else []), restarted.sent
+
+    # Down over the send time: caught up within the window, not after it or on the next day
+    for when, expected in (((2026, 4, 4, 14, 0), 2), ((2026, 4, 5, 16, 0), 0), ((2026, 4, 6, 8, 0), 0)):
+        clock.set(*when)
+        restarted = Harness(tmp / "outbox.sqlite3", clock)
+        await restarted.announcement.catch_up()
+        assert len(restarted.sent) == expected, (when, restarted.sent)
+    late = Harness(tmp / "late.sqlite3", clock, at=dtime(23, 50))
+    clock.set(2026, 4, 7, 0, 30)
+    await late.announcement.catch_up()
+    assert late.sent == []  # yesterday's announcement is not sent today
+
+    # Starting inside the prepare window prepares right away
+    clock.set(2026, 4, 8, 8, 55)
+    restarted = Harness(tmp / "outbox.sqlite3", clock)
+    await restarted.announcement.catch_up()
+    assert restarted.prepared == [date(2026, 4, 8)] and restarted.sent == []
+
+    # The catch-up and the daily job running together send once
+    clock.set(2026, 4, 9, 9, 0, 1)
+    both = Harness(tmp / "outbox.sqlite3", clock, prepare_delay=0.01)
+    await asyncio.gather(both.announcement.catch_up(), both.announcement.send_job())
+    assert len(both.sent) == 2 and both.prepared == [date(2026, 4, 9)], both.sent
+    print("scheduler checks passed: DST, prepare/send, failed preparation, catch-up without double sends")
+
+
+async def check_leap_day(tmp: pathlib.Path) -> None:
+    rows = [{"id": 1, "nombre": "Bisiesto", "cumple": "2000-02-29"}, {"id": 2, "nombre": "Marzo", "cumple": "1990-03-01"}]
+    snapshot = BirthdaySnapshot(str(tmp / "leap.sqlite3"))
+    snapshot.save(rows)
+    for client in (FakeSupabase(rows), FakeSupabase(rows, error=ConnectionError("supabase down"))):
+        async def prepare(day: date):
+            # No Wikipedia client: days without ours get the fallback text
+            messages = await prepare_birthday_messages(client, {None: day}, wiki_client=SimpleNamespace(),
+                                                       snapshot=snapshot)
+            return messages[None]
+
+        clock = FakeClock(datetime(2026, 2, 27, 12, 0, tzinfo=MADRID))
+        h = Harness(tmp / f"leap_{id(client)}.sqlite3", clock, chat_ids=(1,))
+        h.announcement.prepare = prepare
+        announced = {}
+        for day in (date(2026, 2, 28), date(2026, 3, 1), date(2028, 2, 28), date(2028, 2, 29)):
+            clock.set(day.year, day.month, day.day, 9, 0)
+            await h.announcement.send_job()
+            announced[day] = h.sent[-1][1]
+        assert "Bisiesto" in announced[date(2026, 2, 28)], announced
+        assert "Bisiesto" not in announced[date(2026, 3, 1)] and "Marzo" in announced[date(2026, 3, 1)], announced
+        assert "Bisiesto" not in announced[date(2028, 2, 28)], announced
+        assert "Bisiesto" in announced[date(2028, 2, 29)], announced
+    print("leap day checks passed: Feb 29 birthdays announced on Feb 28 in common years")
+
+
+async def bench(tmp: pathlib.Path, prepare_delay: float) -> None:
+    clock = FakeClock(datetime(2026, 4, 1, 8, 50, tzinfo=MADRID))
+    # Old job: fetch, render and send all at the send time
+    h = Harness(tmp / "bench_old.sqlite3", clock, prepare_delay=prepare_delay)
+    clock.set(2026, 4, 1, 9, 0)
+    started = time.perf_counter()
+    await h.announcement.send_job()
+    cold = time.perf_counter() - started
+
+    h = Harness(tmp / "bench_new.sqlite3", clock, prepare_delay=prepare_delay)
+    clock.set(2026, 4, 1, 8, 50)
+    await h.announcement.prepare_job()
+    clock.set(2026, 4, 1, 9, 0)
+    started = time.perf_counter()
+    await h.announcement.send_job()
+    warm = time.perf_counter() - started
+    print(f"send phase with a {prepare_delay * 1000:.0f} ms preparation: all at send time {cold * 1000:.1f} ms, "
+          f"prepared ahead {warm * 1000:.2f} ms")
+
+
+async def main_async(prepare_delay: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        await check(pathlib.Path(tmp))
+        await check_leap_day(pathlib.Path(tmp))
+        await bench(pathlib.Path(tmp), prepare_delay)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prepare-delay", type=float, default=0.3,
+                        help="simulated Supabase + Wikipedia time of a preparation, in seconds")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.prepare_delay))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Several bot processes on one host: the shared SQLite cache and the leader lock, in real processes.
+
+Runs against benchmarks/fake_postgrest.py (``--rows`` synthetic ``Cumples``
+rows, 100k by default) with ``--workers`` separate Python processes:
+
+- leader: exactly one process gets ``LeaderLock``; when it is killed, one of
+  the others takes over within a retry;
+- Supabase traffic: each worker loads ``BirthdayIndex`` through
+  ``fetch_birthdays``, first without a cache (every worker downloads the
+  table), then with a ``SQLiteCache`` one process filled (the others make no
+  request at all);
+- versions: a new ``put`` from one process is seen by the others with its
+  version bumped, and an entry past its TTL reads as a miss;
+- reads: the cost of ``get`` while the version is unchanged (the value this
+  process already decoded) vs decoding the blob again, and of reloading the
+  index from an unchanged entry.
+
+Run from the repository root:  python benchmarks/bench_shared_cache.py [--rows 100000] [--workers 4]
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from bday import ROWS_KEY, BirthdayIndex, fetch_birthdays  # noqa: E402
+from cache import LeaderLock, SQLiteCache  # noqa: E402
+from fake_postgrest import serve  # noqa: E402
+from supabase_client import SupabaseClientManager  # noqa: E402
+
+# Separate interpreters, like separately started bot processes
+MP = multiprocessing.get_context("spawn")
+
+
+def stats(url: str) -> dict:
+    return httpx.get(f"{url}/_stats").json()
+
+
+def contender(path: str, stop: str, results) -> None:
+    """Try to lead every 50 ms until the ``stop`` file exists; report (pid, time) on becoming leader."""
+    # A file, not a multiprocessing.Event: killing a process waiting on an Event breaks the Event
+    lock = LeaderLock(path)
+    reported = False
+    while not os.path.exists(stop):
+        if not reported and lock.acquire():
+            results.put((os.getpid(), time.time()))
+            reported = True
+        time.sleep(0.05)
+
+
+def check_leader(tmp: str, workers: int) -> None:
+    path = os.path.join(tmp, "leader.lock")
+    stop = os.path.join(tmp, "stop")
+    results = MP.Queue()
+    processes = [MP.Process(target=contender, args=(path, stop, results)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    pid, _ = results.get(timeout=60)
+    time.sleep(0.5)
+    assert results.empty(), "more than one leader"
+    assert int(pathlib.Path(path).read_text()) == pid
+
+    leader = next(p for p in processes if p.pid == pid)
+    killed = time.time()
+    leader.kill()  # no cleanup runs: the kernel drops the lock with the process
+    leader.join()
+    new_pid, took_over = results.get(timeout=60)
+    time.sleep(0.5)
+    assert new_pid != pid and results.empty()
+    pathlib.Path(stop).touch()
+    for p in processes:
+        p.join()
+    print(f"leader checks passed: 1 of {workers} processes leads; after a kill -9 another took over "
+          f"in {(took_over - killed) * 1000:.0f} ms")
+
+
+def worker(url: str, cache_path: str, reloads: int, results) -> None:
+    """One bot process: load the birthday index ``1 + reloads`` times, report the timings."""
+    async def run():
+        client = SupabaseClientManager(url, "bench-key", rest_url=url, timeout=300)
+        cache = SQLiteCache(cache_path) if cache_path else None
+        index = BirthdayIndex(functools.partial(fetch_birthdays, client, None, cache), ttl=0)
+        started = time.perf_counter()
+        await index.refresh()
+        first = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(reloads):
+            await index.refresh()
+        again = (time.perf_counter() - started) / max(1, reloads)
+        await client.close()
+        results.put({"pid": os.getpid(), "first_ms": first * 1000, "reload_ms": again * 1000,
+                     "today": len(index.today())})
+
+    logging.disable(logging.WARNING)
+    asyncio.run(run())
+
+
+def run_workers(url: str, cache_path: str, workers: int, reloads: int) -> list:
+    results = MP.Queue()
+    processes = [MP.Process(target=worker, args=(url, cache_path, reloads, results)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    out = [results.get(timeout=600) for _ in processes]
+    for p in processes:
+        p.join()
+    return out
+
+
+async def fill_cache(url: str, cache_path: str) -> None:
+    """The leader's refresh job: fetch the table once and store it in the cache."""
+    client = SupabaseClientManager(url, "bench-key", rest_url=url, timeout=300)
+    cache = SQLiteCache(cache_path)
+    await fetch_birthdays(client, None, cache, refresh=True)
+    await client.close()
+    cache.close()
+
+
+def check_traffic(url: str, tmp: str, rows: int, workers: int, reloads: int) -> None:
+    for label in ("no_cache", "shared_cache"):
+        cache_path = os.path.join(tmp, "cache.sqlite3") if label == "shared_cache" else ""
+        if cache_path:
+            # The leader's refresh job: fetch once and fill the cache
+            asyncio.run(fill_cache(url, cache_path))
+        before = stats(url)
+        results = run_workers(url, cache_path, workers, reloads)
+        after = stats(url)
+        requests = after["requests"] - before["requests"]
+        assert len({r["today"] for r in results}) == 1
+        if cache_path:
+            assert requests == 0, requests
+        print(json.dumps({
+            "check": "supabase_traffic", "mode": label, "rows": rows, "workers": workers,
+            "requests": requests, "mb_sent": round((after["bytes_sent"] - before["bytes_sent"]) / 1e6, 1),
+            "first_load_ms": round(max(r["first_ms"] for r in results), 1),
+            "reload_ms": round(max(r["reload_ms"] for r in results), 3),
+        }))
+
+
+def reader(path: str, key: str, results) -> None:
+    entry = SQLiteCache(path).get(key)
+    results.put(entry and (entry.value, entry.version))
+
+
+def check_versions(tmp: str) -> None:
+    path = os.path.join(tmp, "versions.sqlite3")
+    cache = SQLiteCache(path)
+    results = MP.Queue()
+
+    def read_elsewhere(key):
+        p = MP.Process(target=reader, args=(path, key, results))
+        p.start()
+        p.join()
+        return results.get(timeout=60)
+
+    assert cache.put("k", {"n": 1}) == 1
+    assert read_elsewhere("k") == ({"n": 1}, 1)
+    assert cache.put("k", {"n": 2}) == 2
+    assert read_elsewhere("k") == ({"n": 2}, 2)
+    cache.put("short", [1], ttl=0.2)
+    time.sleep(0.3)
+    assert cache.get("short") is None and read_elsewhere("short") is None
+    cache.close()
+    print("version checks passed: other processes see each put with its version bumped; expired entries miss")
+
+
+def check_reads(tmp: str, rows: int) -> None:
+    path = os.path.join(tmp, "cache.sqlite3")
+    cache = SQLiteCache(path)
+    entry = cache.get(ROWS_KEY)
+    assert entry is not None and len(entry.value) == rows
+    n = 200
+    started = time.perf_counter()
+    for _ in range(n):
+        assert cache.get(ROWS_KEY).value is entry.value
+    unchanged = (time.perf_counter() - started) / n
+    started = time.perf_counter()
+    for _ in range(5):
+        cache._decoded.clear()
+        cache.get(ROWS_KEY)
+    decoded = (time.perf_counter() - started) / 5
+    cache.close()
+    print(json.dumps({"check": "cache_get", "rows": rows, "unchanged_version_us": round(unchanged * 1e6, 1),
+                      "decode_ms": round(decoded * 1000, 1), "blob_mb": round(os.path.getsize(path) / 1e6, 1)}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--reloads", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        check_leader(tmp, args.workers)
+        check_versions(tmp)
+        with serve(args.rows) as url:
+            check_traffic(url, tmp, args.rows, args.workers, args.reloads)
+        check_reads(tmp, args.rows)
+
+
+if __name__ == "__main__":
+    main()
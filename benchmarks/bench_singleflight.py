@@ -0,0 +1,76 @@
+"""Load test for the single-flight layer on Supabase reads.
+
+Fires bursts of concurrent ``/getCumple`` loads (``fetch_birthdays``) and
+birthday job reads (``fetch_birthdays_on``) at a fake Supabase with a simulated
+round trip, and counts the backend requests with and without coalescing. Also
+checks that a failing backend raises in every caller of a burst.
+
+    python benchmarks/bench_singleflight.py [--burst 20] [--bursts 5] [--delay 0.05]
+"""
+import argparse
+import asyncio
+import datetime
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import bday  # noqa: E402
+from fakes import FakeSupabase, synthetic_table  # noqa: E402
+
+
+async def burst(client, size: int, coalesce: bool) -> None:
+    today = [datetime.date.today()]
+    calls = []
+    for i in range(size):
+        if i % 4 == 0:  # the job / /testBirthday overlapping with the commands
+            calls.append(bday.fetch_birthdays_on(client, today) if coalesce else bday._stream_birthdays_on(
+                client, frozenset((d.month, d.day) for d in today)))
+        else:
+            calls.append(bday.fetch_birthdays(client) if coalesce else client.fetch_birthdays())
+    await asyncio.gather(*calls)
+
+
+async def run(burst_size: int, bursts: int, delay: float, rows: int) -> None:
+    for coalesce in (False, True):
+        client = FakeSupabase(synthetic_table(rows), page_size=rows, delay=delay)
+        flights = bday.SingleFlight("bench")
+        bday.supabase_reads, saved = flights, bday.supabase_reads
+        started = time.perf_counter()
+        try:
+            for _ in range(bursts):
+                await burst(client, burst_size, coalesce)
+        finally:
+            bday.supabase_reads = saved
+        elapsed = time.perf_counter() - started
+        label = "single-flight" if coalesce else "direct"
+        print(f"{label:>13}: {bursts} bursts x {burst_size} callers -> {client.calls} backend requests "
+              f"(real={flights.real}, coalesced={flights.coalesced}), {elapsed:.2f} s")
+
+
+async def check_errors(burst_size: int) -> None:
+    client = FakeSupabase([], delay=0.01, error=ConnectionError("supabase down"))
+    results = await asyncio.gather(*(bday.fetch_birthdays(client) for _ in range(burst_size)), return_exceptions=True)
+    assert client.calls == 1, client.calls
+    assert all(isinstance(r, ConnectionError) for r in results), results
+    # The next call after the failed flight goes to the backend again
+    client.error = None
+    assert await bday.fetch_birthdays(client) == [] and client.calls == 2
+    print(f"error check passed: 1 failing request, raised in all {burst_size} callers")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.05, help="simulated round trip in seconds")
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.burst, args.bursts, args.delay, args.rows))
+    asyncio.run(check_errors(args.burst))
+
+
+if __name__ == "__main__":
+    main()
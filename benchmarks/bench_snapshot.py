@@ -0,0 +1,153 @@
+"""Checks and timings for the local SQLite snapshot of ``Cumples``.
+
+Runs against a fake Supabase that can be made to fail:
+
+- a successful fetch is saved; while the backend fails, reads and the
+  birthday job are served from the snapshot, until it exceeds its age limit,
+  after which the job sends nothing instead of a Wikipedia birthday;
+- a restarted index answers from the snapshot before Supabase responds;
+- "today" through the (month, day) index (what ``fetch_birthdays_on`` falls
+  back to) agrees with a scan of the normalized rows on a synthetic table,
+  including Feb 28/29, and is timed against that scan.
+
+    python benchmarks/bench_snapshot.py [--rows 100000]
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import bday  # noqa: E402
+from config import BirthdayChat  # noqa: E402
+from fakes import FakeSupabase, bench_config, synthetic_table  # noqa: E402
+from records import normalize  # noqa: E402
+from snapshot import BirthdaySnapshot  # noqa: E402
+
+MEMBERS = [
+    {"id": 1, "nombre": "Ana", "cumple": "1990-03-14"},
+    {"id": 2, "nombre": "Luis", "cumple": "1985-07-01"},
+    {"id": 3, "nombre": "Eva", "cumple": "2000-02-29"},
+]
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+async def run_job(client, snapshot, today: datetime.date) -> list:
+    bot = FakeBot()
+    config = bench_config(BIRTHDAY_CHATS=[BirthdayChat(-100)])
+    real_today = bday._today_in
+    bday._today_in = lambda tz: today
+    try:
+        await bday.birthday_job(SimpleNamespace(bot=bot), config, client, births_store=None,
+                                wiki_client=SimpleNamespace(), snapshot=snapshot)
+    finally:
+        bday._today_in = real_today
+    return bot.sent
+
+
+async def check_outage(tmp: pathlib.Path) -> None:
+    day = datetime.date(2026, 3, 14)
+    client = FakeSupabase(list(MEMBERS))
+    snapshot = BirthdaySnapshot(str(tmp / "outage.sqlite3"), max_age=3600)
+
+    assert await bday.fetch_birthdays(client, snapshot) == MEMBERS
+    assert snapshot.info()[0] == 1
+
+    client.error = ConnectionError("supabase down")
+    served = await bday.fetch_birthdays(client, snapshot)
+    assert [(r.name, r.month, r.day) for r in normalize(served)] == [(r.name, r.month, r.day) for r in normalize(MEMBERS)]
+    assert await run_job(client, snapshot, day) == [(-100, "Hoy es el cumpleaños de Ana! 🎉🎂")]
+
+    # Past the age limit: nothing is announced, and the error reaches the caller
+    snapshot.max_age = 0
+    assert await run_job(client, snapshot, day) == []
+    try:
+        await bday.fetch_birthdays(client, snapshot)
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError("stale snapshot was served")
+    assert await run_job(client, None, day) == []
+    print("outage checks passed: snapshot served while fresh, job skipped once stale")
+
+
+async def check_warm_start(tmp: pathlib.Path) -> None:
+    snapshot = BirthdaySnapshot(str(tmp / "warm.sqlite3"))
+    await bday.fetch_birthdays(FakeSupabase(list(MEMBERS)), snapshot)
+
+    # After a restart, with Supabase slow to answer
+    slow = FakeSupabase(list(MEMBERS), delay=2.0)
+    index = bday.BirthdayIndex(lambda: bday.fetch_birthdays(slow, snapshot), ttl=300,
+                               warm=lambda: bday.read_snapshot(snapshot, "rows"))
+    started = time.perf_counter()
+    found = await bday.get_next_birthday(index, datetime.date(2026, 6, 30))
+    elapsed = time.perf_counter() - started
+    assert found["name"] == "Luis" and elapsed < 0.5, (found, elapsed)
+    assert index._refresh_task is not None  # the remote reload runs in the background
+    index._refresh_task.cancel()
+    print(f"warm start: first answer in {elapsed * 1000:.1f} ms with Supabase taking 2 s")
+
+
+async def check_queries(tmp: pathlib.Path, rows: int) -> None:
+    table = synthetic_table(rows) + MEMBERS
+    snapshot = BirthdaySnapshot(str(tmp / "queries.sqlite3"))
+    started = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(None, snapshot.save, table)
+    save = time.perf_counter() - started
+
+    days = [datetime.date(2026, 1, 1), datetime.date(2026, 2, 28), datetime.date(2028, 2, 28),
+            datetime.date(2028, 2, 29), datetime.date(2026, 3, 14), datetime.date(2026, 12, 31)]
+    records = normalize(table)
+    for day in days:
+        assert sorted(r.id for r in snapshot.on([day])) == sorted(r.id for r in bday._today_on(records, day)), day
+
+    with sqlite3.connect(snapshot.path) as conn:
+        plan = " ".join(str(r) for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id, name, month, day FROM birthdays WHERE month = 3 AND day = 14"))
+    assert "birthdays_month_day" in plan, plan
+
+    day = datetime.date(2026, 3, 14)
+
+    def timed(fn, number=20):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return (time.perf_counter() - started) / number * 1000
+
+    print(f"{len(table)} rows: save {save * 1000:.0f} ms; today: indexed {timed(lambda: snapshot.on([day])):.2f} ms, "
+          f"scan of normalized rows {timed(lambda: bday._today_on(records, day)):.2f} ms")
+
+
+async def main_async(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        await check_outage(tmp)
+        await check_warm_start(tmp)
+        await check_queries(tmp, rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+    asyncio.run(main_async(args.rows))
+
+
+if __name__ == "__main__":
+    main()
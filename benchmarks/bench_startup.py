@@ -0,0 +1,108 @@
+"""Cold-start report: ``-X importtime`` breakdown and start-to-first-update time.
+
+The import report runs ``python -X importtime -c "import bot"`` and lists the
+total and the heaviest top-level imports. The start-to-first-update time runs
+``bot.main()`` in a fresh interpreter against a local fake Bot API with a
+``/ping`` already queued, and measures from process start to the ``pong``
+arriving at the fake server.
+
+    python benchmarks/bench_startup.py                    # this checkout
+    python benchmarks/bench_startup.py --repo /tmp/old    # another checkout (e.g. a git worktree)
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from fake_telegram import FakeTelegram  # noqa: E402
+
+# Runs in the child. Patching build() points any version of bot.py at the fake server.
+CHILD = """
+import os, sys
+sys.path.insert(0, os.getcwd())
+from telegram.ext import ApplicationBuilder
+build = ApplicationBuilder.build
+ApplicationBuilder.build = lambda self: build(self.base_url(os.environ["BENCH_BASE_URL"]))
+import bot
+bot.main()
+"""
+
+
+def import_report(repo: pathlib.Path, top: int) -> dict:
+    totals = []
+    for _ in range(5):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import bot"], cwd=repo,
+                              capture_output=True, text=True, check=True)
+        rows = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+                continue
+            _, cumulative, name = line.split("|")
+            rows.append((int(cumulative), name.rstrip()))
+        totals.append((rows[-1][0], rows))
+    total, rows = sorted(totals)[len(totals) // 2]
+    # direct imports of bot are indented by exactly three spaces
+    direct = sorted(((us, name.strip()) for us, name in rows if name.startswith("   ") and not name.startswith("    ")),
+                    reverse=True)
+    return {"total_ms": total / 1000, "top": [(name, us / 1000) for us, name in direct[:top]]}
+
+
+async def first_update(repo: pathlib.Path) -> float:
+    fake = FakeTelegram()
+    await fake.start()
+    update = json.loads((HERE / "fixtures" / "updates" / "ping.json").read_text())
+    fake.push_update(update)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, BENCH_BASE_URL=fake.base_url, TELEGRAM_BOT_TOKEN="123:startup",
+                   SUPABASE_URL="http://127.0.0.1:9", SUPABASE_KEY="startup", BIRTHDAY_CHAT_ID="",
+                   BIRTHDAY_CHATS="", BIRTHDAY_HOUR="9", BIRTHDAY_MINUTE="0", METRICS_PORT="0",
+                   COMMAND_LOG_PATH="", LOG_LEVEL="WARNING",
+                   WIKI_STORE_PATH=str(pathlib.Path(tmp) / "wiki.json"))
+        started = time.perf_counter()
+        proc = await asyncio.create_subprocess_exec(sys.executable, "-c", CHILD, cwd=repo, env=env,
+                                                    stdout=asyncio.subprocess.DEVNULL,
+                                                    stderr=asyncio.subprocess.PIPE)
+        sent = asyncio.ensure_future(fake.wait_sent(1))
+        exited = asyncio.ensure_future(proc.wait())
+        try:
+            await asyncio.wait({sent, exited}, timeout=60, return_when=asyncio.FIRST_COMPLETED)
+            if not sent.done():
+                raise RuntimeError(f"bot did not answer:\n{(await proc.stderr.read()).decode()[-2000:]}")
+            elapsed = fake.sent[0][0] - started
+        finally:
+            sent.cancel()
+            if proc.returncode is None:
+                proc.terminate()
+            await exited
+            await fake.stop()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repo", default=str(HERE.parent), help="checkout to measure")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+    repo = pathlib.Path(args.repo).resolve()
+
+    report = import_report(repo, args.top)
+    print(f"import bot: {report['total_ms']:.0f} ms")
+    for name, ms in report["top"]:
+        print(f"  {name:<24} {ms:7.1f} ms")
+    times = [asyncio.run(first_update(repo)) for _ in range(args.runs)]
+    print(f"start to first update: median {statistics.median(times) * 1000:.0f} ms "
+          f"(min {min(times) * 1000:.0f}, max {max(times) * 1000:.0f}, {args.runs} runs)")
+
+
+if __name__ == "__main__":
+    main()
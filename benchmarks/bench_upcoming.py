@@ -0,0 +1,93 @@
+"""Time /proximos and /cumplesMes queries against the approaches they replace.
+
+For each table size, compares ``BirthdayIndex.upcoming(10)`` with sorting
+every record by its next occurrence (the old ``candidates.sort``) and with a
+``heapq.nsmallest`` top-k over all records, and ``in_month`` with filtering
+every record. Also checks that the three "upcoming" answers agree.
+
+    python benchmarks/bench_upcoming.py [--sizes 1000,10000,100000]
+"""
+import argparse
+import datetime
+import heapq
+import itertools
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+from bday import BirthdayIndex  # noqa: E402
+from fakes import synthetic_table  # noqa: E402
+from records import normalize  # noqa: E402
+
+
+def next_occurrence(month: int, day: int, today: datetime.date) -> datetime.date:
+    for year in (today.year, today.year + 1):
+        try:
+            occ = datetime.date(year, month, day)
+        except ValueError:
+            occ = datetime.date(year, 2, 28)  # Feb 29 in a common year
+        if occ >= today:
+            return occ
+    raise AssertionError("unreachable")
+
+
+def group(pairs, n):
+    """Group ``(date, name)`` pairs sorted by date into the first ``n`` ``(date, names)`` days."""
+    days = ((day, [name for _, name in people]) for day, people in itertools.groupby(pairs, key=lambda p: p[0]))
+    return list(itertools.islice(days, n))
+
+
+def upcoming_sort(records, n, today):
+    return group(sorted(((next_occurrence(r.month, r.day, today), r.name) for r in records),
+                        key=lambda p: p[0]), n)
+
+
+def upcoming_heap(records, n, today):
+    occurrences = [(next_occurrence(r.month, r.day, today), r.name) for r in records]
+    # The n nearest distinct days, then everyone on or before the last of them
+    days = heapq.nsmallest(n, {d for d, _ in occurrences})
+    if not days:
+        return []
+    return group(sorted((p for p in occurrences if p[0] <= days[-1]), key=lambda p: p[0]), n)
+
+
+def per_call_ms(fn, number):
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    args = parser.parse_args()
+    today = datetime.date(2026, 10, 17)
+    print(f"{'rows':>8} {'upcoming(10)':>13} {'sort all':>10} {'heap top-k':>11} {'in_month':>9} {'filter all':>11}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        rows = synthetic_table(n)
+        records = normalize(rows)
+        index = BirthdayIndex(None)
+        index.load(rows)
+        expected = index.upcoming(10, today)
+        assert upcoming_sort(records, 10, today) == expected
+        assert upcoming_heap(records, 10, today) == expected
+        slow = max(1, 100000 // n)
+        times = (
+            per_call_ms(lambda: index.upcoming(10, today), 1000),
+            per_call_ms(lambda: upcoming_sort(records, 10, today), slow),
+            per_call_ms(lambda: upcoming_heap(records, 10, today), slow),
+            per_call_ms(lambda: index.in_month(2, 2027), 100),
+            per_call_ms(lambda: [r for r in records if r.month == 2], slow),
+        )
+        print(f"{n:>8} " + " ".join(f"{t:>{w}.3f}" for t, w in zip(times, (13, 10, 11, 9, 11))) + "  (ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Load test: synthetic updates through the real handlers, sequential vs concurrent update processing.
+
+Builds the Application as ``bot.main()`` does (``register_handlers``, /ping and
+a /testBirthday running the real ``birthday_job``) against the local fake Bot
+API and fake backends: Supabase answers after ``--supabase-ms`` and Wikipedia
+after ``--wiki-ms``. Then feeds ``--updates`` synthetic group messages into
+the application's update queue at ``--rate`` per second (0: all at once),
+spread over ``--chats`` chats. The mix is mostly /ping, with /getCumple,
+/proximos and some /testBirthday.
+
+For each mode it reports throughput and the p50/p99 time from an update being
+queued to its reply reaching the fake Bot API, overall and for /ping alone.
+It also checks that every chat got its replies in the order of its messages,
+and runs the real ``WikiClient`` against a slow local Wikipedia server: /ping
+keeps answering while a /testBirthday waits on it, and a server slower than
+``WikiClient.deadline`` gets the fallback text.
+
+    python benchmarks/bench_updates.py [--updates 3000] [--rate 150] [--chats 200] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import pathlib
+import random
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from telegram import Update  # noqa: E402
+from telegram.ext import ApplicationBuilder, CommandHandler  # noqa: E402
+
+import metrics  # noqa: E402
+from bday import birthday_job  # noqa: E402
+from bot import ping_command  # noqa: E402
+from config import BirthdayChat  # noqa: E402
+from fake_telegram import FakeTelegram  # noqa: E402
+from fakes import FakeSupabase, bench_config, synthetic_table  # noqa: E402
+from handlers import register_handlers  # noqa: E402
+from updates import ChatOrderedUpdateProcessor  # noqa: E402
+from wiki import WikiClient  # noqa: E402
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+MIX = (("/ping", 0.85), ("/getCumple", 0.07), ("/proximos", 0.06), ("/testBirthday", 0.02))
+
+
+class FakeWiki:
+    """Stands in for WikiClient: answers the day's births after ``delay`` seconds."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def fetch_day_births(self, month: int, day: int) -> list:
+        await asyncio.sleep(self.delay)
+        return ["1879: Albert Einstein, físico"]
+
+
+class SlowWikipedia:
+    """Local HTTP stand-in for the Wikipedia API: answers every request with a saved day page after ``delay`` seconds."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.requests = 0
+        self.body = json.dumps({"parse": {"title": "17 de octubre",
+                                          "text": (FIXTURES / "17_de_octubre.html").read_text()}}).encode()
+        self._server = None
+        self._stopping = asyncio.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}/w/api.php"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+
+    async def stop(self) -> None:
+        self._server.close()
+        # Ends the waits of requests the client gave up on (cancelling them is reported as an error)
+        self._stopping.set()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            self.requests += 1
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n"
+                         b"Content-Length: " + str(len(self.body)).encode() + b"\r\n\r\n" + self.body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def make_updates(n: int, chats: int, seed: int) -> list:
+    rng = random.Random(seed)
+    commands, weights = zip(*MIX)
+    updates = []
+    for i in range(1, n + 1):
+        text = rng.choices(commands, weights)[0]
+        chat_id = -1001000000000 - rng.randrange(chats)
+        updates.append({
+            "update_id": i,
+            "message": {
+                "message_id": i,
+                "from": {"id": 1000 + i % 50, "is_bot": False, "first_name": "Carga"},
+                "chat": {"id": chat_id, "title": "Carga", "type": "supergroup"},
+                "date": int(time.time()),
+                "text": text,
+                "entities": [{"offset": 0, "length": len(text), "type": "bot_command"}],
+            },
+        })
+    return updates
+
+
+def build_app(fake: FakeTelegram, concurrency: int, supabase_s: float, wiki_s: float):
+    builder = ApplicationBuilder().token("123:bench").base_url(fake.base_url)
+    if concurrency > 1:
+        builder = builder.concurrent_updates(ChatOrderedUpdateProcessor(concurrency, registry=metrics.Registry()))
+    app = builder.build()
+    config = bench_config()
+    # Nobody from the table today, so /testBirthday goes on to Wikipedia like on most days
+    today = date.today().strftime("%m-%d")
+    rows = [r for r in synthetic_table(1000) if r["cumple"][5:] != today]
+    supabase = FakeSupabase(rows, delay=supabase_s)
+    wiki = FakeWiki(wiki_s)
+    register_handlers(app, config, supabase)
+    app.add_handler(CommandHandler("ping", ping_command))
+
+    async def test_birthday_command(update, context):
+        await birthday_job(app, config, supabase, None, wiki)
+        await update.message.reply_text("✅ Birthday job executed. Check logs for details.")
+
+    app.add_handler(CommandHandler("testBirthday", test_birthday_command))
+    return app
+
+
+def percentile(values: list, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run_mode(label: str, args, concurrency: int) -> None:
+    fake = FakeTelegram()
+    await fake.start()
+    app = build_app(fake, concurrency, args.supabase_ms / 1000, args.wiki_ms / 1000)
+    await app.initialize()
+    await app.start()
+
+    # Warm-up: load the birthday index and open the connections
+    await app.update_queue.put(Update.de_json(make_updates(1, 1, 0)[0] | {"update_id": 0}, app.bot))
+    await fake.wait_sent(1)
+    fake.replies.clear()
+
+    updates = make_updates(args.updates, args.chats, args.seed)
+    queued = {}
+    started = time.perf_counter()
+    for i, data in enumerate(updates):
+        if args.rate:
+            delay = started + i / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        update = Update.de_json(data, app.bot)
+        queued[update.message.message_id] = (time.perf_counter(), update.message.text)
+        await app.update_queue.put(update)
+    while len(fake.replies) < len(updates):
+        await asyncio.sleep(0.01)
+    finished = max(t for t, _, _ in fake.replies)
+
+    await app.stop()
+    await app.shutdown()
+    await fake.stop()
+
+    latencies, pings, order = [], [], {}
+    for replied, chat_id, message_id in fake.replies:
+        queued_at, text = queued[message_id]
+        latencies.append(replied - queued_at)
+        if text == "/ping":
+            pings.append(replied - queued_at)
+        order.setdefault(chat_id, []).append(message_id)
+    assert all(ids == sorted(ids) for ids in order.values()), "replies out of order within a chat"
+    latencies.sort()
+    pings.sort()
+    print(f"{label:>22}: {len(updates) / (finished - started):7.0f} updates/s; "
+          f"all p50 {statistics.median(latencies) * 1000:6.1f} ms, p99 {percentile(latencies, 0.99) * 1000:7.1f} ms; "
+          f"/ping p50 {statistics.median(pings) * 1000:6.1f} ms, p99 {percentile(pings, 0.99) * 1000:7.1f} ms")
+
+
+async def check_ordering() -> None:
+    """A slow update holds back its own chat only; the gauges and the concurrency cap hold."""
+    registry = metrics.Registry()
+    processor = ChatOrderedUpdateProcessor(2, registry=registry)
+    log = []
+
+    async def handle(name, seconds):
+        log.append(("start", name))
+        await asyncio.sleep(seconds)
+        log.append(("end", name))
+
+    def update(chat_id):
+        return Update.de_json({"update_id": 1, "message": {
+            "message_id": 1, "date": 0, "chat": {"id": chat_id, "type": "group", "title": "x"}}}, None)
+
+    calls = [processor.process_update(update(1), handle("a1", 0.05)),
+             processor.process_update(update(1), handle("a2", 0.0)),
+             processor.process_update(update(2), handle("b1", 0.0)),
+             processor.process_update(update(3), handle("c1", 0.0))]
+    tasks = [asyncio.ensure_future(c) for c in calls]
+    await asyncio.sleep(0.01)
+    # a2 waits for a1 without taking a slot: b1 and c1 already ran
+    assert ("end", "b1") in log and ("end", "c1") in log and ("start", "a2") not in log, log
+    assert registry.gauges[("bot_updates", (("state", "waiting"),))] == 1
+    await asyncio.gather(*tasks)
+    assert log.index(("end", "a1")) < log.index(("start", "a2")), log
+    assert registry.gauges[("bot_updates", (("state", "running"),))] == 0
+
+    # Never more than 2 running, whatever the number of chats
+    running, peak = 0, 0
+
+    async def counted():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(*(processor.process_update(update(chat_id), counted()) for chat_id in range(10, 20)))
+    assert peak == 2, peak
+    print("ordering checks passed: per-chat order, other chats not held back, waiting updates hold no slot")
+
+
+def command(update_id: int, chat_id: int, text: str) -> dict:
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "text": text,
+        "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+        "from": {"id": 1, "is_bot": False, "first_name": "Carga"},
+        "chat": {"id": chat_id, "title": "Carga", "type": "supergroup"}}}
+
+
+async def check_slow_wikipedia() -> None:
+    """/ping answers while /testBirthday waits on a slow Wikipedia; past the deadline the job sends the fallback."""
+    birthday_chat = -1009
+    today = date.today().strftime("%m-%d")
+    rows = [r for r in synthetic_table(1000) if r["cumple"][5:] != today]
+    config = bench_config(BIRTHDAY_CHATS=[BirthdayChat(birthday_chat)])
+    fake, wikipedia = FakeTelegram(), SlowWikipedia(1.0)
+    await fake.start()
+    await wikipedia.start()
+    wiki = WikiClient(api_url=wikipedia.url, deadline=3.0, retries=1)
+    app = (ApplicationBuilder().token("123:bench").base_url(fake.base_url)
+           .concurrent_updates(ChatOrderedUpdateProcessor(16, registry=metrics.Registry())).build())
+    app.add_handler(CommandHandler("ping", ping_command))
+
+    async def test_birthday_command(update, context):
+        await birthday_job(app, config, FakeSupabase(rows), None, wiki)
+
+    app.add_handler(CommandHandler("testBirthday", test_birthday_command))
+    await app.initialize()
+    await app.start()
+
+    async def announce(update_id: int) -> tuple:
+        """Run /testBirthday, pinging 20 other chats meanwhile; return (announcement, seconds, ping latencies)."""
+        sent, replies = len(fake.sent), len(fake.replies)
+        started = time.perf_counter()
+        await app.update_queue.put(Update.de_json(command(update_id, birthday_chat, "/testBirthday"), app.bot))
+        queued = {}
+        for i in range(1, 21):
+            await asyncio.sleep(0.02)
+            queued[update_id + i] = time.perf_counter()
+            await app.update_queue.put(Update.de_json(command(update_id + i, -1 - i, "/ping"), app.bot))
+        while not any(chat_id == birthday_chat for _, chat_id, _ in fake.sent[sent:]):
+            await asyncio.sleep(0.005)
+        elapsed = time.perf_counter() - started
+        while len(fake.replies) < replies + 20:
+            await asyncio.sleep(0.005)
+        text = next(text for _, chat_id, text in fake.sent[sent:] if chat_id == birthday_chat)
+        pings = sorted(t - queued[message_id] for t, _, message_id in fake.replies[replies:])
+        return text, elapsed, pings
+
+    try:
+        # Answers within the deadline: the birth comes from the parsed page
+        text, elapsed, pings = await announce(1000)
+        assert text.startswith("Nadie de euri cumple años hoy, pero hoy cumple"), text
+        assert elapsed >= wikipedia.delay and wikipedia.requests == 1, (elapsed, wikipedia.requests)
+        assert pings[-1] < 0.1, pings
+        slow = pings[-1]
+
+        # Slower than the deadline: the job gives up on time with the fallback text
+        wikipedia.delay, wiki.deadline = 30.0, 0.5
+        text, elapsed, pings = await announce(2000)
+        assert text == "Hoy nadie cumple años", text
+        assert elapsed < wiki.deadline + 0.5, elapsed
+        assert pings[-1] < 0.1, pings
+    finally:
+        await app.stop()
+        await app.shutdown()
+        await wiki.close()
+        await wikipedia.stop()
+        await fake.stop()
+    print(f"slow Wikipedia checks passed: /ping max {slow * 1000:.1f} ms while a 1 s page loaded; "
+          f"a hung server gave the fallback after {elapsed * 1000:.0f} ms (deadline {wiki.deadline * 1000:.0f} ms)")
+
+
+async def main_async(args) -> None:
+    await check_ordering()
+    await check_slow_wikipedia()
+    await run_mode("sequential", args, 1)
+    await run_mode(f"concurrent ({args.concurrency})", args, args.concurrency)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=3000)
+    parser.add_argument("--rate", type=float, default=150, help="updates per second; 0 queues them all at once")
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--supabase-ms", type=float, default=50)
+    parser.add_argument("--wiki-ms", type=float, default=150)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
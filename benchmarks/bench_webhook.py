@@ -0,0 +1,117 @@
+"""Update latency: embedded webhook server vs long polling, against a local fake Bot API.
+
+Each recorded ``/ping`` update is delivered one at a time (POSTed to the webhook
+server, or queued for ``getUpdates``) and timed until the bot's ``sendMessage``
+reply reaches the fake API. Both paths are local here, so the numbers compare
+the bot-side overhead of each mode; in production polling additionally waits
+for a getUpdates round-trip to Telegram.
+
+Run from the repository root:  python benchmarks/bench_webhook.py [-n 200]
+"""
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import pathlib
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from telegram.ext import ApplicationBuilder, CommandHandler  # noqa: E402
+
+from bot import ping_command  # noqa: E402
+from fake_telegram import FakeTelegram  # noqa: E402
+from webhook import WebhookServer  # noqa: E402
+
+UPDATES = pathlib.Path(__file__).parent / "fixtures" / "updates"
+SECRET = "bench-secret"
+
+
+def _updates(n: int):
+    template = json.loads((UPDATES / "ping.json").read_text())
+    for i in range(n):
+        update = copy.deepcopy(template)
+        update["update_id"] += i
+        update["message"]["message_id"] += i
+        yield update
+
+
+def _build_app(fake: FakeTelegram):
+    app = ApplicationBuilder().token("123:bench").base_url(fake.base_url).build()
+    app.add_handler(CommandHandler("ping", ping_command))
+    return app
+
+
+def _summary(mode: str, latencies) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "mode": mode,
+        "n": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+async def bench_polling(n: int) -> dict:
+    fake = FakeTelegram()
+    await fake.start()
+    app = _build_app(fake)
+    await app.initialize()
+    await app.updater.start_polling(poll_interval=0, timeout=10)
+    await app.start()
+    latencies = []
+    for i, update in enumerate(_updates(n)):
+        started = time.perf_counter()
+        fake.push_update(update)
+        await fake.wait_sent(i + 1)
+        latencies.append(fake.sent[i][0] - started)
+    await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    await fake.stop()
+    return _summary("polling", latencies)
+
+
+async def bench_webhook(n: int) -> dict:
+    fake = FakeTelegram()
+    await fake.start()
+    app = _build_app(fake)
+    server = WebhookServer(app, path="/telegram", secret_token=SECRET, listen="127.0.0.1", port=0)
+    await app.initialize()
+    await app.start()
+    await server.start()
+    latencies = []
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}") as http:
+        for i, update in enumerate(_updates(n)):
+            started = time.perf_counter()
+            response = await http.post("/telegram", json=update, headers=headers)
+            assert response.status_code == 200, response.status_code
+            await fake.wait_sent(i + 1)
+            latencies.append(fake.sent[i][0] - started)
+        # The secret token is enforced
+        assert (await http.post("/telegram", json=update)).status_code == 403
+    await server.stop()
+    await app.stop()
+    await app.shutdown()
+    await fake.stop()
+    return _summary("webhook", latencies)
+
+
+async def run(n: int = 200) -> list:
+    return [await bench_polling(n), await bench_webhook(n)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    for result in asyncio.run(run(args.n)):
+        print(json.dumps(result))
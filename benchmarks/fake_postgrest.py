@@ -0,0 +1,134 @@
+"""Local stand-in for Supabase's PostgREST API serving a synthetic ``Cumples`` table.
+
+Rows are generated from their id, so a table of millions of rows costs no
+memory until a page is serialized. Supports what the bot sends:
+``select``, ``order=id.asc``, ``limit`` and ``id=gt.<n>``.
+
+With ``migrated=True`` the table also has the ``cumple_md`` column of
+``supabase/migrations`` (month * 32 + day) and an index on it, so
+``cumple_md=in.(...)`` and ``cumple_md=gte.<n>&order=cumple_md.asc`` are
+answered from that index, as Postgres would. Without it, any mention of the
+column gets PostgREST's "column does not exist" error. ``ids`` serves only
+those synthetic rows instead of 1..rows. ``GET /_stats``
+returns the requests served and response bytes sent so far.
+
+The server runs in a child process so its allocations and CPU time stay out of
+the measurements of the client under test::
+
+    with serve(rows=1_000_000) as url:
+        client = SupabaseClientManager(url, "key", rest_url=url)
+"""
+import bisect
+import contextlib
+import heapq
+import json
+import multiprocessing
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+MONTH_DAY = "cumple_md"
+
+
+def make_row(i: int) -> dict:
+    return {
+        "id": i,
+        "nombre": f"Persona {i}",
+        "cumple": (date(1950 + i % 60, 1, 1) + timedelta(days=(i * 37) % 365)).isoformat(),
+    }
+
+
+def month_day(row: dict) -> int:
+    cumple = date.fromisoformat(row["cumple"])
+    return cumple.month * 32 + cumple.day
+
+
+class FakePostgREST(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, rows: int, migrated: bool = False, ids=None):
+        super().__init__(address, _Handler)
+        self.rows = rows
+        self.ids = sorted(ids) if ids is not None else None
+        self.requests = 0
+        self.bytes_sent = 0
+        # cumple_md -> ids in order: the index the migration creates
+        self.by_month_day = None
+        if migrated:
+            self.by_month_day = {}
+            for i in self.ids or range(1, rows + 1):
+                self.by_month_day.setdefault(month_day(make_row(i)), []).append(i)
+            self.month_days = sorted(self.by_month_day)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        if urlsplit(self.path).path.endswith("/_stats"):
+            self._send(200, json.dumps({"requests": server.requests, "bytes_sent": server.bytes_sent}).encode())
+            return
+        server.requests += 1
+        params = parse_qsl(urlsplit(self.path).query)
+        if any(MONTH_DAY in value or key == MONTH_DAY for key, value in params) and server.by_month_day is None:
+            body = json.dumps({"code": "42703", "details": None, "hint": None,
+                               "message": f'column Cumples.{MONTH_DAY} does not exist'}).encode()
+            server.bytes_sent += len(body)
+            self._send(400, body)
+            return
+        filters = {}
+        for key, value in params:
+            filters.setdefault(key, []).append(value)
+        limit = int(filters["limit"][0]) if "limit" in filters else None
+        if filters.get("order") == [f"{MONTH_DAY}.asc"]:
+            # first day on or after cumple_md=gte.<n>: one index lookup
+            low = int(filters[MONTH_DAY][0][4:])
+            keys = server.month_days[bisect.bisect_left(server.month_days, low):][:limit]
+            body = json.dumps([{MONTH_DAY: key} for key in keys]).encode()
+        else:
+            start = 1
+            if filters.get("id", [""])[0].startswith("gt."):
+                start = int(filters["id"][0][3:]) + 1
+            if MONTH_DAY in filters:
+                keys = [int(k) for k in filters[MONTH_DAY][0][4:-1].split(",")]
+                ids = heapq.merge(*(server.by_month_day.get(key, []) for key in keys))
+                ids = [i for i in ids if i >= start][:limit]
+            elif server.ids is not None:
+                lo = bisect.bisect_left(server.ids, start)
+                ids = server.ids[lo:lo + limit if limit is not None else None]
+            else:
+                stop = server.rows + 1
+                if limit is not None:
+                    stop = min(stop, start + limit)
+                ids = range(start, stop)
+            body = json.dumps([make_row(i) for i in ids]).encode()
+        server.bytes_sent += len(body)
+        self._send(200, body)
+
+    def _send(self, status: int, body: bytes) -> None:
+        reason = b"OK" if status == 200 else b"Bad Request"
+        self.wfile.write(b"HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: %d\r\n\r\n" % (status, reason, len(body)) + body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _run(rows: int, migrated: bool, ids, port_queue) -> None:
+    server = FakePostgREST(("127.0.0.1", 0), rows, migrated, ids)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+@contextlib.contextmanager
+def serve(rows: int = 0, migrated: bool = False, ids=None):
+    """Run the fake server in a child process and yield its base URL."""
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run, args=(rows, migrated, ids, port_queue), daemon=True)
+    process.start()
+    try:
+        yield f"http://127.0.0.1:{port_queue.get(timeout=300)}"
+    finally:
+        process.terminate()
+        process.join()
@@ -0,0 +1,182 @@
+"""Local stand-in for the Telegram Bot API, for benchmarks that run without network.
+
+Serves ``getMe``, ``getUpdates`` (long polling), ``deleteWebhook``/``setWebhook``,
+``sendMessage`` and ``sendPhoto`` on ``http://127.0.0.1:<port>/bot<token>/<method>``.
+Point a bot at it with ``ApplicationBuilder().base_url(server.base_url)``.
+Updates are injected with ``push_update``; every ``sendMessage`` is recorded
+with its arrival time in ``sent``, and replies (``reply_parameters``) also in
+``replies`` as ``(time, chat_id, replied message_id)``.
+
+``sendPhoto`` takes an upload (multipart) or a ``file_id`` returned by an
+earlier upload; an unknown ``file_id`` gets Telegram's 400 "wrong file
+identifier". A ``sendPhoto`` to a chat in ``photo_errors`` (chat_id ->
+description) gets a 400 with that description. Each photo is recorded in
+``photos`` as ``(time, chat_id, uploaded bytes, caption)``, with 0 bytes
+for a ``file_id``. ``received_bytes`` counts the request bodies received.
+Replies count in ``replies`` and ``sent_event`` as for messages.
+"""
+import asyncio
+import email.parser
+import email.policy
+import hashlib
+import json
+import time
+from urllib.parse import parse_qsl
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot",
+            "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+
+class _Error:
+    def __init__(self, code: int, description: str):
+        self.code = code
+        self.description = description
+
+
+def _multipart(content_type: str, body: bytes) -> dict:
+    """Form fields of a multipart body: files as bytes, the rest as str."""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+    params = {}
+    for part in message.iter_parts():
+        value = part.get_payload(decode=True)
+        params[part.get_param("name", header="content-disposition")] = (
+            value if part.get_filename() else value.decode())
+    return params
+
+
+class FakeTelegram:
+    def __init__(self):
+        self.updates = []
+        self.sent = []
+        self.replies = []
+        self.photos = []
+        self.file_ids = set()
+        self.photo_errors = {}
+        self.received_bytes = 0
+        self.sent_event = asyncio.Event()
+        self._new_update = asyncio.Event()
+        self._message_id = 0
+        self._server = None
+        self.port = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    def push_update(self, update: dict) -> None:
+        self.updates.append(update)
+        self._new_update.set()
+
+    async def wait_sent(self, count: int) -> None:
+        while len(self.sent) < count:
+            self.sent_event.clear()
+            await self.sent_event.wait()
+
+    async def _get_updates(self, params: dict):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        deadline = time.monotonic() + timeout
+        while True:
+            pending = [u for u in self.updates if u["update_id"] >= offset]
+            if pending or time.monotonic() >= deadline:
+                return pending
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                pass
+
+    async def _call(self, method: str, params: dict):
+        if method == "getMe":
+            return BOT_USER
+        if method in ("deleteWebhook", "setWebhook"):
+            return True
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if method == "sendPhoto":
+            return self._send_photo(params)
+        if method == "sendMessage":
+            self._message_id += 1
+            chat_id = int(params["chat_id"])
+            now = time.perf_counter()
+            self.sent.append((now, chat_id, params.get("text")))
+            reply = params.get("reply_parameters")
+            if reply:
+                reply = json.loads(reply) if isinstance(reply, str) else reply
+                self.replies.append((now, chat_id, reply["message_id"]))
+            self.sent_event.set()
+            return {"message_id": self._message_id, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+                    "from": BOT_USER, "text": params.get("text")}
+        return True
+
+    def _send_photo(self, params: dict):
+        chat_id = int(params["chat_id"])
+        if chat_id in self.photo_errors:
+            return _Error(400, self.photo_errors[chat_id])
+        photo = params.get("photo")
+        if isinstance(photo, bytes):
+            file_id = "photo-" + hashlib.sha256(photo).hexdigest()[:16]
+            self.file_ids.add(file_id)
+            size = len(photo)
+        elif photo in self.file_ids:
+            file_id, size = photo, 0
+        else:
+            return _Error(400, "Bad Request: wrong file identifier/HTTP URL specified")
+        self._message_id += 1
+        now = time.perf_counter()
+        self.photos.append((now, chat_id, size, params.get("caption")))
+        reply = params.get("reply_parameters")
+        if reply:
+            reply = json.loads(reply) if isinstance(reply, str) else reply
+            self.replies.append((now, chat_id, reply["message_id"]))
+        self.sent_event.set()
+        return {"message_id": self._message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+                "from": BOT_USER, "caption": params.get("caption"),
+                "photo": [{"file_id": file_id, "file_unique_id": file_id[6:], "width": 800, "height": 450,
+                           "file_size": size}]}
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                path = lines[0].split(" ")[1]
+                headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                self.received_bytes += len(body)
+                content_type = headers.get("content-type", "")
+                if content_type.startswith("application/json"):
+                    params = json.loads(body or b"{}")
+                elif content_type.startswith("multipart/form-data"):
+                    params = _multipart(content_type, body)
+                else:
+                    params = dict(parse_qsl(body.decode()))
+                result = await self._call(path.rsplit("/", 1)[-1], params)
+                if isinstance(result, _Error):
+                    status = b"%d Bad Request" % result.code
+                    payload = json.dumps({"ok": False, "error_code": result.code,
+                                          "description": result.description}).encode()
+                else:
+                    status = b"200 OK"
+                    payload = json.dumps({"ok": True, "result": result}).encode()
+                writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: %d\r\n\r\n" % len(payload) + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
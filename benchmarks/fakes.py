@@ -0,0 +1,69 @@
+"""In-process fakes for benchmarks: a Supabase client over a list of rows and synthetic tables."""
+import asyncio
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from config import Config  # noqa: E402
+from fake_postgrest import make_row  # noqa: E402
+
+
+def synthetic_table(n: int) -> list:
+    """``Cumples`` rows with ISO dates, as PostgREST returns them."""
+    return [make_row(i) for i in range(1, n + 1)]
+
+
+class FakeSupabase:
+    """Drop-in for SupabaseClientManager that serves rows from memory.
+
+    ``delay`` seconds are awaited per request (per page when paging) to stand
+    in for the network round trip; ``error`` is raised instead of answering.
+    """
+
+    supabase_url = "http://fake-supabase"
+    configured = True
+    # No month/day column: birthdays are filtered client-side
+    server_filter = False
+
+    def __init__(self, rows: list, page_size: int = 1000, delay: float = 0.0, error: Exception | None = None):
+        self.rows = rows
+        self.page_size = page_size
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def _request(self) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+
+    async def fetch_birthdays(self) -> list:
+        self.calls += 1
+        await self._request()
+        return list(self.rows)
+
+    async def iter_birthday_pages(self, page_size: int | None = None):
+        self.calls += 1
+        page_size = page_size or self.page_size
+        for i in range(0, len(self.rows), page_size):
+            await self._request()
+            yield self.rows[i:i + page_size]
+
+    def iter_birthdays_on(self, keys):
+        return self.iter_birthday_pages()
+
+    async def close(self) -> None:
+        pass
+
+
+def bench_config(**overrides) -> Config:
+    values = dict(
+        TELEGRAM_BOT_TOKEN="123:bench",
+        SUPABASE_URL=FakeSupabase.supabase_url,
+        SUPABASE_KEY="bench-key",
+        BIRTHDAY_CHAT_ID="",
+    )
+    values.update(overrides)
+    return Config(**values)
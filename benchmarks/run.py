@@ -0,0 +1,276 @@
+"""Benchmark suite for the bot's hot paths, with JSON output and a stored baseline.
+
+Covers date parsing, the next-birthday index and the birthday job filtering on
+synthetic tables, the Nacimientos extraction on the saved pages in
+``fixtures/``, and end-to-end ``/getCumple`` and ``/ping`` handling through a
+real Application talking to a local fake Bot API and an in-memory Supabase,
+plus the per-call overhead of the metrics wrapper, of logging and of the
+command audit log.
+
+Run from the repository root:
+
+    python benchmarks/run.py                     # run, compare with baseline.json
+    python benchmarks/run.py --output out.json   # also write the results
+    python benchmarks/run.py --update-baseline   # store the results as the new baseline
+    python benchmarks/run.py --sizes 1000,100000 # skip the 1M-row cases
+
+Every result is a time in milliseconds (lower is better). A result slower than
+its baseline by more than ``--tolerance`` (default 30%) and by more than
+``--min-delta`` (default 1 µs) is reported as a regression and makes the command exit with status 1.
+"""
+import argparse
+import asyncio
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import pathlib
+import platform
+import queue
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+from telegram import Update  # noqa: E402
+from telegram.ext import ApplicationBuilder, CommandHandler  # noqa: E402
+
+import metrics  # noqa: E402
+from bday import BirthdayIndex, fetch_birthdays_on, get_next_birthday  # noqa: E402
+from bot import ping_command  # noqa: E402
+from command_log import CommandLog  # noqa: E402
+from fake_telegram import FakeTelegram  # noqa: E402
+from fakes import FakeSupabase, bench_config, synthetic_table  # noqa: E402
+from handlers import register_handlers  # noqa: E402
+from logging_setup import TEXT_FORMAT, JsonFormatter, LoopQueueHandler, UpdateTracer  # noqa: E402
+from nacimientos import extract_births  # noqa: E402
+from records import parse_date  # noqa: E402
+
+HERE = pathlib.Path(__file__).parent
+BASELINE = HERE / "baseline.json"
+FIXTURES = HERE / "fixtures"
+
+MIXED_DATES = ["1990-10-17", "1985-02-28T00:00:00", "2000-02-29T08:30:00.123456Z", "17/10/1990",
+               "28-02-1985", "12/31/1999", "1990-1-5", " 1975-07-04 ", "no es fecha", ""]
+
+
+def best_ms(fn, number: int = 1, repeat: int = 5) -> float:
+    """Best per-call time of ``fn()`` in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best * 1000
+
+
+async def best_ms_async(fn, number: int = 1, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best * 1000
+
+
+def bench_parse_date(results: dict) -> None:
+    def parse_all():
+        for s in MIXED_DATES:
+            parse_date(s)
+
+    results["parse_date_mixed_per_call"] = best_ms(parse_all, number=2000) / len(MIXED_DATES)
+
+
+async def bench_birthdays(results: dict, sizes) -> None:
+    today = datetime.date.today()
+    for n in sizes:
+        client = FakeSupabase(synthetic_table(n))
+        index = BirthdayIndex(client.fetch_birthdays, ttl=3600)
+        results[f"index_load_{n}"] = await best_ms_async(index.refresh, repeat=3)
+        results[f"next_birthday_{n}"] = await best_ms_async(lambda: get_next_birthday(index), number=1000)
+        results[f"upcoming_10_{n}"] = best_ms(lambda: index.upcoming(10, today), number=1000)
+        week = today + datetime.timedelta(days=6)
+        results[f"in_window_7d_{n}"] = best_ms(lambda: index.in_window(today, week), number=100)
+        results[f"birthday_job_filter_{n}"] = await best_ms_async(lambda: fetch_birthdays_on(client, [today]), repeat=3)
+        del client, index
+
+
+def bench_nacimientos(results: dict) -> None:
+    for path in sorted(FIXTURES.glob("*.html")):
+        html_content = path.read_text(encoding="utf-8")
+        results[f"nacimientos_{path.stem}"] = best_ms(lambda: extract_births(html_content), number=5)
+
+
+async def bench_handlers(results: dict, rows: int = 1000) -> None:
+    fake = FakeTelegram()
+    await fake.start()
+    app = ApplicationBuilder().token("123:bench").base_url(fake.base_url).build()
+    register_handlers(app, bench_config(), FakeSupabase(synthetic_table(rows)))
+    app.add_handler(CommandHandler("ping", ping_command))
+    await app.initialize()
+
+    for command in ("ping", "getcumple"):
+        template = json.loads((FIXTURES / "updates" / f"{command}.json").read_text())
+
+        async def handle():
+            update = copy.deepcopy(template)
+            await app.process_update(Update.de_json(update, app.bot))
+
+        await handle()  # warm-up (loads the birthday index for /getCumple)
+        results[f"handler_{command}"] = await best_ms_async(handle, number=50)
+
+    await app.shutdown()
+    await fake.stop()
+
+
+async def bench_metrics(results: dict) -> None:
+    async def noop():
+        return None
+
+    wrapped = metrics.instrument(noop, "bench", registry=metrics.Registry())
+    bare = await best_ms_async(noop, number=20000)
+    results["metrics_instrument_overhead_per_call"] = max(await best_ms_async(wrapped, number=20000) - bare, 0.0)
+
+
+async def bench_logging(results: dict) -> None:
+    """Time spent on the calling thread (the event loop) per log record and per traced update."""
+    extra = {"update": {"update_id": 1, "chat_id": -100123, "user_id": 42, "text": "/getCumple"}}
+    template = json.loads((FIXTURES / "updates" / "text.json").read_text())
+    update = Update.de_json(template, None)
+    tracer = UpdateTracer(sample_rate=0.01)
+
+    disabled = logging.root.manager.disable
+    logging.disable(logging.NOTSET)
+    bench_logger = logging.getLogger("bench.logging")
+    tracer_logger = logging.getLogger("logging_setup")
+    with open(os.devnull, "w") as devnull:
+        sink = logging.StreamHandler(devnull)
+        sink.setFormatter(JsonFormatter())
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, sink)
+        for target in (bench_logger, tracer_logger):
+            target.propagate = False
+            target.setLevel(logging.INFO)
+        try:
+            bench_logger.addHandler(sink)
+            results["logging_sync_json_per_record"] = best_ms(lambda: bench_logger.info("update", extra=extra), number=2000, repeat=15)
+            bench_logger.removeHandler(sink)
+
+            # What the old catch-all handler did on every update: repr the chat and user, format synchronously
+            text_sink = logging.StreamHandler(devnull)
+            text_sink.setFormatter(logging.Formatter(TEXT_FORMAT))
+            bench_logger.addHandler(text_sink)
+            results["update_trace_legacy_per_update"] = best_ms(lambda: bench_logger.info(
+                "[debug_any] update: type=%s chat=%s user=%s text=%s", type(update), update.effective_chat,
+                update.effective_user, update.message.text if update.message else None), number=2000, repeat=15)
+            bench_logger.removeHandler(text_sink)
+
+            listener.start()
+            queued = LoopQueueHandler(log_queue)
+            bench_logger.addHandler(queued)
+            tracer_logger.addHandler(queued)
+            results["logging_queue_per_record"] = best_ms(lambda: bench_logger.info("update", extra=extra), number=2000, repeat=15)
+            results["update_trace_sampled_per_update"] = await best_ms_async(
+                lambda: tracer.trace_update(update, None), number=20000)
+        finally:
+            listener.stop()
+            for target in (bench_logger, tracer_logger):
+                target.handlers.clear()
+                target.propagate = True
+            logging.disable(disabled)
+
+
+async def bench_command_log(results: dict, commands: int = 20000) -> None:
+    """Per-command cost of the audit log, including the batched writes and the final flush."""
+    with tempfile.TemporaryDirectory() as tmp:
+        command_log = CommandLog(str(pathlib.Path(tmp) / "commands_log.json"), flush_interval=0.1)
+
+        async def burst():
+            await command_log.start()
+            for i in range(commands):
+                command_log.record(user=i % 100, chat=-100123, command="/getCumple", latency_ms=1.5, outcome="ok")
+                if i % 100 == 0:
+                    await asyncio.sleep(0)  # let the flusher run, as between real updates
+            await command_log.stop()
+
+        results["command_log_per_command"] = await best_ms_async(burst, repeat=3) / commands
+
+
+async def run_all(sizes) -> dict:
+    results = {}
+    await bench_metrics(results)
+    await bench_logging(results)
+    await bench_command_log(results)
+    bench_parse_date(results)
+    await bench_birthdays(results, sizes)
+    bench_nacimientos(results)
+    await bench_handlers(results)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta: float = 0.0) -> list:
+    """Return ``(name, baseline_ms, current_ms)`` for every result slower than allowed.
+
+    Differences below ``min_delta`` ms are ignored: sub-microsecond results
+    swing by more than the relative tolerance from run to run.
+    """
+    regressions = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base and value > base * (1 + tolerance) and value - base > min_delta:
+            regressions.append((name, base, value))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="comma-separated table sizes")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.30)
+    parser.add_argument("--min-delta", type=float, default=0.001, help="ignore slowdowns below this many ms")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = asyncio.run(run_all(sizes))
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "unit": "ms",
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        pathlib.Path(args.output).write_text(text + "\n")
+
+    baseline_path = pathlib.Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(text + "\n")
+        print(f"Baseline written to {baseline_path}", file=sys.stderr)
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --update-baseline", file=sys.stderr)
+        return 0
+
+    regressions = compare(results, json.loads(baseline_path.read_text())["results"], args.tolerance, args.min_delta)
+    for name, base, value in regressions:
+        print(f"REGRESSION {name}: {base:.4f} ms -> {value:.4f} ms ({value / base - 1:+.0%})", file=sys.stderr)
+    if not regressions:
+        print("No regressions against the baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,35 @@
 import asyncio
+import functools
+import inspect
 import logging
-import os
 import datetime
+import sqlite3
 
 from config import load_config
 
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, Job
-from bday import birthday_job
+from bday import birthday_job, fetch_birthdays, prepare_birthday_card, prepare_birthday_messages
+from cache import LeaderLock, make_cache
+from cards import CardRenderer
+from command_log import CommandLog, log_commands
 from handlers import register_handlers
+from logging_setup import UpdateTracer, setup_logging
+from metrics import MetricsServer, instrument, instrument_application
+from outbox import DirectOutbox, Outbox, OutboxDrainer
+from scheduler import DailyAnnouncement, resolve_zone
+from snapshot import BirthdaySnapshot
+from supabase_client import SupabaseClientManager
+from updates import ChatOrderedUpdateProcessor
+from webhook import run_webhook
+from wiki import BirthsStore, DEFAULT_STORE_PATH, WikiClient
+from workers import BACKGROUND, BLOCKING, RENDER, PoolBusy
 
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters
+from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, TypeHandler
 
 
 
 
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
-# Reduce verbosity of noisy third-party loggers
-for noisy in ("httpx", "httpcore", "telegram", "apscheduler"):
-    logging.getLogger(noisy).setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 
@@ -43,13 +51,97 @@ async def ping_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
 def main() -> None:
     config = load_config()
+    log_listener = setup_logging(config)
+    # load_config() runs before logging is set up: report where the environment came from now
+    if config.ENV_FILE:
+        logger.info("Loaded environment from %s", config.ENV_FILE)
+    else:
+        logger.warning("No .env or .env.example next to config.py; used python-dotenv's default lookup")
     token = config.TELEGRAM_BOT_TOKEN
 
     if not token:
         logger.error("TELEGRAM_BOT_TOKEN is not set. Set it in the environment or .env file.")
+        log_listener.stop()
+        raise SystemExit(1)
+    if config.BOT_MODE == "webhook" and not config.WEBHOOK_SECRET:
+        logger.error("BOT_MODE=webhook needs WEBHOOK_SECRET: without it anyone who can reach the webhook port "
+                     "could post forged updates. Set it to a random string (A-Z, a-z, 0-9, _ and -).")
+        log_listener.stop()
         raise SystemExit(1)
 
-    app = ApplicationBuilder().token(token).build()
+    # One pooled Supabase client and one Wikipedia client for the whole process, closed on shutdown
+    supabase = SupabaseClientManager.from_config(config)
+    wiki_client = WikiClient.from_config(config)
+    # Last good copy of Cumples: instant index on restart, fallback while Supabase is down
+    snapshot = None
+    if config.SNAPSHOT_PATH:
+        try:
+            snapshot = BirthdaySnapshot(config.SNAPSHOT_PATH, config.SNAPSHOT_MAX_AGE)
+        except sqlite3.Error as e:
+            logger.error("Cannot open the birthday snapshot %s (%s); running without it. "
+                         "Check that its directory exists and this user can write to it.", config.SNAPSHOT_PATH, e)
+    # Supabase rows and Wikipedia days, shared with the other bot processes when CACHE_PATH is set
+    cache = make_cache(config.CACHE_PATH, ttl=config.BIRTHDAY_INDEX_TTL)
+    # Only the process holding the lock runs the scheduled jobs and delivers the outbox
+    leader = LeaderLock(config.LEADER_LOCK_PATH)
+    # Birthday cards, rendered in worker processes and uploaded once each
+    cards = CardRenderer(config.CARD_DIR) if config.CARD_DIR else None
+    RENDER.configure(config.CARD_WORKERS, RENDER.max_queue)
+
+    metrics_server = MetricsServer(config.METRICS_LISTEN, config.METRICS_PORT) if config.METRICS_PORT else None
+    command_log = CommandLog.from_config(config) if config.COMMAND_LOG_PATH else None
+    BLOCKING.configure(config.BLOCKING_WORKERS, config.BLOCKING_QUEUE)
+    # Scheduled announcements are delivered from here, surviving restarts and Telegram outages
+    try:
+        outbox = Outbox(config.OUTBOX_PATH)
+    except sqlite3.Error as e:
+        logger.error("Cannot open the outbox %s (%s); sending announcements directly, without retries or a "
+                     "record across restarts. Check that its directory exists and this user can write to it.",
+                     config.OUTBOX_PATH, e)
+        outbox = None
+
+    async def _start_servers(application) -> None:
+        BLOCKING.start()
+        if metrics_server:
+            await metrics_server.start()
+        if command_log:
+            await command_log.start()
+        if leader.held:
+            await drainer.start()
+
+    async def _close_clients(application) -> None:
+        # Every step runs even if an earlier one fails (or post_init never got that far)
+        steps = [drainer.stop, outbox.close, leader.release, supabase.close, wiki_client.close]
+        if metrics_server:
+            steps.append(metrics_server.stop)
+        # Runs on SIGTERM/SIGINT too: write the commands still buffered
+        if command_log:
+            steps.append(command_log.stop)
+        # The cache after the pool: its threads hold connections to it
+        steps += [BLOCKING.shutdown, cache.close, RENDER.shutdown, functools.partial(BACKGROUND.shutdown, timeout=1)]
+        try:
+            for step in steps:
+                try:
+                    result = step()
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception:
+                    logger.exception("Shutdown step %s failed", getattr(step, "__qualname__", step))
+        finally:
+            # Flush whatever is still queued for the log writer thread
+            log_listener.stop()
+
+    builder = ApplicationBuilder().token(token).post_init(_start_servers).post_shutdown(_close_clients)
+    if config.TELEGRAM_BASE_URL:
+        builder = builder.base_url(config.TELEGRAM_BASE_URL)
+    if config.UPDATE_CONCURRENCY > 1:
+        # Chats no longer wait for each other's slow commands; each chat still sees its replies in order
+        builder = builder.concurrent_updates(ChatOrderedUpdateProcessor(config.UPDATE_CONCURRENCY))
+    app = builder.build()
+    if outbox is not None:
+        drainer = OutboxDrainer(outbox, app.bot, cards=cards)
+    else:
+        outbox = drainer = DirectOutbox(app.bot, cards=cards)
 
 
     try:
@@ -69,66 +161,129 @@ def main() -> None:
 
 
     # Register command handlers from handlers.py
-    register_handlers(app, config)
+    register_handlers(app, config, supabase, snapshot, cache, cards)
 
 
     # lightweight ping for testing
     app.add_handler(CommandHandler("ping", ping_command))
 
-    # Debug: log any update received (low priority group so it doesn't interfere)
-    async def _debug_any(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        logger.info("[debug_any] update: type=%s chat=%s user=%s text=%s", type(update), getattr(update, 'effective_chat', None), getattr(update, 'effective_user', None), getattr(update.message, 'text', None) if getattr(update, 'message', None) else None)
+    # Debug: sampled trace of incoming updates (low priority group so it doesn't interfere)
+    tracer = UpdateTracer(config.LOG_UPDATE_SAMPLE_RATE, config.LOG_DEBUG_CHATS)
+    if tracer.enabled:
+        app.add_handler(TypeHandler(Update, tracer.trace_update), group=99)
 
-    app.add_handler(MessageHandler(filters.ALL, _debug_any), group=99)
 
 
-
-    # determine local tz if available (debe ir antes de cualquier uso de local_tz)
-    try:
-        local_tz = datetime.datetime.now().astimezone().tzinfo
-    except Exception:
-        local_tz = None
+    # Zone of the default send time and of the weekly jobs (debe ir antes de cualquier uso de local_tz)
+    local_tz = resolve_zone(config.BIRTHDAY_TZ)
 
 
     job_queue = app.job_queue
 
-    # --- BIRTHDAY JOB ---
-    async def _job_wrapper(context: ContextTypes.DEFAULT_TYPE):
-        # Call the birthday_job which expects (application, config)
-        await birthday_job(app, config)
+    # --- WIKIPEDIA BIRTHS STORE ---
+    births_store = BirthsStore(config.WIKI_STORE_PATH or DEFAULT_STORE_PATH)
 
-    desired_hour = int(os.getenv("BIRTHDAY_HOUR", "9"))
-    desired_minute = int(os.getenv("BIRTHDAY_MINUTE", "0"))
+    async def _wiki_refresh_job(context: ContextTypes.DEFAULT_TYPE):
+        # Rebuilding fetches 366 pages; keep it off the event loop, one rebuild at a time
+        try:
+            await BACKGROUND.run(births_store.rebuild, task="wiki_rebuild")
+        except PoolBusy:
+            logger.warning("Wikipedia births rebuild already running; skipped")
 
-    now = datetime.datetime.now().astimezone() if local_tz else datetime.datetime.now()
-    try:
-        if local_tz:
-            today_target = datetime.datetime(now.year, now.month, now.day, desired_hour, desired_minute, tzinfo=local_tz)
-        else:
-            today_target = datetime.datetime(now.year, now.month, now.day, desired_hour, desired_minute)
-    except Exception:
-        today_target = datetime.datetime(now.year, now.month, now.day, desired_hour, desired_minute)
-
-    if today_target <= now:
-        first_run = today_target + datetime.timedelta(days=1)
-    else:
-        first_run = today_target
+    _wiki_refresh_job = instrument(_wiki_refresh_job, "job:wiki_refresh")
+
+    # --- BIRTHDAYS SNAPSHOT / SHARED CACHE ---
+    async def _snapshot_job(context: ContextTypes.DEFAULT_TYPE):
+        try:
+            await fetch_birthdays(supabase, snapshot, cache, refresh=True)
+        except Exception as e:
+            logger.error("Snapshot refresh failed: %s", e)
 
-    interval = datetime.timedelta(days=1)
-    job_queue.run_repeating(_job_wrapper, interval=interval, first=first_run)
-    logger.info("Scheduled birthday job at %s:%s (first run: %s, tz=%s)", 
-                desired_hour, desired_minute, first_run, local_tz)
+    # --- BIRTHDAY JOB ---
+    # One announcement per distinct (timezone, hour, minute); chats without their own use the defaults
+    schedules = {}
+    for chat in config.BIRTHDAY_CHATS:
+        hour = config.BIRTHDAY_HOUR if chat.hour is None else chat.hour
+        minute = config.BIRTHDAY_MINUTE if chat.minute is None else chat.minute
+        schedules.setdefault((chat.tz, hour, minute), []).append(chat.chat_id)
+    if not schedules:
+        # No chats: still run so the message gets logged
+        schedules[(None, config.BIRTHDAY_HOUR, config.BIRTHDAY_MINUTE)] = []
+
+    def _lead() -> None:
+        """Schedule the work only one process should do: refreshes and the daily announcements."""
+        # Weekly off-peak rebuild (Sunday), plus one right away if the store is empty
+        job_queue.run_daily(_wiki_refresh_job, time=datetime.time(config.WIKI_REFRESH_HOUR, 0, tzinfo=local_tz), days=(0,))
+        if not len(births_store):
+            job_queue.run_once(_wiki_refresh_job, when=60)
+
+        if snapshot is not None or config.CACHE_PATH:
+            # Keep the copy fresh even when nobody asks /getCumple; with a shared cache, renew it
+            # before it expires so the other processes never need to ask Supabase themselves
+            interval = max(1, config.BIRTHDAY_INDEX_TTL // 2) if config.CACHE_PATH else config.SNAPSHOT_REFRESH
+            job_queue.run_repeating(instrument(_snapshot_job, "job:snapshot"), interval=interval, first=10)
+
+        for (tz_name, hour, minute), chat_ids in schedules.items():
+            tz = resolve_zone(tz_name) if tz_name else local_tz
+
+            async def _prepare(day, tz_name=tz_name):
+                messages = await prepare_birthday_messages(supabase, {tz_name: day}, births_store, wiki_client,
+                                                           snapshot, cache)
+                return messages and messages[tz_name]
+
+            async def _card(day):
+                return await prepare_birthday_card(supabase, day, cards, snapshot, cache)
+
+            announcement = DailyAnnouncement(
+                f"{tz_name or 'local'}@{hour:02d}:{minute:02d}", chat_ids, tz, datetime.time(hour, minute),
+                _prepare, outbox,
+                prepare_ahead=datetime.timedelta(minutes=config.BIRTHDAY_PREPARE_MINUTES),
+                catch_up_window=datetime.timedelta(hours=config.BIRTHDAY_CATCH_UP_HOURS),
+                card=_card if cards is not None else None,
+            )
+            announcement.schedule(job_queue, wrap=instrument)
+
+        if cards is not None:
+            async def _prune_cards(context: ContextTypes.DEFAULT_TYPE):
+                removed = await cards.prune()
+                if removed:
+                    logger.info("Deleted %d old card files", removed)
+
+            # Cards carry their date, so old ones are never sent again
+            job_queue.run_daily(instrument(_prune_cards, "job:card_prune"),
+                                time=datetime.time(config.WIKI_REFRESH_HOUR, 30, tzinfo=local_tz))
+
+    async def _try_lead(context: ContextTypes.DEFAULT_TYPE):
+        # The leader went away (its lock is released when it exits): take over its work
+        if leader.acquire():
+            _lead()
+            await drainer.start()
+            context.job.schedule_removal()
+
+    if leader.acquire():
+        _lead()
+    else:
+        logger.info("Another bot process holds %s; retrying every %ss", config.LEADER_LOCK_PATH, config.LEADER_RETRY)
+        job_queue.run_repeating(_try_lead, interval=config.LEADER_RETRY, first=config.LEADER_RETRY)
 
     # Manual test command for birthday job
     async def test_birthday_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Manually trigger the birthday job for testing."""
         logger.info("Manual birthday job triggered by %s", update.effective_user.full_name if update.effective_user else "Unknown")
-        await birthday_job(app, config)
+        await birthday_job(app, config, supabase, births_store, wiki_client, snapshot=snapshot, cache=cache, cards=cards)
         await update.message.reply_text("✅ Birthday job executed. Check logs for details.")
     
     app.add_handler(CommandHandler("testBirthday", test_birthday_command))
-    
-    app.run_polling()
+
+    # Audit trail of every command, then latency / error / in-flight metrics for every handler registered above
+    if command_log:
+        log_commands(app, command_log)
+    instrument_application(app)
+
+    if config.BOT_MODE == "webhook":
+        run_webhook(app, config)
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
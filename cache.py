@@ -0,0 +1,210 @@
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from workers import BLOCKING
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    version: int
+    expires_at: float
+
+
+class MemoryCache:
+    """In-process cache of versioned entries with a TTL: the default when one bot process runs.
+
+    ``put`` bumps the key's version; ``get`` returns the entry until its TTL
+    (``ttl`` seconds unless given) is over, then None. Values are stored as
+    given (callers must not mutate them).
+    """
+
+    # Methods are cheap and never block: call them on the event loop
+    blocking = False
+
+    def __init__(self, ttl: float = 900.0):
+        self.ttl = ttl
+        self._entries: Dict[str, CacheEntry] = {}
+
+    def get(self, key: str) -> CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.time():
+            return None
+        return entry
+
+    def put(self, key: str, value: Any, ttl: float | None = None) -> int:
+        previous = self._entries.get(key)
+        version = previous.version + 1 if previous else 1
+        self._entries[key] = CacheEntry(value, version, time.time() + (self.ttl if ttl is None else ttl))
+        return version
+
+    def close(self) -> None:
+        pass
+
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    version INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteCache:
+    """Cache shared by the bot processes of one host: a memory-mapped SQLite database in WAL mode.
+
+    Same interface as ``MemoryCache``. Values are stored as JSON; a ``put``
+    from any process bumps the key's version for every process. Reads go
+    through ``mmap`` (``PRAGMA mmap_size``), so they come straight from the
+    page cache shared by every process on the host. Each process also keeps
+    the last value it decoded per key. While the version in the database is
+    unchanged, ``get`` reads only the version and expiry and returns that
+    value, without copying or decoding the blob again.
+
+    Methods block (briefly): the bot runs them in the ``BLOCKING`` pool. A
+    connection is kept per thread; ``close`` closes all of them.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, ttl: float = 900.0, mmap_size: int = 256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        # Every thread's connection, for close()
+        self._connections: List[sqlite3.Connection] = []
+        # key -> (version, value) last decoded by this process
+        self._decoded: Dict[str, Tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+        self._connect().executescript(CACHE_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Used by its own thread only, but closed by whichever thread calls close()
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, key: str) -> CacheEntry | None:
+        conn = self._connect()
+        row = conn.execute("SELECT version, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        version, expires_at = row
+        with self._lock:
+            decoded = self._decoded.get(key)
+        if decoded is None or decoded[0] != version:
+            row = conn.execute("SELECT value, version FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            decoded = (row[1], json.loads(row[0]))
+            with self._lock:
+                self._decoded[key] = decoded
+        return CacheEntry(decoded[1], decoded[0], expires_at)
+
+    def put(self, key: str, value: Any, ttl: float | None = None) -> int:
+        ttl = self.ttl if ttl is None else ttl
+        blob = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+        now = time.time()
+        conn = self._connect()
+        version = conn.execute(
+            "INSERT INTO cache (key, value, version, expires_at, updated_at) VALUES (?, ?, 1, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, version = version + 1, "
+            "expires_at = excluded.expires_at, updated_at = excluded.updated_at RETURNING version",
+            (key, blob, now + ttl, now)).fetchone()[0]
+        with self._lock:
+            self._decoded[key] = (version, value)
+        return version
+
+    def close(self) -> None:
+        """Close the connections of every thread that used the cache; call once the pools are idle."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+def make_cache(path: str = "", ttl: float = 900.0):
+    """``SQLiteCache`` at ``path``, or a ``MemoryCache`` when ``path`` is empty."""
+    return SQLiteCache(path, ttl) if path else MemoryCache(ttl)
+
+
+async def read(cache, key: str) -> CacheEntry | None:
+    """``cache.get(key)`` from async code (in the blocking pool for a shared cache). Errors read as a miss."""
+    try:
+        if cache.blocking:
+            return await BLOCKING.run(cache.get, key, task="cache_get")
+        return cache.get(key)
+    except Exception as e:
+        logger.error("Cache read of %s failed: %s", key, e)
+        return None
+
+
+async def write(cache, key: str, value: Any, ttl: float | None = None) -> None:
+    """``cache.put(...)`` from async code; errors are logged, the value is simply not cached."""
+    try:
+        if cache.blocking:
+            await BLOCKING.run(cache.put, key, value, ttl, task="cache_put")
+        else:
+            cache.put(key, value, ttl)
+    except Exception as e:
+        logger.error("Cache write of %s failed: %s", key, e)
+
+
+class LeaderLock:
+    """Non-blocking exclusive lock on a file (``flock``), held for the life of the process.
+
+    Several bot processes on one host open the same path. ``acquire()``
+    succeeds in exactly one of them: the leader, which runs the scheduled work
+    (daily announcement, outbox delivery, data refreshes). The lock is
+    released when the process exits, however it exits, and another process
+    can then take over. With no ``path`` every process is the leader.
+    """
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self._fd: int | None = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None or not self.path
+
+    def acquire(self) -> bool:
+        """Take the lock if it is free; returns whether this process holds it."""
+        if self.held:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        logger.info("Took the leader lock %s", self.path)
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,309 @@
+"""Birthday cards: PNG images of today's birthdays and of the upcoming ones.
+
+A card is described by a spec, plain JSON-able data (``CardRenderer.today``
+and ``CardRenderer.upcoming`` build them). ``render_card`` draws a spec with
+matplotlib, which is imported only inside the ``RENDER`` worker processes, so
+the bot itself never loads it. PNGs are cached on disk under a hash of the
+spec, and the ``file_id`` Telegram returns for the first upload of a card is
+kept next to it: later sends of the same card upload nothing.
+
+Draw a card by hand with ``python cards.py today "Ana,Luis"`` or
+``python cards.py upcoming``; the PNG path is printed.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import textwrap
+import time
+from datetime import date
+from typing import Callable, Dict, List, Tuple
+
+from telegram.error import BadRequest
+
+import metrics
+from bday import SingleFlight, join_names
+from workers import BLOCKING, RENDER
+
+logger = logging.getLogger(__name__)
+
+# Bump when the drawing changes, so cached PNGs of the old style are not reused
+CARD_STYLE = 1
+
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+         "septiembre", "octubre", "noviembre", "diciembre"]
+MESES_CORTOS = ["ENE", "FEB", "MAR", "ABR", "MAY", "JUN", "JUL", "AGO", "SEP", "OCT", "NOV", "DIC"]
+
+# Size in pixels (at DPI) and colours
+WIDTH, HEIGHT, DPI = 800, 450, 100
+BACKGROUND = "#fff6e9"
+ACCENT = "#e4572e"
+INK = "#29335c"
+CONFETTI = ("#e4572e", "#f3a712", "#669bbc", "#a8c686", "#ff8fab")
+
+# Telegram's limit for photo captions
+MAX_CAPTION = 1024
+# Cards not written for this long are deleted by ``prune``
+KEEP_DAYS = 30
+# BadRequest messages meaning the file_id itself is no good; other errors (chat
+# not found, no rights to send photos) leave the shared file_id alone
+STALE_FILE_ID = ("file identifier", "file reference", "file_reference", "file_id")
+
+
+def card_key(spec: Dict) -> str:
+    """Content hash of a card: the same spec (and style) always maps to the same PNG and file_id."""
+    canonical = json.dumps([CARD_STYLE, spec], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+def _draw_today(fig, spec: Dict) -> None:
+    day = date.fromisoformat(spec["date"])
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_axis_off()
+    ax.set_xlim(0, WIDTH)
+    ax.set_ylim(0, HEIGHT)
+    # Same confetti for the same card
+    rng = random.Random(card_key(spec))
+    for _ in range(60):
+        x, y = rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)
+        if 80 < y < HEIGHT - 60 and 60 < x < WIDTH - 60:
+            continue
+        ax.scatter(x, y, s=rng.uniform(20, 120), color=rng.choice(CONFETTI), alpha=0.8, linewidths=0)
+    ax.text(WIDTH / 2, HEIGHT - 95, "¡Feliz cumpleaños!", ha="center", va="center",
+            fontsize=34, fontweight="bold", color=ACCENT)
+    names = spec["names"]
+    shown = names if len(names) <= 6 else names[:5] + [f"{len(names) - 5} más"]
+    text = join_names(shown)
+    size = 30 if len(text) <= 30 else 24 if len(text) <= 60 else 18
+    ax.text(WIDTH / 2, HEIGHT / 2 - 10, "\n".join(textwrap.wrap(text, 90 * 18 // size // 2)), ha="center",
+            va="center", fontsize=size, color=INK, linespacing=1.4)
+    ax.text(WIDTH / 2, 70, f"{day.day} de {MESES[day.month - 1]}", ha="center", va="center",
+            fontsize=18, color=INK, alpha=0.7)
+
+
+def _draw_upcoming(fig, spec: Dict) -> None:
+    today = date.fromisoformat(spec["date"])
+    days = spec["days"]
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_axis_off()
+    ax.set_xlim(0, WIDTH)
+    ax.set_ylim(0, HEIGHT)
+    ax.text(40, HEIGHT - 45, "Próximos cumpleaños", va="center", fontsize=24, fontweight="bold", color=ACCENT)
+    if not days:
+        ax.text(WIDTH / 2, HEIGHT / 2, "No hay cumpleaños registrados.", ha="center", va="center",
+                fontsize=18, color=INK)
+        return
+    from matplotlib.patches import FancyBboxPatch
+    row = (HEIGHT - 100) / max(len(days), 5)
+    for i, (iso, names) in enumerate(days):
+        day = date.fromisoformat(iso)
+        top = HEIGHT - 90 - i * row
+        until = (day - today).days
+        # A small calendar page per day
+        ax.add_patch(FancyBboxPatch((40, top - row + 8), 70, row - 14, boxstyle="round,pad=0,rounding_size=6",
+                                    facecolor=ACCENT if until == 0 else "white", edgecolor=ACCENT, linewidth=2))
+        ink = "white" if until == 0 else INK
+        ax.text(75, top - row / 2 + 6, str(day.day), ha="center", va="center", fontsize=18, fontweight="bold",
+                color=ink)
+        ax.text(75, top - row + 20, MESES_CORTOS[day.month - 1], ha="center", va="center", fontsize=9, color=ink)
+        label = join_names(names)
+        if len(label) > 52:
+            label = label[:51] + "…"
+        ax.text(130, top - row / 2 + 4, label, va="center", fontsize=16, color=INK)
+        when = "hoy" if until == 0 else "mañana" if until == 1 else f"en {until} días"
+        ax.text(WIDTH - 40, top - row / 2 + 4, when, ha="right", va="center", fontsize=13, color=INK, alpha=0.7)
+
+
+DRAW = {"today": _draw_today, "upcoming": _draw_upcoming}
+
+
+def render_card(spec: Dict, path: str) -> int:
+    """Draw ``spec`` into a PNG at ``path`` (written atomically) and return its size.
+
+    Runs in a ``RENDER`` worker process; matplotlib is imported here only.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(WIDTH / DPI, HEIGHT / DPI), dpi=DPI, facecolor=BACKGROUND)
+    FigureCanvasAgg(fig)
+    DRAW[spec["kind"]](fig, spec)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    # No "Software" entry: the same spec renders to the same bytes whatever the matplotlib version
+    fig.savefig(tmp, format="png", dpi=DPI, facecolor=BACKGROUND, metadata={"Software": None})
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def _stale_file_id(error: BadRequest) -> bool:
+    message = error.message.lower()
+    return any(words in message for words in STALE_FILE_ID)
+
+
+def _read(path: str) -> bytes | None:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _prune(directory: str, max_age: float) -> int:
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.name.endswith((".png", ".file_id")) and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+class CardRenderer:
+    """Renders birthday cards in the ``RENDER`` process pool and sends them with as little upload as possible.
+
+    - ``render(spec)`` returns the path of the card's PNG in ``directory``,
+      drawing it only if no process drew it before. Concurrent calls for one
+      card share the drawing.
+    - ``send(send_photo, spec, caption)`` sends the card through
+      ``send_photo`` (e.g. ``functools.partial(bot.send_photo, chat_id)`` or
+      ``message.reply_photo``). The first send uploads the PNG and keeps the
+      ``file_id`` Telegram returns, in memory and in ``<key>.file_id`` next to
+      the PNG, shared with the other bot processes and kept across restarts.
+      Later sends pass only the ``file_id``. Sends racing the first upload wait
+      for it rather than uploading the same card again. A ``file_id``
+      Telegram refuses as such ("wrong file identifier") is dropped and the
+      PNG uploaded again; other errors are raised as they are.
+
+    Sends by ``file_id`` and uploads are counted in ``bot_card_sends_total{via}``.
+    """
+
+    def __init__(self, directory: str, pool=RENDER, registry: metrics.Registry = metrics.REGISTRY):
+        self.directory = directory
+        self.pool = pool
+        self.registry = registry
+        os.makedirs(directory, exist_ok=True)
+        self._renders = SingleFlight("cards", registry)
+        # Cards known to be on disk, and file ids known so far
+        self._rendered = set()
+        self._file_ids: Dict[str, str] = {}
+        self._uploads: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def today(day: date, names: List[str]) -> Dict:
+        """Spec of the card announcing ``names``' birthdays on ``day``."""
+        return {"kind": "today", "date": day.isoformat(), "names": list(names)}
+
+    @staticmethod
+    def upcoming(today: date, days: List[Tuple[date, List[str]]]) -> Dict:
+        """Spec of the calendar card of the ``(date, names)`` entries of ``BirthdayIndex.upcoming``, as seen ``today``."""
+        return {"kind": "upcoming", "date": today.isoformat(),
+                "days": [[day.isoformat(), list(names)] for day, names in days]}
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.png")
+
+    async def render(self, spec: Dict) -> str:
+        """Path of ``spec``'s PNG, drawn first if it is not on disk yet."""
+        key = card_key(spec)
+        if key not in self._rendered:
+            await self._renders.do(key, self._render, key, spec)
+        return self.path(key)
+
+    async def _render(self, key: str, spec: Dict) -> None:
+        path = self.path(key)
+        if not await BLOCKING.run(os.path.exists, path, task="card_exists"):
+            await self.pool.run(render_card, spec, path, task="card_render")
+        self._rendered.add(key)
+
+    async def file_id(self, key: str) -> str | None:
+        file_id = self._file_ids.get(key)
+        if file_id is None:
+            data = await BLOCKING.run(_read, os.path.join(self.directory, f"{key}.file_id"), task="card_file_id")
+            if data:
+                file_id = self._file_ids[key] = data.decode().strip()
+        return file_id
+
+    async def _remember(self, key: str, file_id: str) -> None:
+        self._file_ids[key] = file_id
+        await BLOCKING.run(_write, os.path.join(self.directory, f"{key}.file_id"), file_id.encode(),
+                           task="card_file_id")
+
+    async def _forget(self, key: str) -> None:
+        self._file_ids.pop(key, None)
+        path = os.path.join(self.directory, f"{key}.file_id")
+        await BLOCKING.run(_write, path, b"", task="card_file_id")
+
+    async def send(self, send_photo: Callable, spec: Dict, caption: str | None = None):
+        """Send the card through ``send_photo(photo=..., caption=...)``; returns its Message."""
+        if caption is not None and len(caption) > MAX_CAPTION:
+            caption = caption[:MAX_CAPTION - 1] + "…"
+        key = card_key(spec)
+        file_id = self._file_ids.get(key)
+        if file_id is None:
+            # One look at the disk and at most one upload per card at a time, however many chats it goes to
+            lock = self._uploads.setdefault(key, asyncio.Lock())
+            async with lock:
+                try:
+                    file_id = await self.file_id(key)
+                    if file_id is None:
+                        return await self._upload(send_photo, key, spec, caption)
+                finally:
+                    # Failed or not, the next send takes a fresh look; sends already waiting share this lock
+                    self._uploads.pop(key, None)
+        try:
+            message = await send_photo(photo=file_id, caption=caption)
+        except BadRequest as e:
+            # e.g. "wrong file identifier": a file_id of another bot token, or one Telegram forgot
+            if not _stale_file_id(e):
+                raise
+            logger.warning("Telegram refused the file_id of card %s (%s); uploading it again", key, e)
+            await self._forget(key)
+            return await self._upload(send_photo, key, spec, caption)
+        self.registry.inc("bot_card_sends_total", via="file_id")
+        return message
+
+    async def _upload(self, send_photo: Callable, key: str, spec: Dict, caption: str | None):
+        data = await BLOCKING.run(_read, await self.render(spec), task="card_read")
+        if data is None:
+            # Deleted under us (prune, a cleared directory): draw it again
+            self._rendered.discard(key)
+            data = await BLOCKING.run(_read, await self.render(spec), task="card_read")
+        message = await send_photo(photo=data, caption=caption)
+        self.registry.inc("bot_card_sends_total", via="upload")
+        if message is not None and message.photo:
+            await self._remember(key, message.photo[-1].file_id)
+        return message
+
+    async def prune(self, max_age: float = KEEP_DAYS * 86400) -> int:
+        """Delete cards and file ids not written for ``max_age`` seconds; returns how many files went."""
+        removed = await BLOCKING.run(_prune, self.directory, max_age, task="card_prune")
+        self._rendered.clear()
+        self._file_ids.clear()
+        return removed
+
+
+def main(argv: List[str]) -> None:
+    directory = os.getenv("CARD_DIR") or "cards"
+    os.makedirs(directory, exist_ok=True)
+    today = date.today()
+    if argv and argv[0] == "today":
+        spec = CardRenderer.today(today, (argv[1] if len(argv) > 1 else "Ana,Luis").split(","))
+    else:
+        spec = CardRenderer.upcoming(today, [(today, ["Ana"]), (date.fromordinal(today.toordinal() + 3), ["Luis", "Marta"])])
+    path = os.path.join(directory, f"{card_key(spec)}.png")
+    render_card(spec, path)
+    print(path)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import glob
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "commands_log.json"
+
+
+class CommandLog:
+    """Append-only JSONL audit log of bot commands, written in batches off the event loop.
+
+    ``record()`` only appends a dict to an in-memory buffer. A background task
+    hands the buffer to a single writer thread every ``flush_interval`` seconds,
+    or as soon as ``flush_records`` entries are waiting. When the file grows
+    past ``max_bytes`` it is renamed to a timestamped segment and gzipped;
+    only the newest ``backups`` segments are kept. ``stop()`` writes whatever
+    is still buffered, so call it on shutdown.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, flush_interval: float = 1.0, flush_records: int = 500,
+                 max_bytes: int = 10 * 1024 * 1024, backups: int = 10):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_records = flush_records
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._buffer: List[dict] = []
+        self._file = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+
+    @classmethod
+    def from_config(cls, config) -> "CommandLog":
+        return cls(
+            config.COMMAND_LOG_PATH,
+            flush_interval=config.COMMAND_LOG_FLUSH_INTERVAL,
+            flush_records=config.COMMAND_LOG_FLUSH_RECORDS,
+            max_bytes=config.COMMAND_LOG_MAX_BYTES,
+            backups=config.COMMAND_LOG_BACKUPS,
+        )
+
+    def record(self, **fields) -> None:
+        fields.setdefault("ts", round(time.time(), 3))
+        self._buffer.append(fields)
+        if len(self._buffer) >= self.flush_records and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        # One thread so batches are written (and rotated) in order
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="command-log")
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._executor is None:
+            # Never started, e.g. an earlier post_init step failed
+            return
+        # Ask the flusher to write what is left and exit; cancelling it could be
+        # swallowed by wait_for (3.11) and leave stop() waiting forever.
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._close_file)
+        except OSError as e:
+            # Shutdown goes on: the records of this batch are lost
+            logger.error("Could not write command log %s on shutdown: %s", self.path, e)
+        finally:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._write, batch)
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except OSError as e:
+                logger.error("Could not write command log %s: %s", self.path, e)
+
+    # --- writer thread ---
+
+    def _write(self, batch: List[dict]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in batch))
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self) -> None:
+        self._close_file()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        segment = f"{self.path}.{stamp}"
+        os.replace(self.path, segment)
+        with open(segment, "rb") as src, gzip.open(segment + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(segment)
+        for old in segments(self.path)[:-self.backups or None]:
+            os.remove(old)
+        logger.info("Rotated command log to %s.gz", segment)
+
+
+def segments(path: str) -> List[str]:
+    """Compressed segments of ``path``, oldest first."""
+    return sorted(glob.glob(glob.escape(path) + ".*.gz"))
+
+
+def _command_name(update) -> str:
+    message = update.effective_message
+    text = message.text if message is not None and message.text else ""
+    return text.split(maxsplit=1)[0].split("@", 1)[0] if text.startswith("/") else ""
+
+
+def log_command(callback, command_log: CommandLog):
+    """Wrap a command callback so every call is recorded with its latency and outcome."""
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await callback(update, context)
+        except Exception as e:
+            outcome = f"error:{type(e).__name__}"
+            raise
+        finally:
+            user = update.effective_user
+            chat = update.effective_chat
+            command_log.record(
+                user=user.id if user else None,
+                chat=chat.id if chat else None,
+                command=_command_name(update),
+                latency_ms=round((time.perf_counter() - started) * 1000, 2),
+                outcome=outcome,
+            )
+
+    return wrapper
+
+
+def log_commands(app, command_log: CommandLog) -> None:
+    """Record every CommandHandler registered on ``app``. Call after all add_handler calls."""
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            if getattr(handler, "commands", None):
+                handler.callback = log_command(handler.callback, command_log)
+
+
+# --- reading ---
+
+def read_records(path: str = DEFAULT_PATH, include_segments: bool = True) -> Iterator[dict]:
+    """Yield the records of the log, oldest first, including the rotated segments."""
+    paths = (segments(path) if include_segments else []) + [path]
+    for p in paths:
+        opener = gzip.open if p.endswith(".gz") else open
+        try:
+            with opener(p, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(entry, dict):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def summarize(records: Iterable[dict], since: float | None = None) -> dict:
+    """Per-command count, errors and p50/p95 latency, plus the busiest users and chats."""
+    latencies = collections.defaultdict(list)
+    errors = collections.Counter()
+    users = collections.Counter()
+    chats = collections.Counter()
+    for r in records:
+        if since is not None and r.get("ts", 0) < since:
+            continue
+        command = r.get("command") or "?"
+        latencies[command].append(r.get("latency_ms", 0.0))
+        if r.get("outcome", "ok") != "ok":
+            errors[command] += 1
+        users[r.get("user")] += 1
+        chats[r.get("chat")] += 1
+    return {
+        "commands": {
+            command: {
+                "count": len(values),
+                "errors": errors[command],
+                "p50_ms": _percentile(values, 0.50),
+                "p95_ms": _percentile(values, 0.95),
+            }
+            for command, values in sorted(latencies.items())
+        },
+        "top_users": users.most_common(5),
+        "top_chats": chats.most_common(5),
+    }
+
+
+if __name__ == "__main__":
+    # python command_log.py [path] [--hours N] -> aggregated stats as JSON
+    parser = argparse.ArgumentParser(description="Aggregate stats from the command log")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument("--hours", type=float, help="only the last N hours")
+    args = parser.parse_args()
+    since = time.time() - args.hours * 3600 if args.hours else None
+    print(json.dumps(summarize(read_records(args.path), since=since), indent=2, ensure_ascii=False))
@@ -1,25 +1,67 @@
 import os
-from dataclasses import dataclass
-from dotenv import load_dotenv
+from dataclasses import dataclass, field
 import pathlib
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Load .env from the project directory (next to this file). If missing, fall back to .env.example
-base = pathlib.Path(__file__).parent
-env_path = base / ".env"
-example_path = base / ".env.example"
-if env_path.exists():
-    load_dotenv(dotenv_path=env_path)
-    logger.info("Loaded environment from %s", env_path)
-elif example_path.exists():
-    load_dotenv(dotenv_path=example_path)
-    logger.info("Loaded environment from %s (fallback)", example_path)
-else:
+
+def load_env() -> str | None:
+    """Load ``.env`` from the project directory (next to this file) into the environment.
+
+    Falls back to ``.env.example``, then to python-dotenv's own lookup. Values
+    already in the environment win. Called by ``load_config()``; nothing is
+    read at import time. Returns the file that was loaded, if any (logged by
+    ``bot.main()`` once logging is set up).
+    """
+    from dotenv import load_dotenv
+
+    base = pathlib.Path(__file__).parent
+    env_path = base / ".env"
+    example_path = base / ".env.example"
+    if env_path.exists():
+        load_dotenv(dotenv_path=env_path)
+        return str(env_path)
+    if example_path.exists():
+        load_dotenv(dotenv_path=example_path)
+        return str(example_path)
     # last resort: default behavior (current dir)
     load_dotenv()
-    logger.warning("No .env or .env.example next to config.py; using default load_dotenv() behavior")
+    return None
+
+
+@dataclass
+class BirthdayChat:
+    chat_id: int
+    # IANA timezone name; None means the server's local timezone.
+    tz: str | None = None
+    # Send time; None means BIRTHDAY_HOUR / BIRTHDAY_MINUTE.
+    hour: int | None = None
+    minute: int | None = None
+
+
+def parse_birthday_chats(raw: str) -> list:
+    """Parse ``BIRTHDAY_CHATS``: comma-separated ``chat_id[@timezone[@HH:MM]]`` entries.
+
+    Example: ``-1001,-1002@Europe/Madrid,-1003@America/Bogota@8:30``.
+    Invalid entries are logged and skipped.
+    """
+    chats = []
+    for entry in raw.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = entry.split("@")
+        try:
+            chat = BirthdayChat(chat_id=int(parts[0]), tz=(parts[1] or None) if len(parts) > 1 else None)
+            if len(parts) > 2 and parts[2]:
+                hour, _, minute = parts[2].partition(":")
+                chat.hour, chat.minute = int(hour), int(minute or 0)
+        except ValueError:
+            logger.warning("Ignoring invalid BIRTHDAY_CHATS entry: %r", entry)
+            continue
+        chats.append(chat)
+    return chats
 
 
 @dataclass
@@ -29,16 +71,166 @@ class Config:
     SUPABASE_KEY: str
     # Optional: chat id where birthday messages will be sent (as int). If empty, messages are logged but not sent.
     BIRTHDAY_CHAT_ID: str
+    # Chats that receive the daily announcement, each with an optional timezone and hour.
+    # Built from BIRTHDAY_CHATS plus BIRTHDAY_CHAT_ID.
+    BIRTHDAY_CHATS: list = field(default_factory=list)
+    # Default send time, in BIRTHDAY_TZ (IANA name; empty means the server's zone).
+    BIRTHDAY_HOUR: int = 9
+    BIRTHDAY_MINUTE: int = 0
+    BIRTHDAY_TZ: str = ""
+    # Minutes before the send time when the message is prepared; hours after it a
+    # missed announcement is still sent on startup.
+    BIRTHDAY_PREPARE_MINUTES: int = 10
+    BIRTHDAY_CATCH_UP_HOURS: float = 6.0
+    # SQLite outbox the announcements are delivered from, one per chat and day.
+    OUTBOX_PATH: str = "outbox.sqlite3"
+    # Seconds before the in-memory birthday index is refreshed from Supabase.
+    BIRTHDAY_INDEX_TTL: int = 300
+    # Local SQLite copy of Cumples for warm starts and Supabase outages (empty path disables it).
+    SNAPSHOT_PATH: str = "cumples.sqlite3"
+    SNAPSHOT_MAX_AGE: int = 7 * 24 * 3600
+    SNAPSHOT_REFRESH: int = 3600
+    # Several bot processes on one host: SQLite cache of Supabase/Wikipedia data they share
+    # (empty: each process caches in memory), and the lock file electing the one process that
+    # runs the scheduled jobs (empty: this process always does), retried every LEADER_RETRY s.
+    CACHE_PATH: str = ""
+    LEADER_LOCK_PATH: str = ""
+    LEADER_RETRY: int = 30
+    # Worker threads for blocking calls (snapshot, HTML parsing) and how many more may
+    # wait; calls beyond that are refused instead of queued.
+    BLOCKING_WORKERS: int = 4
+    BLOCKING_QUEUE: int = 32
+    # Shared Supabase client: request timeout (s), pool size and keep-alive expiry (s).
+    SUPABASE_TIMEOUT: float = 10.0
+    SUPABASE_MAX_CONNECTIONS: int = 10
+    SUPABASE_KEEPALIVE: float = 30.0
+    # Optional PostgREST base URL override (defaults to <SUPABASE_URL>/rest/v1).
+    SUPABASE_REST_URL: str = ""
+    # Rows per page when reading Cumples (keep at or below PostgREST's max-rows).
+    SUPABASE_PAGE_SIZE: int = 1000
+    # Where birthdays are filtered by day: "server" (needs supabase/migrations), "client",
+    # or "auto" (server until the column turns out to be missing).
+    SUPABASE_QUERY_MODE: str = "auto"
+    # Offline Wikipedia "Nacimientos" store and the hour (local time) of its weekly rebuild.
+    WIKI_STORE_PATH: str = ""
+    WIKI_REFRESH_HOUR: int = 4
+    # Live Wikipedia fallback: overall deadline (s) and number of retries.
+    WIKI_DEADLINE: float = 10.0
+    WIKI_RETRIES: int = 3
+    # Birthday cards (needs requirements-cards.txt): directory of the rendered PNGs and their
+    # Telegram file ids (empty disables cards), and the processes that render them.
+    CARD_DIR: str = ""
+    CARD_WORKERS: int = 2
+    # Updates handled at once (different chats in parallel, each chat in order); 1 = one at a time.
+    UPDATE_CONCURRENCY: int = 16
+    # Bot API server, e.g. a local telegram-bot-api; empty means api.telegram.org.
+    TELEGRAM_BASE_URL: str = ""
+    # How updates are received: "polling" (default) or "webhook".
+    BOT_MODE: str = "polling"
+    # Webhook mode: public URL registered with Telegram (optional), secret token,
+    # and the address/port/path the embedded server listens on.
+    WEBHOOK_URL: str = ""
+    WEBHOOK_SECRET: str = ""
+    WEBHOOK_LISTEN: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8443
+    WEBHOOK_PATH: str = "/telegram"
+    # Prometheus-style /metrics endpoint; METRICS_PORT=0 disables it.
+    METRICS_LISTEN: str = "127.0.0.1"
+    METRICS_PORT: int = 9100
+    # Logging: "json" or "text" records, written off the event loop; LOG_FILE adds a file sink.
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_FILE: str = ""
+    # Fraction of incoming updates traced; chats in LOG_DEBUG_CHATS are always traced.
+    LOG_UPDATE_SAMPLE_RATE: float = 0.01
+    LOG_DEBUG_CHATS: list = field(default_factory=list)
+    # JSONL audit log of commands (empty path disables it); batched, rotated past MAX_BYTES.
+    COMMAND_LOG_PATH: str = "commands_log.json"
+    COMMAND_LOG_FLUSH_INTERVAL: float = 1.0
+    COMMAND_LOG_FLUSH_RECORDS: int = 500
+    COMMAND_LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    COMMAND_LOG_BACKUPS: int = 10
+    # File load_config() read the environment from (None: none, or not asked to).
+    ENV_FILE: str | None = None
+
+
+def parse_chat_ids(raw: str) -> list:
+    """Parse a comma-separated list of chat ids, skipping invalid entries."""
+    ids = []
+    for entry in raw.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            ids.append(int(entry))
+        except ValueError:
+            logger.warning("Ignoring invalid chat id: %r", entry)
+    return ids
 
 
-def load_config() -> Config:
+def load_config(env_file: bool = True) -> Config:
+    """Build the Config from the environment, loading the ``.env`` file first unless ``env_file`` is False."""
+    env_path = load_env() if env_file else None
     token = os.getenv("TELEGRAM_BOT_TOKEN", "")
     supabase_url = os.getenv("SUPABASE_URL", "")
     supabase_key = os.getenv("SUPABASE_KEY", "")
     birthday_chat = os.getenv("BIRTHDAY_CHAT_ID", "")
+    index_ttl = int(os.getenv("BIRTHDAY_INDEX_TTL", "300"))
+    chats = parse_birthday_chats(os.getenv("BIRTHDAY_CHATS", ""))
+    if birthday_chat and not any(str(c.chat_id) == birthday_chat.strip() for c in chats):
+        chats = parse_birthday_chats(birthday_chat) + chats
     return Config(
         TELEGRAM_BOT_TOKEN=token,
         SUPABASE_URL=supabase_url,
         SUPABASE_KEY=supabase_key,
         BIRTHDAY_CHAT_ID=birthday_chat,
+        BIRTHDAY_CHATS=chats,
+        BIRTHDAY_HOUR=int(os.getenv("BIRTHDAY_HOUR", "9")),
+        BIRTHDAY_MINUTE=int(os.getenv("BIRTHDAY_MINUTE", "0")),
+        BIRTHDAY_TZ=os.getenv("BIRTHDAY_TZ", "").strip(),
+        BIRTHDAY_PREPARE_MINUTES=int(os.getenv("BIRTHDAY_PREPARE_MINUTES", "10")),
+        BIRTHDAY_CATCH_UP_HOURS=float(os.getenv("BIRTHDAY_CATCH_UP_HOURS", "6")),
+        OUTBOX_PATH=os.getenv("OUTBOX_PATH", "outbox.sqlite3"),
+        BIRTHDAY_INDEX_TTL=index_ttl,
+        SNAPSHOT_PATH=os.getenv("SNAPSHOT_PATH", "cumples.sqlite3"),
+        SNAPSHOT_MAX_AGE=int(os.getenv("SNAPSHOT_MAX_AGE", str(7 * 24 * 3600))),
+        SNAPSHOT_REFRESH=int(os.getenv("SNAPSHOT_REFRESH", "3600")),
+        CACHE_PATH=os.getenv("CACHE_PATH", ""),
+        LEADER_LOCK_PATH=os.getenv("LEADER_LOCK_PATH", ""),
+        LEADER_RETRY=int(os.getenv("LEADER_RETRY", "30")),
+        BLOCKING_WORKERS=int(os.getenv("BLOCKING_WORKERS", "4")),
+        BLOCKING_QUEUE=int(os.getenv("BLOCKING_QUEUE", "32")),
+        SUPABASE_TIMEOUT=float(os.getenv("SUPABASE_TIMEOUT", "10")),
+        SUPABASE_MAX_CONNECTIONS=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "10")),
+        SUPABASE_KEEPALIVE=float(os.getenv("SUPABASE_KEEPALIVE", "30")),
+        SUPABASE_REST_URL=os.getenv("SUPABASE_REST_URL", ""),
+        SUPABASE_PAGE_SIZE=int(os.getenv("SUPABASE_PAGE_SIZE", "1000")),
+        SUPABASE_QUERY_MODE=os.getenv("SUPABASE_QUERY_MODE", "auto").strip().lower(),
+        WIKI_STORE_PATH=os.getenv("WIKI_STORE_PATH", ""),
+        WIKI_REFRESH_HOUR=int(os.getenv("WIKI_REFRESH_HOUR", "4")),
+        WIKI_DEADLINE=float(os.getenv("WIKI_DEADLINE", "10")),
+        WIKI_RETRIES=int(os.getenv("WIKI_RETRIES", "3")),
+        CARD_DIR=os.getenv("CARD_DIR", ""),
+        CARD_WORKERS=int(os.getenv("CARD_WORKERS", "2")),
+        UPDATE_CONCURRENCY=int(os.getenv("UPDATE_CONCURRENCY", "16")),
+        TELEGRAM_BASE_URL=os.getenv("TELEGRAM_BASE_URL", ""),
+        BOT_MODE=os.getenv("BOT_MODE", "polling").strip().lower(),
+        WEBHOOK_URL=os.getenv("WEBHOOK_URL", ""),
+        WEBHOOK_SECRET=os.getenv("WEBHOOK_SECRET", ""),
+        WEBHOOK_LISTEN=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+        WEBHOOK_PORT=int(os.getenv("WEBHOOK_PORT", "8443")),
+        WEBHOOK_PATH=os.getenv("WEBHOOK_PATH", "/telegram"),
+        METRICS_LISTEN=os.getenv("METRICS_LISTEN", "127.0.0.1"),
+        METRICS_PORT=int(os.getenv("METRICS_PORT", "9100")),
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "INFO").strip().upper(),
+        LOG_FORMAT=os.getenv("LOG_FORMAT", "json").strip().lower(),
+        LOG_FILE=os.getenv("LOG_FILE", ""),
+        LOG_UPDATE_SAMPLE_RATE=float(os.getenv("LOG_UPDATE_SAMPLE_RATE", "0.01")),
+        LOG_DEBUG_CHATS=parse_chat_ids(os.getenv("LOG_DEBUG_CHATS", "")),
+        COMMAND_LOG_PATH=os.getenv("COMMAND_LOG_PATH", "commands_log.json"),
+        COMMAND_LOG_FLUSH_INTERVAL=float(os.getenv("COMMAND_LOG_FLUSH_INTERVAL", "1")),
+        COMMAND_LOG_FLUSH_RECORDS=int(os.getenv("COMMAND_LOG_FLUSH_RECORDS", "500")),
+        COMMAND_LOG_MAX_BYTES=int(os.getenv("COMMAND_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        COMMAND_LOG_BACKUPS=int(os.getenv("COMMAND_LOG_BACKUPS", "10")),
+        ENV_FILE=env_path,
     )
@@ -1,61 +1,218 @@
-import asyncio
+import functools
 import logging
 from typing import Any
-from datetime import datetime
+from datetime import date, datetime, time
 
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
 
-from bday import get_next_birthday_sync, join_names
+from bday import BirthdayIndex, fetch_birthdays, fetch_next_birthday, get_next_birthday, join_names, read_snapshot
+from reply_cache import ReplyCache
+from scheduler import resolve_zone
+from workers import PoolBusy
 
 logger = logging.getLogger(__name__)
 
 
-def register_handlers(app: Any, config) -> None:
+def ymd_to_dmy_simple(s: str) -> str:
+    y, m, d = s.split("-")
+    return f"{d.zfill(2)}-{m.zfill(2)}-{y}"
+
+
+def format_next_birthday(data: dict) -> str:
+    """Render the /getCumple reply from the dict returned by ``get_next_birthday``."""
+    if not data.get("found"):
+        return "No hay cumpleaños registrados."
+    fecha = ymd_to_dmy_simple(data['date'])
+
+    # Normalize base name and others, and join with commas and ' y ' before the last name.
+    base_name = str(data.get('name') or data.get('id') or 'desconocido')
+    raw_others = data.get('others') or []
+    others = [str(o) for o in raw_others if str(o) and str(o) != base_name]
+
+    name = join_names([base_name] + others)
+
+    if data['days_until'] == 0:
+        return f"Hoy es el cumpleaños de {name}! 🎉🎂"
+    elif data['days_until'] == 1:
+        return f"El siguiente cumpleaños es el de {name} el {fecha}, osea, mañana!"
+    return f"El siguiente cumpleaños es el de {name} el {fecha}, en solo {data['days_until']} días!"
+
+
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+         "septiembre", "octubre", "noviembre", "diciembre"]
+
+# Telegram rejects messages over 4096 characters
+MAX_REPLY = 4000
+DEFAULT_PROXIMOS = 5
+MAX_PROXIMOS = 50
+
+
+def _birthday_lines(header: str, days, today: date) -> str:
+    """Render ``(date, names)`` entries one per line under ``header``, cut to fit in one message."""
+    lines = [header]
+    size = len(header)
+    for i, (day, names) in enumerate(days):
+        until = (day - today).days
+        when = "hoy" if until == 0 else "mañana" if until == 1 else f"en {until} días" if until > 0 else None
+        line = f"- {day.strftime('%d-%m')}: {join_names(names)}" + (f" ({when})" if when else "")
+        if size + len(line) + 1 > MAX_REPLY:
+            lines.append(f"… y {len(days) - i} días más")
+            break
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def format_upcoming(days, today: date) -> str:
+    """Render the /proximos reply from ``BirthdayIndex.upcoming`` entries."""
+    if not days:
+        return "No hay cumpleaños registrados."
+    return _birthday_lines("Próximos cumpleaños:", days, today)
+
+
+def format_month(days, month: int, today: date) -> str:
+    """Render the /cumplesMes reply from ``BirthdayIndex.in_month`` entries."""
+    if not days:
+        return f"No hay cumpleaños en {MESES[month - 1]}."
+    return _birthday_lines(f"Cumpleaños de {MESES[month - 1]}:", days, today)
+
+
+def parse_month(arg: str) -> int | None:
+    """Month number from ``"3"``, ``"marzo"`` or ``"mar"``; None if it is not one."""
+    arg = arg.strip().lower()
+    if arg.isdigit():
+        return int(arg) if 1 <= int(arg) <= 12 else None
+    matches = [i for i, name in enumerate(MESES, 1) if len(arg) >= 3 and name.startswith(arg)]
+    return matches[0] if len(matches) == 1 else None
+
+
+UNAVAILABLE = "No puedo consultar los cumpleaños ahora mismo, prueba más tarde."
+BUSY = "Estoy muy ocupado ahora mismo, prueba de nuevo en unos segundos."
+
+
+def _error_reply(e: Exception) -> str:
+    # A full worker pool is a burst that passes in seconds, not an outage
+    return BUSY if isinstance(e, PoolBusy) else UNAVAILABLE
+
+
+def register_handlers(app: Any, config, client, snapshot=None, cache=None, cards=None) -> None:
     """Register command handlers onto the given Application instance.
 
     Handlers are defined as closures so they can capture the `config` object
-    without making the module depend on application-global state.
+    and the shared Supabase `client` without making the module depend on
+    application-global state. With a ``snapshot`` (BirthdaySnapshot), the
+    index starts from the local copy and Supabase outages fall back to it.
+    With a ``cache`` shared by several bot processes, the index loads the rows
+    another process cached instead of asking Supabase. With ``cards`` (a
+    ``cards.CardRenderer``), /getCumple answers with a calendar card of the
+    upcoming birthdays, captioned with the usual text.
     """
 
+    # Same zone as the daily announcement, so "today" changes at the same midnight, DST included
+    zone = resolve_zone(config.BIRTHDAY_TZ)
+
+    def now() -> datetime:
+        return datetime.now(zone)
+
+    index = BirthdayIndex(
+        functools.partial(fetch_birthdays, client, snapshot, cache),
+        ttl=config.BIRTHDAY_INDEX_TTL,
+        warm=functools.partial(read_snapshot, snapshot, "rows") if snapshot is not None else None,
+    )
+
     async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         user = update.effective_user
         await update.message.reply_text(f"Hello {user.first_name or 'there'}! I'm alive.")
 
     async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        await update.message.reply_text("Available commands: /start, /help, /getCumple")
+        await update.message.reply_text("Available commands: /start, /help, /getCumple, /proximos [N], /cumplesMes [mes]")
 
-    async def get_cumple_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def render_next_birthday(today: date) -> str:
+        if not index.loaded:
+            # Cold start: two small range queries instead of waiting for the whole table
+            found = await fetch_next_birthday(client, today)
+            if found is not None:
+                return format_next_birthday(found)
+        return format_next_birthday(await get_next_birthday(index, today))
 
-        def ymd_to_dmy_simple(s: str) -> str:
-            y, m, d = s.split("-")
-            return f"{d.zfill(2)}-{m.zfill(2)}-{y}"
-        """Handler for /getCumple: fetches nearest birthday from Supabase and replies."""
-        loop = asyncio.get_event_loop()
-        data = await loop.run_in_executor(
-            None, get_next_birthday_sync, config.SUPABASE_URL, config.SUPABASE_KEY
-        )
-        if not data.get("found"):
-            await update.message.reply_text("No hay cumpleaños registrados.")
-            return
-        fecha = ymd_to_dmy_simple(data['date'])
+    # Same answer for everyone until midnight or until the table changes
+    reply_cache = ReplyCache(render_next_birthday, version=lambda: index.version, clock=now)
 
-        # Normalize base name and others, and join with commas and ' y ' before the last name.
-        base_name = str(data.get('name') or data.get('id') or 'desconocido')
-        raw_others = data.get('others') or []
-        others = [str(o) for o in raw_others if str(o) and str(o) != base_name]
+    def upcoming_card() -> dict | None:
+        if cards is None or not index.loaded:
+            return None
+        today = now().date()
+        return cards.upcoming(today, index.upcoming(DEFAULT_PROXIMOS, today))
 
-        name = join_names([base_name] + others)
+    async def get_cumple_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handler for /getCumple: replies with the nearest birthday, rendered once per day."""
+        try:
+            if index.loaded or snapshot is not None or not client.server_filter:
+                # Non-blocking once loaded: a stale index reloads in the background and bumps its version
+                await index.ensure_fresh()
+            else:
+                index.load_in_background()
+            text = await reply_cache.get()
+            card = upcoming_card()
+        except Exception as e:
+            logger.error("Could not answer /getCumple: %s", e)
+            text, card = _error_reply(e), None
+        if card is not None:
+            try:
+                await cards.send(update.message.reply_photo, card, caption=text)
+                return
+            except Exception as e:
+                logger.error("Could not send the /getCumple card, replying with text: %s", e)
+        await update.message.reply_text(text)
+
+    async def proximos_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handler for /proximos [N]: the next N birthday days (default 5), people sharing a day together."""
+        try:
+            n = int(context.args[0]) if context.args else DEFAULT_PROXIMOS
+        except ValueError:
+            await update.message.reply_text(f"Uso: /proximos [N], con N entre 1 y {MAX_PROXIMOS}")
+            return
+        n = max(1, min(n, MAX_PROXIMOS))
+        try:
+            await index.ensure_fresh()
+            today = now().date()
+            text = format_upcoming(index.upcoming(n, today), today)
+        except Exception as e:
+            logger.error("Could not answer /proximos: %s", e)
+            text = _error_reply(e)
+        await update.message.reply_text(text)
 
-        if data['days_until'] == 0:
-            text = f"Hoy es el cumpleaños de {name}! 🎉🎂"
-        elif data['days_until'] == 1:
-            text = f"El siguiente cumpleaños es el de {name} el {fecha}, osea, mañana!"
-        else:
-            text = f"El siguiente cumpleaños es el de {name} el {fecha}, en solo {data['days_until']} días!"
+    async def cumples_mes_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handler for /cumplesMes [mes]: every birthday of a month (default: the current one)."""
+        today = now().date()
+        month = parse_month(context.args[0]) if context.args else today.month
+        if month is None:
+            await update.message.reply_text("Uso: /cumplesMes [mes], p. ej. /cumplesMes 3 o /cumplesMes marzo")
+            return
+        try:
+            await index.ensure_fresh()
+            # A month already over this year is shown for next year
+            year = today.year + (month < today.month)
+            text = format_month(index.in_month(month, year), month, today)
+        except Exception as e:
+            logger.error("Could not answer /cumplesMes: %s", e)
+            text = _error_reply(e)
         await update.message.reply_text(text)
 
+    async def rebuild_reply(context: ContextTypes.DEFAULT_TYPE) -> None:
+        await reply_cache.refresh()
+        card = upcoming_card()
+        if card is not None:
+            await cards.render(card)
+
     # Register handlers on the application
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_command))
     app.add_handler(CommandHandler("getCumple", get_cumple_cmd))
+    app.add_handler(CommandHandler("proximos", proximos_cmd))
+    app.add_handler(CommandHandler("cumplesMes", cumples_mes_cmd))
+
+    # Have the new day's reply (and card) ready before the first /getCumple after midnight
+    if app.job_queue is not None:
+        app.job_queue.run_daily(rebuild_reply, time=time(0, 0, tzinfo=zone))
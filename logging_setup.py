@@ -0,0 +1,129 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+NOISY_LOGGERS = ("httpx", "httpcore", "telegram", "apscheduler")
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else on a record came from ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per line: ts, level, logger, msg, plus any ``extra=`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class LoopQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that does the minimum on the calling thread.
+
+    The stock ``prepare`` runs a full ``format`` and copies the record; here we
+    only merge the arguments into the message (so they cannot change before the
+    listener sees them) and render any traceback, leaving formatting to the
+    listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(config) -> logging.handlers.QueueListener:
+    """Route all logging through a queue so formatting and I/O happen off the event loop.
+
+    The root logger only gets a QueueHandler; a QueueListener thread formats
+    the records (JSON or text, per LOG_FORMAT) and writes them to stdout and,
+    if LOG_FILE is set, to that file. Returns the started listener; stop it on
+    shutdown to flush what is left in the queue.
+    """
+    formatter = JsonFormatter() if config.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if config.LOG_FILE:
+        handlers.append(logging.FileHandler(config.LOG_FILE, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(LoopQueueHandler(log_queue))
+    root.setLevel(config.LOG_LEVEL)
+    # Reduce verbosity of noisy third-party loggers
+    for noisy in NOISY_LOGGERS:
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def _compact_update(update: Update) -> dict:
+    chat = update.effective_chat
+    user = update.effective_user
+    message = update.effective_message
+    text = message.text if message is not None and message.text else None
+    return {
+        "update_id": update.update_id,
+        "chat_id": chat.id if chat else None,
+        "chat_type": chat.type if chat else None,
+        "user_id": user.id if user else None,
+        "text": text[:200] if text else None,
+    }
+
+
+class UpdateTracer:
+    """Logs a compact record of incoming updates, sampled to keep busy chats cheap.
+
+    Updates from chats in ``debug_chats`` are always logged; the rest with
+    probability ``sample_rate``. The sampling decision is made before anything
+    is formatted, so a skipped update costs one random() call.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, debug_chats=()):
+        self.sample_rate = sample_rate
+        self.debug_chats = frozenset(debug_chats)
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or bool(self.debug_chats)
+
+    def should_trace(self, update: Update) -> bool:
+        if self.debug_chats:
+            chat = update.effective_chat
+            if chat is not None and chat.id in self.debug_chats:
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def trace_update(self, update: Update, context) -> None:
+        if self.should_trace(update):
+            fields = _compact_update(update)
+            # In the message for the text format; as a field for the JSON one
+            logger.info("update %s chat=%s (%s) user=%s text=%r", fields["update_id"], fields["chat_id"],
+                        fields["chat_type"], fields["user_id"], fields["text"], extra={"update": fields})
@@ -0,0 +1,209 @@
+import asyncio
+import bisect
+import functools
+import logging
+import time
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers everything from a cached reply to a slow Wikipedia fetch
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "bot_handler_seconds": "Latency of update handlers and jobs.",
+    "bot_handler_errors_total": "Exceptions raised by update handlers and jobs.",
+    "bot_handler_in_flight": "Handler and job calls currently running.",
+    "bot_phase_seconds": "Latency of the phases of the birthday job and of backend calls.",
+    "bot_singleflight_calls_total": "Backend reads started (kind=real) or joined while in flight (kind=coalesced).",
+    "bot_executor_seconds": "Time blocking calls spent queued (stage=wait) and running (stage=run) in a worker pool.",
+    "bot_executor_rejected_total": "Blocking calls refused because the worker pool queue was full.",
+    "bot_executor_pending": "Blocking calls queued or running in a worker pool.",
+    "bot_card_sends_total": "Birthday cards sent by their Telegram file_id (via=file_id) or uploaded (via=upload).",
+    "bot_updates": "Updates waiting for their chat or a free slot (state=waiting) and being handled (state=running).",
+}
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # one slot per bucket plus +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: Tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Registry:
+    """In-process metric store rendered in the Prometheus text format.
+
+    Everything runs on the event loop, so updates are plain dict/int operations
+    with no locking: cheap enough to leave on for every update.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[Tuple, Histogram] = {}
+        self.counters: Dict[Tuple, float] = {}
+        self.gauges: Dict[Tuple, float] = {}
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        key = (name, _labels(labels))
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+        return hist
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        self.histogram(name, **labels).observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_gauge(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        self.gauges[(name, _labels(labels))] = value
+
+    def render(self) -> str:
+        lines = []
+        seen = set()
+
+        def header(name: str, kind: str) -> None:
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), hist in sorted(self.histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+        for kind, store in (("counter", self.counters), ("gauge", self.gauges)):
+            for (name, labels), value in sorted(store.items()):
+                header(name, kind)
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class timer:
+    """Context manager observing the elapsed time into ``bot_phase_seconds{phase=...}``."""
+
+    __slots__ = ("hist", "started")
+
+    def __init__(self, phase: str, registry: Registry = REGISTRY):
+        self.hist = registry.histogram("bot_phase_seconds", phase=phase)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.started)
+        return False
+
+
+def instrument(callback, name: str, registry: Registry = REGISTRY):
+    """Wrap an async handler or job callback with latency, error and in-flight metrics."""
+    hist = registry.histogram("bot_handler_seconds", handler=name)
+    labels = _labels({"handler": name})
+    in_flight = ("bot_handler_in_flight", labels)
+    errors = ("bot_handler_errors_total", labels)
+    registry.gauges.setdefault(in_flight, 0)
+    registry.counters.setdefault(errors, 0)
+
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        registry.gauges[in_flight] += 1
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except Exception:
+            registry.counters[errors] += 1
+            raise
+        finally:
+            hist.observe(time.perf_counter() - started)
+            registry.gauges[in_flight] -= 1
+
+    return wrapper
+
+
+def _handler_name(handler) -> str:
+    commands = getattr(handler, "commands", None)
+    if commands:
+        return "/" + sorted(commands)[0]
+    return getattr(handler.callback, "__name__", type(handler).__name__)
+
+
+def instrument_application(app, registry: Registry = REGISTRY) -> None:
+    """Wrap the callback of every handler registered on ``app``. Call after all add_handler calls."""
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            handler.callback = instrument(handler.callback, _handler_name(handler), registry)
+
+
+class MetricsServer:
+    """Serves ``GET /metrics`` in the Prometheus text format on a local port."""
+
+    def __init__(self, listen: str = "127.0.0.1", port: int = 9100, registry: Registry = REGISTRY):
+        self.listen = listen
+        self.port = port
+        self.registry = registry
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.listen, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Metrics available at http://%s:%s/metrics", self.listen, self.port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            parts = head.split(b" ", 2)
+            if len(parts) > 1 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+                status, body = "200 OK", self.registry.render().encode()
+            else:
+                status, body = "404 Not Found", b""
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,148 @@
+import logging
+from html.parser import HTMLParser
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+HEADINGS = ("h2", "h3")
+# Elements that never get an end tag, so they must not be pushed on the stack
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+             "meta", "param", "source", "track", "wbr"}
+# Text inside these is not part of get_text() output
+SKIP_TEXT_TAGS = {"style", "script"}
+
+
+class _Done(Exception):
+    """Raised from a parser callback to stop scanning the rest of the page."""
+
+
+class _NacimientosParser(HTMLParser):
+    """Event-driven scan for the first list under the "Nacimientos" heading.
+
+    States:
+      search  -- looking for ``id="Nacimientos"`` or an h2/h3 whose text contains it
+      section -- heading found; waiting for the first non-empty ``<ul>`` before
+                 the next h2/h3
+      list    -- inside that ``<ul>``, collecting the text of its direct ``<li>``
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.births: List[str] = []
+        self.state = "search"
+        self.found = False
+        # Stop at the next h2/h3; False when the anchor has no heading ancestor
+        self.bounded = True
+        self.depth = 0
+        self.heading_depth = None
+        self.heading_text: List[str] = []
+        self.skip_depth = None
+        self.ul_depth = None
+        self.li_depth = None
+        self.li_parts: List[str] = []
+        self._pending: List[str] = []
+
+    # --- text handling: one chunk per text node, stripped like get_text(strip=True)
+
+    def _flush_text(self) -> None:
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        if self.skip_depth is not None:
+            return
+        if self.heading_depth is not None:
+            self.heading_text.append(text)
+        if self.li_depth is not None:
+            text = text.strip()
+            if text:
+                self.li_parts.append(text)
+
+    def handle_data(self, data: str) -> None:
+        self._pending.append(data)
+
+    def handle_comment(self, data: str) -> None:
+        self._flush_text()
+
+    # --- tags
+
+    def handle_startendtag(self, tag, attrs) -> None:
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_starttag(self, tag, attrs) -> None:
+        self._flush_text()
+        if tag in HEADINGS and self.found and self.bounded and self.heading_depth is None:
+            # Next section reached
+            raise _Done
+        if tag in VOID_TAGS:
+            return
+        self.depth += 1
+
+        if tag in SKIP_TEXT_TAGS and self.skip_depth is None:
+            self.skip_depth = self.depth
+
+        if self.state == "search":
+            if tag in HEADINGS and self.heading_depth is None:
+                self.heading_depth = self.depth
+                self.heading_text = []
+            if dict(attrs).get("id") == "Nacimientos":
+                self._found(bounded=self.heading_depth is not None or tag in HEADINGS)
+        elif tag == "ul" and self.state == "section":
+            self.state = "list"
+            self.ul_depth = self.depth
+        elif tag == "li" and self.state == "list" and self.depth == self.ul_depth + 1:
+            self.li_depth = self.depth
+            self.li_parts = []
+
+    def handle_endtag(self, tag) -> None:
+        self._flush_text()
+        if tag in VOID_TAGS:
+            return
+
+        if self.depth == self.skip_depth:
+            self.skip_depth = None
+
+        if self.depth == self.heading_depth:
+            self.heading_depth = None
+            if self.state == "search" and "Nacimientos" in "".join(self.heading_text):
+                self._found(bounded=True)
+        elif self.depth == self.li_depth:
+            text = "".join(self.li_parts)
+            if text:
+                self.births.append(text)
+            self.li_depth = None
+        elif self.depth == self.ul_depth:
+            self.ul_depth = None
+            if self.births or not self.bounded:
+                raise _Done
+            # Empty list: keep looking for the next one in the section
+            self.state = "section"
+
+        self.depth = max(self.depth - 1, 0)
+
+    def _found(self, bounded: bool) -> None:
+        self.found = True
+        self.bounded = bounded
+        self.state = "section"
+
+
+def extract_births(html_content: str, chunk_size: int = 16384) -> List[str]:
+    """Return the top-level ``<li>`` texts of the "Nacimientos" section of a day page.
+
+    The page is fed to ``html.parser`` in chunks and scanning stops at the end
+    of the first non-empty list after the heading (or at the next h2/h3), so
+    no DOM is built and the rest of the page is never parsed.
+    """
+    parser = _NacimientosParser()
+    try:
+        for i in range(0, len(html_content), chunk_size):
+            parser.feed(html_content[i:i + chunk_size])
+        parser.close()
+    except _Done:
+        pass
+
+    if not parser.found:
+        logger.warning("Could not find 'Nacimientos' section")
+    return parser.births
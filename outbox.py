@@ -0,0 +1,341 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+from typing import Iterable, List, Tuple
+
+from telegram.error import BadRequest, ChatMigrated, Forbidden, InvalidToken, RetryAfter
+
+import metrics
+from sender import FanoutSender, _retry_seconds
+from workers import BlockingPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "outbox.sqlite3"
+
+# Telegram will never accept these as they are: retrying only repeats the error
+PERMANENT_ERRORS = (Forbidden, BadRequest, ChatMigrated, InvalidToken)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    chat_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    text TEXT NOT NULL,
+    card TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    expires_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    PRIMARY KEY (chat_id, day)
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+# Delivered, failed and expired rows are kept this long for inspection
+KEEP_DAYS = 60
+
+
+class Outbox:
+    """Durable queue of scheduled messages, one row per (chat, day), in SQLite.
+
+    ``enqueue`` ignores a (chat, day) that already has a row, whatever its
+    status, so each chat is announced at most once per day however often the
+    scheduler runs or the bot restarts. Rows stay ``pending`` until the
+    ``OutboxDrainer`` marks them ``sent``, ``failed`` (an error Telegram will
+    not get over) or ``expired`` (past ``expires_at``, e.g. a "today" message
+    after midnight). A message may carry a card spec (see cards.py), sent as
+    a photo with the text as its caption.
+
+    All database work runs on the outbox's own single thread, which also keeps
+    writes in order.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._pool = BlockingPool("outbox", max_workers=1, max_queue=1000)
+        self.wakeup = asyncio.Event()
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            # Outboxes created before cards
+            if "card" not in {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}:
+                conn.execute("ALTER TABLE outbox ADD COLUMN card TEXT")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    async def missing(self, chat_ids: Iterable[int], day: date) -> List[int]:
+        """The chats in ``chat_ids`` with no message for ``day`` yet (queued or delivered)."""
+        return await self._pool.run(self._missing, list(chat_ids), day.isoformat(), task="outbox_missing")
+
+    async def enqueue(self, day: date, messages: Iterable[Tuple], expires_at: float | None = None) -> int:
+        """Queue ``(chat_id, text)`` or ``(chat_id, text, card)`` messages for ``day`` and wake the drainer.
+
+        Returns how many were new.
+        """
+        added = await self._pool.run(self._enqueue, day.isoformat(), list(messages), expires_at, task="outbox_enqueue")
+        self.wakeup.set()
+        return added
+
+    async def due(self, now: float, limit: int):
+        """Return ``(rows, next_due, expired)``.
+
+        ``rows`` holds up to ``limit`` ``(chat_id, day, text, attempts, card)`` due
+        now. ``next_due`` is when the next pending row is due (None if
+        there is none). ``expired`` counts the rows this call expired.
+        """
+        return await self._pool.run(self._due, now, limit, task="outbox_due")
+
+    async def record(self, updates: List[Tuple]) -> None:
+        """Store ``(status, attempts, next_attempt, error, chat_id, day)`` results of a send."""
+        await self._pool.run(self._record, updates, task="outbox_record")
+
+    async def release(self, now: float) -> None:
+        """Make every pending row due now, e.g. once Telegram is reachable again."""
+        await self._pool.run(self._release, now, task="outbox_release")
+
+    async def defer(self, until: float) -> None:
+        """Hold every pending row until ``until`` (flood control applies to the whole bot)."""
+        await self._pool.run(self._defer, until, task="outbox_defer")
+
+    async def close(self) -> None:
+        await self._pool.shutdown()
+
+    # --- outbox thread ---
+
+    def _missing(self, chat_ids: List[int], day: str) -> List[int]:
+        conn = self._connect()
+        try:
+            queued = {row[0] for row in conn.execute("SELECT chat_id FROM outbox WHERE day = ?", (day,))}
+        finally:
+            conn.close()
+        return [chat_id for chat_id in chat_ids if chat_id not in queued]
+
+    def _enqueue(self, day: str, messages: List[Tuple], expires_at: float | None) -> int:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO outbox (chat_id, day, text, card, next_attempt, expires_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(chat_id, day, text, json.dumps(card[0]) if card and card[0] is not None else None,
+                      now, expires_at, now) for chat_id, text, *card in messages])
+                added = conn.total_changes - before
+                oldest = (date.fromisoformat(day) - timedelta(days=KEEP_DAYS)).isoformat()
+                conn.execute("DELETE FROM outbox WHERE day < ? AND status != 'pending'", (oldest,))
+        finally:
+            conn.close()
+        return added
+
+    def _due(self, now: float, limit: int):
+        conn = self._connect()
+        try:
+            with conn:
+                expired = conn.execute(
+                    "UPDATE outbox SET status = 'expired' WHERE status = 'pending' AND expires_at < ?", (now,)).rowcount
+                rows = [(chat_id, day, text, attempts, json.loads(card) if card else None)
+                        for chat_id, day, text, attempts, card in conn.execute(
+                            "SELECT chat_id, day, text, attempts, card FROM outbox "
+                            "WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+                            (now, limit))]
+                next_due = conn.execute(
+                    "SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending' AND next_attempt > ?",
+                    (now,)).fetchone()[0]
+        finally:
+            conn.close()
+        if expired:
+            logger.error("%d queued birthday messages expired before they could be delivered", expired)
+        return rows, next_due, expired
+
+    def _record(self, updates: List[Tuple]) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, "
+                    "sent_at = CASE WHEN ? = 'sent' THEN ? END WHERE chat_id = ? AND day = ?",
+                    [(status, attempts, next_attempt, error, status, time.time(), chat_id, day)
+                     for status, attempts, next_attempt, error, chat_id, day in updates])
+        finally:
+            conn.close()
+
+    def _defer(self, until: float) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("UPDATE outbox SET next_attempt = ? WHERE status = 'pending' AND next_attempt < ?",
+                             (until, until))
+        finally:
+            conn.close()
+
+    def _release(self, now: float) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("UPDATE outbox SET next_attempt = ? WHERE status = 'pending' AND next_attempt > ?",
+                             (now, now))
+        finally:
+            conn.close()
+
+
+class OutboxDrainer:
+    """Background task delivering the ``Outbox`` through ``FanoutSender``.
+
+    Due rows are sent in batches of ``batch_size``, concurrently and within
+    Telegram's rate limits. A message is marked ``sent`` only after Telegram
+    accepted it. A crash during that one request can therefore repeat it;
+    nothing else can. After a ``RetryAfter`` every pending row waits the
+    requested time, since flood control applies to the whole bot.
+    Other transient errors back off exponentially (``backoff`` doubling up to
+    ``max_backoff`` seconds, with jitter). When a send succeeds after failed
+    ones, every pending row is released at once, so a backlog built up during
+    an outage is flushed in batches as soon as Telegram is reachable again.
+    Messages with a card are sent as photos through ``cards`` (a
+    ``cards.CardRenderer``).
+    """
+
+    def __init__(self, outbox: Outbox, bot, batch_size: int = 30, backoff: float = 5.0, max_backoff: float = 600.0,
+                 registry: metrics.Registry = metrics.REGISTRY, cards=None):
+        self.outbox = outbox
+        # RetryAfter is handled here, with the wait stored in the outbox
+        self.sender = FanoutSender(bot, max_retries=0, cards=cards)
+        self.batch_size = batch_size
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.registry = registry
+        self._failing = False
+        self._task: asyncio.Task | None = None
+        self._closing = False
+
+    async def start(self) -> None:
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Same as CommandLog.stop(): ask the loop to exit instead of cancelling it
+        if self._task is not None:
+            self._closing = True
+            self.outbox.wakeup.set()
+            await self._task
+            self._task = None
+
+    def _retry_in(self, attempts: int) -> float:
+        return min(self.backoff * 2 ** attempts, self.max_backoff) * random.uniform(0.5, 1.0)
+
+    async def drain_once(self) -> float | None:
+        """Send one batch of due messages. Returns seconds until the next one is due (None: nothing pending)."""
+        now = time.time()
+        rows, next_due, expired = await self.outbox.due(now, self.batch_size)
+        if expired:
+            self.registry.inc("bot_outbox_messages_total", expired, status="expired")
+        batch, seen = [], set()
+        for row in rows:
+            # Outcomes are keyed by chat: one message per chat per batch
+            if row[0] not in seen:
+                seen.add(row[0])
+                batch.append(row)
+        if not batch:
+            return None if next_due is None else max(0.0, next_due - now)
+
+        outcome = await self.sender.send_all((chat_id, text, card) for chat_id, _, text, _, card in batch)
+        now = time.time()
+        updates, counts, pause = [], {"sent": 0, "retry": 0, "failed": 0}, 0.0
+        for chat_id, day, _, attempts, _ in batch:
+            err = outcome[chat_id]
+            attempts += 1
+            if err is None:
+                updates.append(("sent", attempts, now, None, chat_id, day))
+                counts["sent"] += 1
+            elif isinstance(err, PERMANENT_ERRORS):
+                logger.error("Giving up on the message for chat %s on %s: %s", chat_id, day, err)
+                updates.append(("failed", attempts, now, repr(err), chat_id, day))
+                counts["failed"] += 1
+            else:
+                if isinstance(err, RetryAfter):
+                    wait = pause = max(pause, _retry_seconds(err))
+                else:
+                    wait = self._retry_in(attempts - 1)
+                updates.append(("pending", attempts, now + wait, repr(err), chat_id, day))
+                counts["retry"] += 1
+        await self.outbox.record(updates)
+        for status, n in counts.items():
+            if n:
+                self.registry.inc("bot_outbox_messages_total", n, status=status)
+
+        if pause:
+            logger.warning("Flood control: holding queued messages for %.0fs", pause)
+            await self.outbox.defer(now + pause)
+        elif counts["sent"] and self._failing:
+            logger.info("Telegram reachable again: flushing the queued messages")
+            await self.outbox.release(now)
+        self._failing = bool(counts["retry"]) and not counts["sent"]
+        return 0.0
+
+    async def _run(self) -> None:
+        while not self._closing:
+            # Cleared before draining, so an enqueue() during the drain is not missed
+            self.outbox.wakeup.clear()
+            try:
+                wait = await self.drain_once()
+            except Exception as e:
+                logger.error("Outbox drain failed: %s", e)
+                wait = self.backoff
+            if wait == 0:
+                continue
+            try:
+                # Woken early by enqueue() and stop()
+                await asyncio.wait_for(self.outbox.wakeup.wait(), timeout=min(wait or 60.0, 60.0))
+            except asyncio.TimeoutError:
+                pass
+
+
+class DirectOutbox:
+    """Stand-in for ``Outbox`` and its drainer when the outbox database can't be opened.
+
+    ``enqueue`` sends the messages at once through a ``FanoutSender`` (with its
+    own RetryAfter retries) instead of queueing them. Chats that got their
+    message are remembered in memory only: a failed send is only tried again
+    if the announcement is queued again, and a restart may announce a day
+    twice.
+    """
+
+    def __init__(self, bot, cards=None, registry: metrics.Registry = metrics.REGISTRY):
+        self.sender = FanoutSender(bot, cards=cards)
+        self.registry = registry
+        self._sent = set()
+
+    async def missing(self, chat_ids: Iterable[int], day: date) -> List[int]:
+        return [chat_id for chat_id in chat_ids if (chat_id, day) not in self._sent]
+
+    async def enqueue(self, day: date, messages: Iterable[Tuple], expires_at: float | None = None) -> int:
+        messages = [m for m in messages if (m[0], day) not in self._sent]
+        outcome = await self.sender.send_all(messages)
+        sent = [chat_id for chat_id, err in outcome.items() if err is None]
+        self._sent.update((chat_id, day) for chat_id in sent)
+        if sent:
+            self.registry.inc("bot_outbox_messages_total", len(sent), status="sent")
+        if len(sent) < len(outcome):
+            self.registry.inc("bot_outbox_messages_total", len(outcome) - len(sent), status="failed")
+        return len(messages)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
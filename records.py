@@ -0,0 +1,175 @@
+import calendar
+import functools
+import re
+from datetime import date, datetime
+from typing import Dict, Iterable, List
+
+DATE_COLUMNS = ("cumple", "Cumple", "cumple_date", "fecha", "Fecha", "birthday", "Birthday")
+NAME_COLUMNS = ("nombre", "Nombre", "name", "Name")
+
+# YYYY-MM-DD, optionally followed by a time (ISO / PostgREST date and timestamp columns)
+_ISO_DATE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})(?:[T ]|$)")
+
+
+class BirthdayRecord:
+    """Normalized ``Cumples`` row: only what the bot needs, in a compact slotted object."""
+
+    __slots__ = ("id", "name", "month", "day")
+
+    def __init__(self, id, name: str, month: int, day: int):
+        self.id = id
+        self.name = name
+        self.month = month
+        self.day = day
+
+    def __repr__(self) -> str:
+        return f"BirthdayRecord(id={self.id!r}, name={self.name!r}, month={self.month}, day={self.day})"
+
+
+def parse_date(date_str: str) -> datetime | None:
+    if not date_str:
+        return None
+    # If it's already a datetime, return it
+    if isinstance(date_str, datetime):
+        return date_str
+
+    s = str(date_str).strip()
+    # Remove timezone Z suffix for simpler parsing
+    if s.endswith("Z"):
+        s = s[:-1]
+
+    # Try fromisoformat first (handles YYYY-MM-DD and YYYY-MM-DDTHH:MM:SS)
+    try:
+        return datetime.fromisoformat(s)
+    except Exception:
+        pass
+
+    # Try several common formats (year-first and day-first)
+    fmts = [
+        "%Y-%m-%dT%H:%M:%S",
+        "%Y-%m-%dT%H:%M:%S.%f",
+        "%Y-%m-%d",
+        "%d/%m/%Y",
+        "%d-%m-%Y",
+        "%m/%d/%Y",
+    ]
+    for f in fmts:
+        try:
+            return datetime.strptime(s, f)
+        except Exception:
+            continue
+
+    # Last resort: try extracting digits and attempt Y-M-D or D-M-Y
+    parts = [p for p in s.replace("T", " ").replace("/", "-").split() if any(c.isdigit() for c in p)]
+    if parts:
+        p = parts[0]
+        segs = p.split("-")
+        if len(segs) == 3:
+            a, b, c = segs
+            # Heuristic: if first segment has 4 digits assume Y-M-D
+            if len(a) == 4:
+                try:
+                    return datetime(int(a), int(b), int(c))
+                except Exception:
+                    pass
+            else:
+                # assume D-M-Y
+                try:
+                    return datetime(int(c), int(b), int(a))
+                except Exception:
+                    pass
+
+    return None
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_month_day_str(s: str):
+    s = s.strip()
+    m = _ISO_DATE.match(s)
+    if m:
+        try:
+            d = date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        except ValueError:
+            return None
+        return d.month, d.day
+    dt = parse_date(s)
+    return (dt.month, dt.day) if dt else None
+
+
+def parse_month_day(value) -> tuple | None:
+    """Return ``(month, day)`` for a date value, or None if it can't be parsed.
+
+    ISO dates (the PostgREST format) go through a precompiled regex instead of
+    the chain of exception-driven formats; anything else falls back to
+    ``parse_date``. Results are memoized by string, since the same dates repeat
+    across rows and fetches.
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.month, value.day
+    return _parse_month_day_str(str(value))
+
+
+def month_days(day: date) -> frozenset:
+    """The ``(month, day)`` birthdays celebrated on ``day``.
+
+    In common years Feb 29 birthdays are celebrated on Feb 28, as in
+    ``bday.BirthdayIndex``.
+    """
+    if (day.month, day.day) == (2, 28) and not calendar.isleap(day.year):
+        return frozenset({(2, 28), (2, 29)})
+    return frozenset({(day.month, day.day)})
+
+
+def _get_date_field(u: dict):
+    for k in DATE_COLUMNS:
+        if k in u and u.get(k):
+            return u.get(k)
+    # fallback: try any value that looks like a date
+    for v in u.values():
+        if isinstance(v, str) and any(ch.isdigit() for ch in v):
+            return v
+    return None
+
+
+def _get_name_field(u: dict):
+    for k in NAME_COLUMNS:
+        if k in u and u.get(k):
+            return u.get(k)
+    # fallback to id
+    return u.get("id")
+
+
+def resolve_columns(rows: List[Dict]) -> tuple:
+    """Detect the date and name columns of a result set from its first row.
+
+    Returns ``(date_column, name_column)``; either is None when no known column
+    is present, in which case rows are resolved one by one.
+    """
+    if not rows:
+        return None, None
+    keys = rows[0].keys()
+    date_column = next((k for k in DATE_COLUMNS if k in keys), None)
+    name_column = next((k for k in NAME_COLUMNS if k in keys), None)
+    return date_column, name_column
+
+
+def normalize(rows: Iterable[Dict]) -> List[BirthdayRecord]:
+    """Turn raw ``Cumples`` rows into BirthdayRecords, dropping rows without a valid date.
+
+    Columns are resolved once per result set; a row falls back to the per-row
+    lookup only when its value in the detected column is empty.
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    date_column, name_column = resolve_columns(rows)
+    records = []
+    append = records.append
+    for u in rows:
+        value = u.get(date_column) if date_column else None
+        md = parse_month_day(value or _get_date_field(u))
+        if md is None:
+            continue
+        name = u.get(name_column) if name_column else None
+        append(BirthdayRecord(u.get("id"), str(name or _get_name_field(u)), md[0], md[1]))
+    return records
@@ -0,0 +1,69 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class ReplyCache:
+    """Holds a rendered reply until the local date or the underlying data changes.
+
+    ``build(today)`` renders the reply for a date. The cached text is keyed on
+    ``(today, version())``: the first request after midnight, or after
+    ``version()`` changes (e.g. ``BirthdayIndex.version`` after a reload that
+    changed the table), rebuilds it; every other request returns the stored
+    string with no I/O.
+
+    If a rebuild fails the previous reply keeps being served, and the rebuild
+    is not retried for ``retry_after`` seconds. Only the very first build
+    raises.
+
+    ``clock`` returns the current local datetime; pass a fake one to drive the
+    cache across midnight in tests and benchmarks.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[date], Awaitable[str]],
+        version: Callable[[], Hashable] = lambda: 0,
+        clock: Callable[[], datetime] = datetime.now,
+        retry_after: float = 30.0,
+    ):
+        self._build = build
+        self._version = version
+        self._clock = clock
+        self.retry_after = retry_after
+        self._text: str | None = None
+        self._key = None
+        self._retry_at: datetime | None = None
+
+    @property
+    def stale(self) -> bool:
+        return self._key != self._current_key()
+
+    def _current_key(self):
+        return self._clock().date(), self._version()
+
+    async def get(self) -> str:
+        key = self._current_key()
+        if key != self._key and (self._retry_at is None or self._clock() >= self._retry_at):
+            await self._rebuild(key)
+        return self._text
+
+    async def refresh(self) -> None:
+        """Rebuild now (e.g. from the midnight job), keeping the old reply if it fails."""
+        try:
+            await self._rebuild(self._current_key())
+        except Exception as e:
+            logger.error("Could not build the reply: %s", e)
+
+    async def _rebuild(self, key) -> None:
+        try:
+            text = await self._build(key[0])
+        except Exception as e:
+            if self._text is None:
+                raise
+            self._retry_at = self._clock() + timedelta(seconds=self.retry_after)
+            logger.error("Reply rebuild for %s failed, serving the previous one: %s", key[0], e)
+            return
+        self._text, self._key, self._retry_at = text, key, None
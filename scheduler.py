@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Awaitable, Callable, Dict, List
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+def resolve_zone(name: str = "") -> tzinfo:
+    """Return the IANA zone ``name``, or the server's zone when empty.
+
+    The server zone comes from ``TZ`` or ``/etc/localtime`` so it keeps its
+    DST rules; only if neither can be read is the current fixed UTC offset used.
+    """
+    for key in (name, os.getenv("TZ", "").lstrip(":")):
+        if key:
+            try:
+                return ZoneInfo(key)
+            except Exception as e:
+                logger.error("Unknown timezone %r: %s", key, e)
+    try:
+        with open("/etc/localtime", "rb") as f:
+            return ZoneInfo.from_file(f, key="localtime")
+    except Exception:
+        logger.warning("Server timezone unknown; using the current UTC offset, which ignores DST changes")
+        return datetime.now().astimezone().tzinfo
+
+
+class DailyAnnouncement:
+    """Daily birthday announcement for the chats sharing one timezone and send time.
+
+    The work is split in two phases scheduled with ``run_daily`` in ``tz``, so
+    the wall-clock time holds across DST changes:
+
+    - prepare, ``prepare_ahead`` before the send time: ``prepare(day)`` fetches
+      the birthdays and renders the message (None when the data is unavailable),
+      and ``card(day)``, if given, renders the day's card and returns its spec
+      (None for no card);
+    - send, at ``at``: the prepared text (and card) is queued in ``outbox`` (an
+      ``outbox.Outbox``) for the chats, and its drainer delivers it. If
+      preparing failed or has not run, the message is prepared on the spot.
+      A card that fails to render is left out; the text still goes.
+
+    The outbox holds one message per (chat, day), so a chat that already has
+    one for the day is skipped: neither a repeated job nor the startup
+    ``catch_up`` (today's announcement, if its time passed less than
+    ``catch_up_window`` ago) can announce twice. ``clock`` returns the current
+    aware datetime and can be replaced in checks.
+    """
+
+    def __init__(self, name: str, chat_ids: List[int], tz: tzinfo, at: time,
+                 prepare: Callable[[date], Awaitable[str | None]], outbox,
+                 prepare_ahead: timedelta = timedelta(minutes=10),
+                 catch_up_window: timedelta = timedelta(hours=6), clock=None,
+                 card: Callable[[date], Awaitable[Dict | None]] | None = None):
+        self.name = name
+        self.chat_ids = chat_ids
+        self.tz = tz
+        self.at = at
+        self.prepare = prepare
+        self.outbox = outbox
+        self.prepare_ahead = prepare_ahead
+        self.catch_up_window = catch_up_window
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self.card = card
+        # One preparation per day, shared by the prepare job and the send
+        self._prepared: Dict[date, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    def send_time(self, day: date) -> datetime:
+        return datetime.combine(day, self.at, tzinfo=self.tz)
+
+    def next_send(self, now: datetime) -> datetime:
+        """The first send time after ``now``."""
+        at = self.send_time(now.astimezone(self.tz).date())
+        return at if at > now else self.send_time(at.date() + timedelta(days=1))
+
+    def last_send(self, now: datetime) -> datetime:
+        """The latest send time at or before ``now``."""
+        at = self.send_time(now.astimezone(self.tz).date())
+        return at if at <= now else self.send_time(at.date() - timedelta(days=1))
+
+    async def pending(self, day: date) -> List[int]:
+        """The chats with nothing queued or delivered for ``day``."""
+        return await self.outbox.missing(self.chat_ids, day) if self.chat_ids else []
+
+    def _preparation(self, day: date) -> asyncio.Task:
+        task = self._prepared.get(day)
+        if task is None or (task.done() and (task.cancelled() or task.exception() or task.result()[0] is None)):
+            # First attempt, or the previous one failed: (re)prepare
+            task = asyncio.ensure_future(self._prepare_day(day))
+            self._prepared = {d: t for d, t in self._prepared.items() if d > day}
+            self._prepared[day] = task
+        return task
+
+    async def _prepare_day(self, day: date):
+        """``(text, card)`` for ``day``."""
+        text = await self.prepare(day)
+        if text is None or self.card is None:
+            return text, None
+        try:
+            return text, await self.card(day)
+        except Exception as e:
+            logger.error("Could not render the %s card for %s, sending the text alone: %s", self.name, day, e)
+            return text, None
+
+    async def prepare_job(self, context=None) -> None:
+        day = self.next_send(self.clock()).date()
+        if self.chat_ids and not await self.pending(day):
+            return
+        try:
+            await self._preparation(day)
+        except Exception as e:
+            logger.error("Preparing the %s announcement for %s failed, retrying at send time: %s", self.name, day, e)
+
+    async def deliver(self, day: date) -> None:
+        """Queue ``day``'s announcement for the chats that have nothing for that day yet."""
+        async with self._lock:
+            chat_ids = await self.pending(day)
+            if self.chat_ids and not chat_ids:
+                logger.info("Announcement %s for %s already sent", self.name, day)
+                return
+            try:
+                text, card = await self._preparation(day)
+            except Exception as e:
+                logger.error("Could not prepare the %s announcement for %s: %s", self.name, day, e)
+                return
+            if text is None:
+                return
+            if not self.chat_ids:
+                logger.warning("⚠️  BIRTHDAY_CHATS / BIRTHDAY_CHAT_ID not configured. Message not sent: %s", text)
+                return
+            # "Hoy es el cumpleaños de..." is only true until midnight
+            expires = datetime.combine(day + timedelta(days=1), time(0), tzinfo=self.tz)
+            await self.outbox.enqueue(day, [(chat_id, text, card) for chat_id in chat_ids], expires.timestamp())
+            late = (self.clock() - self.send_time(day)).total_seconds()
+            logger.info("Announcement %s for %s queued for %d chats, %.1fs after the send time",
+                        self.name, day, len(chat_ids), late)
+
+    async def send_job(self, context=None) -> None:
+        await self.deliver(self.last_send(self.clock()).date())
+
+    async def catch_up(self, context=None) -> None:
+        """Send today's announcement if it was missed less than ``catch_up_window`` ago, and prepare the next one if it is close."""
+        now = self.clock()
+        last = self.last_send(now)
+        # Only the same local day: yesterday's "Hoy es el cumpleaños" would be wrong today
+        if (now - last <= self.catch_up_window and last.date() == now.astimezone(self.tz).date()
+                and await self.pending(last.date())):
+            logger.warning("Catching up on the %s announcement missed at %s", self.name, last)
+            await self.deliver(last.date())
+        if self.next_send(now) - now <= self.prepare_ahead:
+            await self.prepare_job()
+
+    def schedule(self, job_queue, wrap=lambda callback, name: callback) -> None:
+        """Register the daily prepare and send jobs and a catch-up check right away.
+
+        ``wrap(callback, name)`` decorates each callback, e.g. with ``metrics.instrument``.
+        """
+        job_queue.run_daily(wrap(self.send_job, "job:birthday"), time=self.at.replace(tzinfo=self.tz),
+                            name=f"birthday:{self.name}")
+        if self.prepare_ahead:
+            prepare_at = (datetime.combine(date(2000, 1, 2), self.at) - self.prepare_ahead).time()
+            job_queue.run_daily(wrap(self.prepare_job, "job:birthday_prepare"), time=prepare_at.replace(tzinfo=self.tz),
+                                name=f"birthday_prepare:{self.name}")
+        job_queue.run_once(wrap(self.catch_up, "job:birthday_catch_up"), when=0, name=f"birthday_catch_up:{self.name}")
+        logger.info("Scheduled announcement %s at %s %s (prepared %s earlier; next: %s; chats=%s)",
+                    self.name, self.at.strftime("%H:%M"), self.tz, self.prepare_ahead,
+                    self.next_send(self.clock()), self.chat_ids)
@@ -0,0 +1,131 @@
+import asyncio
+import datetime
+import functools
+import logging
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Telegram Bot API limits: ~30 messages/s overall, 1 message/s per chat and
+# 20 messages/min per group.
+GLOBAL_RATE = 30.0
+PER_CHAT_RATE = 1.0
+GROUP_RATE = 20 / 60
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, holding at most ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def block(self, seconds: float) -> None:
+        """Hand out no tokens for the next ``seconds`` (used after a RetryAfter)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _retry_seconds(e: RetryAfter) -> float:
+    retry_after = e.retry_after
+    if isinstance(retry_after, datetime.timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class FanoutSender:
+    """Send messages to many chats concurrently within Telegram's flood limits.
+
+    Every send takes a token from the global bucket and from its chat's bucket
+    (group chats, with negative ids, use the slower group rate). A
+    ``RetryAfter`` pauses the global bucket for the requested time and the send
+    is retried up to ``max_retries`` times.
+
+    A message may carry a card spec; with ``cards`` (a ``cards.CardRenderer``)
+    it is sent as that photo with the text as its caption. If the card can't
+    be drawn or sent, the text is sent as a plain message instead.
+    """
+
+    def __init__(self, bot, global_rate: float = GLOBAL_RATE, per_chat_rate: float = PER_CHAT_RATE,
+                 group_rate: float = GROUP_RATE, max_retries: int = 3, cards=None):
+        self.bot = bot
+        self.cards = cards
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            rate = self.group_rate if chat_id < 0 else self.per_chat_rate
+            bucket = self._chat_buckets[chat_id] = TokenBucket(rate)
+        return bucket
+
+    async def send(self, chat_id: int, text: str, card=None) -> None:
+        for attempt in range(self.max_retries + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+            try:
+                if card is not None and self.cards is not None:
+                    try:
+                        await self.cards.send(functools.partial(self.bot.send_photo, chat_id=chat_id), card,
+                                              caption=text)
+                        return
+                    except RetryAfter:
+                        raise
+                    except Exception as e:
+                        # The text still goes out, and later attempts do not try the card again
+                        logger.warning("Card for chat %s failed (%s: %s); sending the text instead",
+                                       chat_id, type(e).__name__, e)
+                        card = None
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                return
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_seconds(e)
+                logger.warning("Flood control for chat %s, retrying in %.1fs", chat_id, delay)
+                self.global_bucket.block(delay)
+
+    async def send_all(self, messages: Iterable[Tuple]) -> Dict[int, Exception | None]:
+        """Send every ``(chat_id, text)`` or ``(chat_id, text, card)`` message; return chat_id -> error (None on success).
+
+        Outcomes are reported in a single summary log line.
+        """
+        messages = list(messages)
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(self.send(*message) for message in messages), return_exceptions=True
+        )
+        outcome = {message[0]: result for message, result in zip(messages, results)}
+
+        failed: List[str] = [f"{chat_id} ({type(err).__name__}: {err})" for chat_id, err in outcome.items() if err]
+        logger.info(
+            "Birthday fan-out: %d/%d sent in %.2fs%s",
+            len(messages) - len(failed), len(messages), time.monotonic() - started,
+            f"; failed: {', '.join(failed)}" if failed else "",
+        )
+        return outcome
@@ -0,0 +1,119 @@
+import logging
+import sqlite3
+import time
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from records import BirthdayRecord, _get_date_field, _get_name_field, month_days, parse_month_day, resolve_columns
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "cumples.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS birthdays (
+    id,
+    name TEXT NOT NULL,
+    birth TEXT,
+    month INTEGER NOT NULL,
+    day INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS birthdays_month_day ON birthdays (month, day);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+
+
+class BirthdaySnapshot:
+    """Local SQLite copy of ``Cumples`` from the last successful fetch.
+
+    ``save()`` replaces the whole table in one transaction and bumps
+    ``version``; ``fetched_at`` records when the rows came from Supabase.
+    Rows keep their original name and date text, so ``rows()`` can stand in
+    for a remote fetch, and carry month/day columns indexed together for the
+    "today" query.
+
+    ``bday.read_snapshot`` serves it while it is younger than ``max_age``
+    seconds. Every call opens its own connection, so methods may run in any
+    thread (the bot runs them in ``workers.BLOCKING``).
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, max_age: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _meta(self, conn: sqlite3.Connection, key: str, default=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def save(self, rows: List[Dict]) -> int:
+        """Replace the snapshot with ``rows`` (raw ``Cumples`` rows). Returns the new version."""
+        # Same column resolution as records.normalize(), keeping the original date text
+        date_column, name_column = resolve_columns(rows)
+        entries = []
+        for row in rows:
+            birth = (row.get(date_column) if date_column else None) or _get_date_field(row)
+            md = parse_month_day(birth)
+            if md is None:
+                continue
+            name = (row.get(name_column) if name_column else None) or _get_name_field(row)
+            entries.append((row.get("id"), str(name), str(birth), md[0], md[1]))
+        conn = self._connect()
+        try:
+            with conn:
+                version = int(self._meta(conn, "version", 0)) + 1
+                conn.execute("DELETE FROM birthdays")
+                conn.executemany("INSERT INTO birthdays (id, name, birth, month, day) VALUES (?, ?, ?, ?, ?)", entries)
+                conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                 [("version", version), ("fetched_at", time.time()), ("rows", len(entries))])
+        finally:
+            conn.close()
+        logger.info("Saved birthday snapshot v%d with %d rows", version, len(entries))
+        return version
+
+    def info(self) -> Tuple[int, float | None]:
+        """Return ``(version, fetched_at)``; version 0 means nothing was saved yet."""
+        conn = self._connect()
+        try:
+            return int(self._meta(conn, "version", 0)), self._meta(conn, "fetched_at")
+        finally:
+            conn.close()
+
+    def age(self) -> float | None:
+        """Seconds since the snapshot was fetched, or None if there is none."""
+        fetched_at = self.info()[1]
+        return None if fetched_at is None else time.time() - fetched_at
+
+    def rows(self) -> List[Dict]:
+        """The snapshot as ``Cumples``-shaped rows (``id``, ``nombre``, ``cumple``)."""
+        conn = self._connect()
+        try:
+            return [{"id": i, "nombre": n, "cumple": b}
+                    for i, n, b in conn.execute("SELECT id, name, birth FROM birthdays ORDER BY rowid")]
+        finally:
+            conn.close()
+
+    def _select(self, conn: sqlite3.Connection, keys: Iterable[Tuple[int, int]]) -> List[BirthdayRecord]:
+        records = []
+        for month, day in sorted(set(keys)):
+            records.extend(BirthdayRecord(*row) for row in conn.execute(
+                "SELECT id, name, month, day FROM birthdays WHERE month = ? AND day = ? ORDER BY rowid",
+                (month, day)))
+        return records
+
+    def on(self, days: Iterable[date]) -> List[BirthdayRecord]:
+        """Records whose birthday falls on any of ``days`` (same matching as the remote fetch)."""
+        conn = self._connect()
+        try:
+            return self._select(conn, (key for d in days for key in month_days(d)))
+        finally:
+            conn.close()
@@ -0,0 +1,20 @@
+-- Month/day key for "whose birthday is on this day" and "next birthday" queries.
+--
+-- cumple_md = month * 32 + day, the same ordinal the bot uses in memory
+-- (bday._date_key). With the index, Supabase returns only the rows of the
+-- requested days (cumple_md=in.(...)) and finds the next birthday day with
+-- one index lookup (cumple_md=gte.N&order=cumple_md&limit=1), instead of the
+-- bot downloading the whole table. The bot detects whether the column exists
+-- (SUPABASE_QUERY_MODE=auto) and scans the table itself when it does not.
+--
+-- Assumes "cumple" is a date column. Rows without a date get a NULL key and
+-- are only seen by the client-side scan.
+
+alter table public."Cumples"
+    add column if not exists cumple_md smallint
+    generated always as ((extract(month from cumple) * 32 + extract(day from cumple))::smallint) stored;
+
+create index if not exists cumples_cumple_md_idx on public."Cumples" (cumple_md, id);
+
+-- PostgREST caches the schema: make it see the new column
+notify pgrst, 'reload schema';
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterable, List
+
+import httpx
+
+import metrics
+
+if TYPE_CHECKING:
+    from postgrest import AsyncPostgrestClient
+
+logger = logging.getLogger(__name__)
+
+# Indexed (month * 32 + day) column added by supabase/migrations: lets Supabase
+# pick a day's birthdays instead of the client scanning the whole table
+MONTH_DAY_COLUMN = "cumple_md"
+# PostgREST error codes for a column the table does not have (migration not applied)
+SCHEMA_ERRORS = {"42703", "PGRST204"}
+
+
+class SupabaseClientManager:
+    """Long-lived async PostgREST client shared by the handlers and the birthday job.
+
+    Built once in ``bot.main()``. A single pooled ``httpx.AsyncClient`` keeps
+    connections (and their TLS sessions) alive between requests, so a fetch is
+    one request on an already open connection instead of a new client, session
+    and handshake run through the default executor.
+
+    ``rest_url`` defaults to ``<supabase_url>/rest/v1`` and can point at any
+    PostgREST-compatible server (e.g. a local fake one for testing).
+
+    ``query_mode`` says where "whose birthday is on these days" is filtered:
+    ``"server"`` on the ``cumple_md`` column of the shipped migration,
+    ``"client"`` by scanning every row, or ``"auto"`` (default): on the server
+    until it answers that the column does not exist, then on the client.
+    """
+
+    def __init__(
+        self,
+        supabase_url: str,
+        supabase_key: str,
+        timeout: float = 10.0,
+        max_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        rest_url: str | None = None,
+        page_size: int = 1000,
+        query_mode: str = "auto",
+    ):
+        self.supabase_url = supabase_url
+        self.supabase_key = supabase_key
+        self.rest_url = rest_url or f"{supabase_url.rstrip('/')}/rest/v1"
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.page_size = page_size
+        self.query_mode = query_mode
+        self._server_filter = query_mode != "client"
+        self._http: httpx.AsyncClient | None = None
+        self._postgrest: "AsyncPostgrestClient | None" = None
+
+    @classmethod
+    def from_config(cls, config) -> "SupabaseClientManager":
+        return cls(
+            config.SUPABASE_URL,
+            config.SUPABASE_KEY,
+            timeout=config.SUPABASE_TIMEOUT,
+            max_connections=config.SUPABASE_MAX_CONNECTIONS,
+            keepalive_expiry=config.SUPABASE_KEEPALIVE,
+            rest_url=config.SUPABASE_REST_URL or None,
+            page_size=config.SUPABASE_PAGE_SIZE,
+            query_mode=config.SUPABASE_QUERY_MODE,
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.supabase_url and self.supabase_key)
+
+    @property
+    def server_filter(self) -> bool:
+        """Whether birthdays are filtered by day on the server (see ``query_mode``)."""
+        return self._server_filter
+
+    @property
+    def postgrest(self) -> "AsyncPostgrestClient":
+        """Return the shared PostgREST client, creating the connection pool on first use."""
+        if self._postgrest is None:
+            # Imported here so startup does not pay for it before the first query
+            from postgrest import AsyncPostgrestClient
+
+            headers = {
+                "apikey": self.supabase_key,
+                "Authorization": f"Bearer {self.supabase_key}",
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            }
+            self._http = httpx.AsyncClient(
+                base_url=self.rest_url,
+                headers=headers,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            self._postgrest = AsyncPostgrestClient(self.rest_url, headers=headers, http_client=self._http)
+        return self._postgrest
+
+    async def _fetch_page(self, after_id, page_size: int, keys: List[int] | None = None) -> List[Dict]:
+        query = self.postgrest.table("Cumples").select("id,nombre,cumple").order("id").limit(page_size)
+        if keys is not None:
+            query = query.in_(MONTH_DAY_COLUMN, keys)
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        with metrics.timer("supabase_request"):
+            resp = await query.execute()
+        return resp.data or []
+
+    async def iter_birthday_pages(self, page_size: int | None = None,
+                                  keys: Iterable[int] | None = None) -> AsyncIterator[List[Dict]]:
+        """Yield ``Cumples`` rows in pages ordered by ``id`` (keyset pagination).
+
+        With ``keys`` (month * 32 + day values), only the rows on those days
+        are requested; this needs the ``cumple_md`` column. The next page is
+        requested as soon as the current one arrives, so it downloads while
+        the caller processes the current page. Only two pages are held in
+        memory at a time. Errors propagate to the caller.
+        """
+        page_size = page_size or self.page_size
+        keys = sorted(keys) if keys is not None else None
+        page = await self._fetch_page(None, page_size, keys)
+        pending = None
+        try:
+            while page:
+                if len(page) == page_size:
+                    pending = asyncio.create_task(self._fetch_page(page[-1]["id"], page_size, keys))
+                yield page
+                page = await pending if pending else []
+                pending = None
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    def _schema_missing(self, e: Exception) -> bool:
+        """In "auto" mode, switch to client-side filtering if ``e`` says ``cumple_md`` does not exist."""
+        if self.query_mode != "auto" or getattr(e, "code", None) not in SCHEMA_ERRORS:
+            return False
+        if self._server_filter:
+            logger.warning("Cumples has no %s column (apply supabase/migrations); filtering birthdays client-side",
+                           MONTH_DAY_COLUMN)
+        self._server_filter = False
+        return True
+
+    async def iter_birthdays_on(self, keys: Iterable[int]) -> AsyncIterator[List[Dict]]:
+        """Yield pages holding at least the rows whose month * 32 + day is in ``keys``.
+
+        Filtered on the server when ``server_filter`` is on, so only the
+        matching rows cross the wire; otherwise every row comes back and the
+        caller keeps the matches.
+        """
+        if self._server_filter:
+            try:
+                async for page in self.iter_birthday_pages(keys=keys):
+                    yield page
+                return
+            except Exception as e:
+                # The error comes with the first page, so nothing was yielded yet
+                if not self._schema_missing(e):
+                    raise
+        async for page in self.iter_birthday_pages():
+            yield page
+
+    async def first_birthday_key(self, from_key: int) -> int | None:
+        """Return the smallest month * 32 + day key >= ``from_key`` in ``Cumples`` (None if there is none).
+
+        One indexed lookup returning one row. Needs the ``cumple_md`` column:
+        the error propagates when it is missing (switching "auto" mode to
+        client-side filtering).
+        """
+        query = (self.postgrest.table("Cumples").select(MONTH_DAY_COLUMN)
+                 .gte(MONTH_DAY_COLUMN, from_key).order(MONTH_DAY_COLUMN).limit(1))
+        try:
+            with metrics.timer("supabase_request"):
+                resp = await query.execute()
+        except Exception as e:
+            self._schema_missing(e)
+            raise
+        return resp.data[0][MONTH_DAY_COLUMN] if resp.data else None
+
+    async def fetch_birthdays(self) -> List[Dict]:
+        """Fetch all rows of ``Cumples``. Errors propagate; ``bday.fetch_birthdays`` handles them."""
+        rows = []
+        async for page in self.iter_birthday_pages():
+            rows.extend(page)
+        return rows
+
+    async def close(self) -> None:
+        """Close the connection pool. Safe to call more than once."""
+        if self._http is not None:
+            await self._http.aclose()
+        self._http = None
+        self._postgrest = None
+        logger.info("Supabase client closed")
@@ -0,0 +1,97 @@
+import asyncio
+import collections
+import logging
+from typing import Any, Awaitable, Deque, Dict, Hashable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def chat_key(update: object) -> Hashable | None:
+    """The chat an update belongs to, or None for updates without one (e.g. poll answers)."""
+    if isinstance(update, Update) and update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates concurrently, at most ``max_concurrent_updates`` at once, one at a time per chat.
+
+    Updates of the same chat run one after the other, in arrival order.
+    Updates of different chats run side by side, so a slow ``/testBirthday``
+    in one group no longer holds up every other chat's ``/ping``. An update
+    whose chat is busy is queued behind it and its call returns at once,
+    without holding one of the ``max_concurrent_updates`` slots; the task
+    running that chat's updates runs it next. Nothing bounds those queues:
+    the application starts a task for every update it fetches, whatever the
+    processor does.
+
+    Updates waiting and running are shown in the
+    ``bot_updates{state="waiting"|"running"}`` gauge.
+    """
+
+    def __init__(self, max_concurrent_updates: int, registry: metrics.Registry = metrics.REGISTRY):
+        super().__init__(max_concurrent_updates)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # chat -> updates queued behind the one of that chat running now
+        self._queued: Dict[Hashable, Deque["Awaitable[Any]"]] = {}
+        self.registry = registry
+        self._waiting = 0
+        self._running = 0
+        self._publish()
+
+    def _publish(self) -> None:
+        self.registry.set_gauge("bot_updates", self._waiting, state="waiting")
+        self.registry.set_gauge("bot_updates", self._running, state="running")
+
+    async def _run(self, key: Hashable | None, coroutine: "Awaitable[Any]") -> None:
+        async with self._slots:
+            self._running += 1
+            self._publish()
+            try:
+                await coroutine
+            except Exception:
+                # Application.process_update reports handler errors itself; don't let one stop the chat's queue
+                logger.exception("Error processing an update of chat %s", key)
+            finally:
+                self._running -= 1
+                self._publish()
+
+    async def do_process_update(self, update: object, coroutine: "Awaitable[Any]") -> None:
+        key = chat_key(update)
+        if key is None:
+            await self._run(key, coroutine)
+            return
+        queued = self._queued.get(key)
+        if queued is not None:
+            queued.append(coroutine)
+            self._waiting += 1
+            self._publish()
+            return
+        queued = self._queued[key] = collections.deque()
+        try:
+            await self._run(key, coroutine)
+            while queued:
+                coroutine = queued.popleft()
+                self._waiting -= 1
+                self._publish()
+                await self._run(key, coroutine)
+        finally:
+            del self._queued[key]
+            # Cancelled (e.g. on shutdown): the handlers still queued never run
+            while queued:
+                coroutine = queued.popleft()
+                self._waiting -= 1
+                if asyncio.iscoroutine(coroutine):
+                    coroutine.close()
+            self._publish()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,173 @@
+import asyncio
+import hmac
+import json
+import logging
+import signal
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+MAX_BODY = 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+class WebhookServer:
+    """Minimal embedded HTTP/1.1 server that feeds Telegram webhook POSTs to an Application.
+
+    Each ``POST <path>`` must carry the ``X-Telegram-Bot-Api-Secret-Token``
+    header matching ``secret_token``, which is required: without it anyone
+    who can reach the port could post forged updates. The body is
+    decoded into an ``Update`` and put on ``application.update_queue``, so the
+    same handlers and jobs run as with polling. Connections are kept alive,
+    as Telegram reuses them between updates.
+    """
+
+    def __init__(self, application, path: str = "/telegram", secret_token: str = "",
+                 listen: str = "0.0.0.0", port: int = 8443):
+        if not secret_token:
+            raise ValueError("The webhook server needs a secret token (WEBHOOK_SECRET)")
+        self.application = application
+        self.path = path if path.startswith("/") else f"/{path}"
+        self.secret_token = secret_token
+        self.listen = listen
+        self.port = port
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        # Report the real port when started with port=0
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Webhook server listening on %s:%s%s", self.listen, self.port, self.path)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, target, *_ = request_line.split(" ") + [""]
+                headers = {}
+                for line in header_lines:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, close=True)
+                    return
+                body = await reader.readexactly(length) if length else b""
+
+                status = await self._dispatch(method, target.split("?", 1)[0], headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, close=not keep_alive)
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error("Webhook connection error: %s", e)
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, headers: dict, body: bytes) -> int:
+        if path != self.path:
+            return 404
+        if method != "POST":
+            return 405
+        if not hmac.compare_digest(
+            headers.get(SECRET_HEADER, "").encode(), self.secret_token.encode()
+        ):
+            logger.warning("Rejected webhook request with a wrong secret token")
+            return 403
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except Exception as e:
+            logger.warning("Could not decode webhook update: %s", e)
+            return 400
+        await self.application.update_queue.put(update)
+        return 200
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, close: bool = False) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+
+
+async def _serve(application, config, stop: asyncio.Event) -> None:
+    server = WebhookServer(
+        application,
+        path=config.WEBHOOK_PATH,
+        secret_token=config.WEBHOOK_SECRET,
+        listen=config.WEBHOOK_LISTEN,
+        port=config.WEBHOOK_PORT,
+    )
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        if config.WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=config.WEBHOOK_URL,
+                secret_token=config.WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            logger.info("Webhook registered at %s", config.WEBHOOK_URL)
+        else:
+            logger.warning("WEBHOOK_URL not set; not registering the webhook with Telegram")
+        await application.start()
+        await server.start()
+        await stop.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_webhook(application, config) -> None:
+    """Serve ``application`` through the embedded webhook server until SIGINT/SIGTERM.
+
+    The webhook counterpart of ``Application.run_polling()``: same lifecycle
+    hooks, handlers and job queue. Switching back to polling is safe, since
+    polling deletes the webhook on startup.
+    """
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    try:
+        loop.run_until_complete(_serve(application, config, stop))
+    except KeyboardInterrupt:
+        logger.info("Webhook server interrupted. Shutting down.")
+    finally:
+        loop.close()
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import random
+import re
+import sys
+from datetime import datetime, date
+from typing import Callable, Dict, List
+
+import httpx
+
+import cache as shared_cache
+import metrics
+from nacimientos import extract_births
+from workers import BLOCKING
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ["enero", "febrero", "marzo", "abril", "mayo", "junio",
+          "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+API_URL = "https://es.wikipedia.org/w/api.php"
+HEADERS = {
+    'User-Agent': 'BotBardiro/1.0 (Telegram Bot; birthday notifications)'
+}
+
+DEFAULT_STORE_PATH = pathlib.Path(__file__).parent / "wiki_births.json"
+
+
+def page_title(month: int, day: int) -> str:
+    """Return the es.wikipedia day page title, e.g. ``17_de_octubre``."""
+    return f"{day}_de_{MONTHS[month - 1]}"
+
+
+def day_key(month: int, day: int) -> str:
+    return f"{month:02d}-{day:02d}"
+
+
+def _parse_params(month: int, day: int) -> Dict[str, str]:
+    return {
+        'action': 'parse',
+        'page': page_title(month, day),
+        'prop': 'text',
+        'format': 'json',
+        'formatversion': '2'
+    }
+
+
+def fetch_day_html(month: int, day: int) -> str | None:
+    """Fetch the rendered HTML of a day page through the Wikipedia parse API (blocking)."""
+    import requests  # only the weekly store rebuild needs it
+
+    response = requests.get(API_URL, params=_parse_params(month, day), headers=HEADERS, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    if 'parse' not in data:
+        return None
+    return data['parse']['text']
+
+
+def birth_name(entry: str) -> str:
+    """Extract the person's name from an entry like ``1920: Nombre, cargo``."""
+    match = re.match(r'^\d+\s*[:.]?\s*([^,\(]+)', entry)
+    return match.group(1).strip() if match else entry
+
+
+class BirthsStore:
+    """Offline store of the "Nacimientos" entries of all 366 day pages.
+
+    Kept as a compact JSON object keyed by ``MM-DD`` and loaded once, so a
+    lookup at send time is a dict access instead of a Wikipedia round-trip.
+    """
+
+    def __init__(self, path: str | os.PathLike = DEFAULT_STORE_PATH):
+        self.path = pathlib.Path(path)
+        self._days: Dict[str, List[str]] = {}
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._days = json.load(f)
+            logger.info("Loaded Wikipedia births for %d days from %s", len(self._days), self.path)
+        except FileNotFoundError:
+            self._days = {}
+        except Exception as e:
+            logger.error("Could not load Wikipedia births store %s: %s", self.path, e)
+            self._days = {}
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    def get(self, month: int, day: int) -> List[str]:
+        return self._days.get(day_key(month, day), [])
+
+    def save(self) -> None:
+        # Write to a temp file first so a crash never leaves a half-written store
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._days, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def rebuild(self, fetch_html: Callable[[int, int], str | None] = fetch_day_html) -> int:
+        """Re-fetch every day page and persist the store. Returns the number of days stored.
+
+        Days that fail to fetch keep their previous entries. ``fetch_html`` can
+        be swapped for a reader of saved HTML files.
+        """
+        days = dict(self._days)
+        for month in range(1, 13):
+            for day in range(1, 32):
+                try:
+                    date(2000, month, day)  # leap year, so Feb 29 is included
+                except ValueError:
+                    continue
+                try:
+                    html_content = fetch_html(month, day)
+                except Exception as e:
+                    logger.error("Error fetching Wikipedia page %s: %s", page_title(month, day), e)
+                    continue
+                births = extract_births(html_content) if html_content else []
+                if births:
+                    days[day_key(month, day)] = births
+        self._days = days
+        self.save()
+        logger.info("Rebuilt Wikipedia births store with %d days", len(days))
+        return len(days)
+
+
+class WikiClient:
+    """Shared async HTTP client for live Wikipedia lookups.
+
+    Requests go through one pooled ``httpx.AsyncClient`` and are retried with
+    exponential backoff plus jitter, all under an overall ``deadline`` in
+    seconds. HTML parsing runs in ``workers.BLOCKING`` so the event loop keeps
+    serving updates while a page is fetched and parsed.
+    """
+
+    def __init__(self, api_url: str = API_URL, deadline: float = 10.0, retries: int = 3,
+                 backoff: float = 0.5, max_connections: int = 4):
+        self.api_url = api_url
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self._http: httpx.AsyncClient | None = None
+
+    @classmethod
+    def from_config(cls, config) -> "WikiClient":
+        return cls(deadline=config.WIKI_DEADLINE, retries=config.WIKI_RETRIES)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                headers=HEADERS,
+                timeout=httpx.Timeout(self.deadline),
+                limits=httpx.Limits(max_connections=self.max_connections),
+            )
+        return self._http
+
+    async def _get_json(self, params: Dict[str, str]) -> Dict:
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.http.get(self.api_url, params=params)
+                response.raise_for_status()
+                return response.json()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retriable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code in (429, 500, 502, 503, 504)
+                if not retriable or attempt == self.retries:
+                    raise
+                # Full jitter: sleep a random time up to the exponential backoff
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                logger.warning("Wikipedia request failed (%s), retrying in %.2fs", e, delay)
+                await asyncio.sleep(delay)
+
+    async def fetch_day_html(self, month: int, day: int) -> str | None:
+        data = await asyncio.wait_for(self._get_json(_parse_params(month, day)), self.deadline)
+        if 'parse' not in data:
+            return None
+        return data['parse']['text']
+
+    async def fetch_day_births(self, month: int, day: int) -> List[str]:
+        with metrics.timer("wikipedia_request"):
+            html_content = await self.fetch_day_html(month, day)
+        if html_content is None:
+            logger.warning("No parse in Wikipedia response for %s", page_title(month, day))
+            return []
+
+        # Queue wait and parse time are observed by the pool (task="wikipedia_parse")
+        return await BLOCKING.run(extract_births, html_content, task="wikipedia_parse")
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+        self._http = None
+
+
+# A day's births rarely change: live fetches are shared through the cache for a day
+WIKI_CACHE_TTL = 24 * 3600
+
+
+async def rand_wiki(store: BirthsStore | None = None, client: WikiClient | None = None,
+                    today: date | None = None, cache=None) -> str:
+    """Pick a random famous birthday for today, from the store when possible.
+
+    Days missing from the store are fetched live; with a ``cache`` (see
+    cache.py), a day fetched by any bot process is reused by the others.
+    """
+    try:
+        today = today or datetime.now()
+        births = store.get(today.month, today.day) if store is not None else []
+        key = f"wiki:{today.month:02d}-{today.day:02d}"
+        if not births and cache is not None:
+            entry = await shared_cache.read(cache, key)
+            births = entry.value if entry is not None else []
+        if not births:
+            # Day missing from the offline store: fall back to the live page
+            if client is None:
+                client = WikiClient()
+                try:
+                    births = await client.fetch_day_births(today.month, today.day)
+                finally:
+                    await client.close()
+            else:
+                births = await client.fetch_day_births(today.month, today.day)
+            if births and cache is not None:
+                await shared_cache.write(cache, key, births, WIKI_CACHE_TTL)
+
+        logger.info("Found %d birth entries", len(births))
+        if not births:
+            return "No births found"
+
+        name = birth_name(random.choice(births))
+        return f"Nadie de euri cumple años hoy, pero hoy cumple {name}"
+    except Exception as e:
+        # type too: a missed deadline is a TimeoutError with no message
+        logger.error("Error fetching Wikipedia: %s: %s", type(e).__name__, e)
+        return "Hoy nadie cumple años"
+
+
+if __name__ == "__main__":
+    # python wiki.py [path] -> rebuild the offline store
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    BirthsStore(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_STORE_PATH).rebuild()
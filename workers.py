@@ -0,0 +1,131 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import multiprocessing
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PoolBusy(RuntimeError):
+    """Raised by ``BlockingPool.run`` instead of queueing when the pool is full."""
+
+
+def _timed(fn, *args):
+    """Run ``fn(*args)`` in a worker process; return when it started and finished, and its result."""
+    started = time.monotonic()
+    result = fn(*args)
+    return started, time.monotonic(), result
+
+
+class BlockingPool:
+    """Named thread pool for blocking calls, with a bounded queue.
+
+    At most ``max_workers`` calls run at once and ``max_queue`` more wait;
+    beyond that ``run`` raises ``PoolBusy`` right away, so a burst fails fast
+    instead of piling up latency behind the default executor. Per call, the
+    time spent queued and running is observed into
+    ``bot_executor_seconds{pool,task,stage}``. Rejections are counted in
+    ``bot_executor_rejected_total``, and calls waiting or running are shown
+    in the ``bot_executor_pending`` gauge.
+
+    The threads start on first use (or ``start()``) and are stopped by
+    ``shutdown()``, which the bot calls from ``post_shutdown``.
+
+    With ``processes=True`` the workers are processes instead (started with
+    ``spawn``, so they do not inherit the bot's threads and event loop), for
+    CPU-bound work that would hold the GIL. ``fn`` and its arguments must
+    then be picklable: module-level functions and plain data.
+    """
+
+    def __init__(self, name: str, max_workers: int = 4, max_queue: int = 32,
+                 registry: metrics.Registry = metrics.REGISTRY, processes: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.registry = registry
+        self.processes = processes
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+        self._pending = 0
+        registry.set_gauge("bot_executor_pending", 0, pool=name)
+
+    def configure(self, max_workers: int, max_queue: int) -> None:
+        """Resize the pool; takes effect the next time its threads are started."""
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+
+    def start(self) -> None:
+        if self._executor is None:
+            if self.processes:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+
+    @property
+    def pending(self) -> int:
+        """Calls submitted and not finished yet (queued plus running)."""
+        return self._pending
+
+    async def run(self, fn, *args, task: str = ""):
+        """Run ``fn(*args)`` in the pool and return its result; raise ``PoolBusy`` if the queue is full."""
+        if self._pending >= self.max_workers + self.max_queue:
+            self.registry.inc("bot_executor_rejected_total", pool=self.name)
+            raise PoolBusy(f"{self.name} pool is full ({self._pending} calls pending)")
+        self.start()
+        loop = asyncio.get_running_loop()
+        # monotonic, not perf_counter: worker processes report their times on the same clock
+        submitted = time.monotonic()
+        times = [0.0, 0.0]
+
+        def call():
+            times[0] = time.monotonic()
+            try:
+                return fn(*args)
+            finally:
+                times[1] = time.monotonic()
+
+        # A closure cannot be sent to a worker process: it reports its own times with the result
+        future = self._executor.submit(_timed, fn, *args) if self.processes else self._executor.submit(call)
+        self._pending += 1
+        self.registry.set_gauge("bot_executor_pending", self._pending, pool=self.name)
+        # Released when the worker is done, not when the caller stops waiting: a
+        # cancelled caller does not free the worker
+        future.add_done_callback(
+            lambda f: loop.call_soon_threadsafe(self._done, task or fn.__name__, submitted, times, f))
+        result = await asyncio.wrap_future(future)
+        return result[2] if self.processes else result
+
+    def _done(self, task: str, submitted: float, times: list, future: concurrent.futures.Future) -> None:
+        # Back on the loop: the registry is not thread-safe
+        if self.processes and not future.cancelled() and future.exception() is None:
+            times = future.result()[:2]
+        self._pending -= 1
+        self.registry.set_gauge("bot_executor_pending", self._pending, pool=self.name)
+        started, finished = times
+        if started and finished:
+            self.registry.observe("bot_executor_seconds", started - submitted, pool=self.name, task=task, stage="wait")
+            self.registry.observe("bot_executor_seconds", finished - started, pool=self.name, task=task, stage="run")
+
+    async def shutdown(self, timeout: float = 10.0) -> None:
+        """Drop the queued calls and wait up to ``timeout`` seconds for the running ones."""
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        stopping = asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(executor.shutdown, wait=True, cancel_futures=True))
+        try:
+            await asyncio.wait_for(asyncio.shield(stopping), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%s pool still busy after %.0fs; not waiting for it", self.name, timeout)
+
+
+# Short blocking calls on the request path: snapshot reads and writes, HTML parsing
+BLOCKING = BlockingPool("blocking")
+# Long background work (the weekly Wikipedia rebuild): one at a time, no queue
+BACKGROUND = BlockingPool("background", max_workers=1, max_queue=0)
+# CPU-bound rendering (birthday cards) in worker processes, off the event loop and the GIL
+RENDER = BlockingPool("render", max_workers=2, max_queue=16, processes=True)